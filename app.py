@@ -1,25 +1,51 @@
 # NEW: Import jsonify
-from flask import Flask, render_template, request, redirect, url_for, flash, session, send_from_directory, jsonify, Response
-import cx_Oracle
+from flask import Flask, render_template, request, redirect, url_for, flash, session, jsonify, Response, g, stream_with_context, has_request_context, abort, send_file
+from flask import before_render_template, template_rendered
+try:
+    import cx_Oracle
+except ImportError:  # only needed for DB_BACKEND=oracle (the default)
+    cx_Oracle = None
 import os
 from dotenv import load_dotenv
 from werkzeug.security import generate_password_hash, check_password_hash
-from werkzeug.utils import secure_filename
-from datetime import date, datetime
+from werkzeug.local import LocalProxy
+from werkzeug.security import safe_join
+from datetime import date, datetime, timedelta
 from dateutil.relativedelta import relativedelta # For accurate date math
 from functools import wraps
+import click
 import io
+import mimetypes
+import shutil
+import subprocess
 import csv
+import json
+import hashlib
+import hmac
+import re
+import zlib
 import smtplib
 import ssl
+import socket
 from email.message import EmailMessage
+from html import escape as html_escape
 import threading
 import time
+import tempfile
+import bisect
+import heapq
+import itertools
+import random
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from db_backends.sqlite import SqlitePool, dbapi as sqlite_dbapi
 
 # --- App Configuration ---
 load_dotenv()
 app = Flask(__name__)
 app.secret_key = os.getenv("SECRET_KEY", "dev_secret_key")
+# Runtime diagnostics (background jobs, workers, pool) go through app.logger; CLI output uses click.echo
+app.logger.setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
 app.config['UPLOAD_FOLDER'] = 'uploads'
 app.config['ALLOWED_EXTENSIONS'] = {'pdf', 'png', 'jpg', 'jpeg'}
 SMTP_HOST = os.getenv("SMTP_HOST", "smtp.gmail.com")
@@ -27,46 +53,1103 @@ SMTP_PORT = int(os.getenv("SMTP_PORT", "587"))
 SMTP_USER = os.getenv("SMTP_USER")
 SMTP_PASS = os.getenv("SMTP_PASS")
 SMTP_FROM = os.getenv("SMTP_FROM", SMTP_USER or "")
+SMTP_STARTTLS = os.getenv("SMTP_STARTTLS", "true").lower() == "true"
+SMTP_AUTH = os.getenv("SMTP_AUTH", "true").lower() == "true"  # set false for a local test SMTP server
+SMTP_TIMEOUT = int(os.getenv("SMTP_TIMEOUT", "30"))
+SMTP_IDLE_SECONDS = int(os.getenv("SMTP_IDLE_SECONDS", "60"))  # reconnect if the session sat idle longer
+EMAIL_OUTBOX = os.getenv("EMAIL_OUTBOX", "true").lower() == "true"
+EMAIL_WORKERS = int(os.getenv("EMAIL_WORKERS", "2"))
+EMAIL_BATCH_SIZE = int(os.getenv("EMAIL_BATCH_SIZE", "50"))
+EMAIL_MAX_ATTEMPTS = int(os.getenv("EMAIL_MAX_ATTEMPTS", "5"))
+EMAIL_BACKOFF_SECONDS = int(os.getenv("EMAIL_BACKOFF_SECONDS", "30"))
+EMAIL_LEASE_SECONDS = int(os.getenv("EMAIL_LEASE_SECONDS", "300"))
+EMAIL_POLL_SECONDS = float(os.getenv("EMAIL_POLL_SECONDS", "5"))
+# Reminder emails from the cadence job: "immediate" (one email per reminder), "daily" (one digest
+# per user per run) or "weekly" (one digest per user on DIGEST_WEEKDAY, Monday=0)
+NOTIFY_EMAIL_MODE = os.getenv("NOTIFY_EMAIL_MODE", "immediate").lower()
+DIGEST_WEEKDAY = int(os.getenv("DIGEST_WEEKDAY", "0"))
+# Request metrics: every request lands in the latency histogram; a METRICS_SAMPLE_RATE
+# fraction is traced in detail (SQL, templates, SMTP) and can carry a Server-Timing header.
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+METRICS_SAMPLE_RATE = float(os.getenv("METRICS_SAMPLE_RATE", "0.05"))
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")  # lets a scraper read /admin/metrics without an admin session
+SERVER_TIMING = os.getenv("SERVER_TIMING", "false").lower() == "true"
+
+# --- Database Connection Pool ---
+# Each request (and each background job) borrows its own pooled session via `g`;
+# `conn` below is a proxy to that session so route code keeps using conn.cursor().
+DB_POOL_MIN = int(os.getenv("DB_POOL_MIN", "2"))
+DB_POOL_MAX = int(os.getenv("DB_POOL_MAX", "16"))
+DB_POOL_INCREMENT = int(os.getenv("DB_POOL_INCREMENT", "1"))
+DB_POOL_PING_INTERVAL = int(os.getenv("DB_POOL_PING_INTERVAL", "60"))  # seconds idle before a ping on acquire
+DB_POOL_WAIT_TIMEOUT = int(os.getenv("DB_POOL_WAIT_TIMEOUT", "5000"))  # ms to wait for a free session
+DB_STMT_CACHE_SIZE = int(os.getenv("DB_STMT_CACHE_SIZE", "64"))  # per-session client statement cache
+# "oracle" (default) or "sqlite": an embedded file for local load tests and benchmarks
+DB_BACKEND = os.getenv("DB_BACKEND", "oracle").lower()
+SQLITE_PATH = os.getenv("SQLITE_PATH", "warracker.sqlite3")
+SQLITE_BUSY_TIMEOUT = int(os.getenv("SQLITE_BUSY_TIMEOUT", "5000"))  # ms a writer waits for the write lock
+
+if DB_BACKEND == "sqlite":
+    dbapi = sqlite_dbapi
+elif cx_Oracle is None:
+    raise ImportError("cx_Oracle is required for DB_BACKEND=oracle (set DB_BACKEND=sqlite to run without it)")
+else:
+    dbapi = cx_Oracle
+
+db_pool = None
+_POOL_NATIVE_PING = False
+_pool_stats_lock = threading.Lock()
+_pool_wait = {"acquires": 0, "total_ms": 0.0, "max_ms": 0.0, "reconnects": 0}
+
+# Objects the app relies on beyond db/db_setup.sql; each is created if missing at startup.
+# ORA-00955 (name already used) or a missing base table in some envs only produces a note.
+_STARTUP_DDL = [
+    # Unique constraint for duplicates: (user_id, lower(product_name), lower(nvl(brand,'')))
+    ("unique index ux_warranties_user_prod_brand",
+     """
+     CREATE UNIQUE INDEX ux_warranties_user_prod_brand
+     ON warranties (user_id, LOWER(product_name), LOWER(NVL(brand,'')))
+     """),
+    # Prevent duplicate notification messages for the same warranty
+    ("unique index ux_notifications_user_warranty_message",
+     """
+     CREATE UNIQUE INDEX ux_notifications_user_warranty_message
+     ON notifications (user_id, warranty_id, message)
+     """),
+    # Serves per-user listing, count and keyset seeks on (expiry_date, warranty_id)
+    ("index ix_warranties_user_expiry",
+     "CREATE INDEX ix_warranties_user_expiry ON warranties (user_id, expiry_date, warranty_id)"),
+    # Claims by warranty and status: report aggregation, pending counts per warranty
+    ("index ix_service_claims_warranty_status",
+     "CREATE INDEX ix_service_claims_warranty_status ON service_claims (warranty_id, status)"),
+    # Newest-first / keyset paging of a user's notifications and MAX(notification_id) for ETags
+    ("index ix_notifications_user_id",
+     "CREATE INDEX ix_notifications_user_id ON notifications (user_id, notification_id)"),
+    # Range scans on expiry_date for the cadence job and date-window reports
+    ("index ix_warranties_expiry",
+     "CREATE INDEX ix_warranties_expiry ON warranties (expiry_date)"),
+    # Precomputed admin dashboard counters
+    ("table admin_stats",
+     """
+     CREATE TABLE admin_stats (
+         stat_key VARCHAR2(30) PRIMARY KEY,
+         stat_value NUMBER DEFAULT 0 NOT NULL,
+         updated_at DATE DEFAULT SYSDATE NOT NULL
+     )
+     """),
+    # Cross-process invalidation counters for in-process caches (product catalog)
+    ("table cache_generations",
+     """
+     CREATE TABLE cache_generations (
+         cache_name VARCHAR2(30) PRIMARY KEY,
+         generation NUMBER DEFAULT 0 NOT NULL,
+         updated_at DATE DEFAULT SYSDATE NOT NULL
+     )
+     """),
+    # Durable outbox drained by the email worker pool
+    ("table email_outbox",
+     """
+     CREATE TABLE email_outbox (
+         outbox_id NUMBER GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+         to_email VARCHAR2(100) NOT NULL,
+         subject VARCHAR2(300) NOT NULL,
+         body_text CLOB,
+         body_html CLOB,
+         status VARCHAR2(20) DEFAULT 'Pending' NOT NULL CHECK (status IN ('Pending', 'Sending', 'Sent', 'Dead')),
+         attempts NUMBER DEFAULT 0 NOT NULL,
+         next_attempt_at DATE DEFAULT SYSDATE NOT NULL,
+         locked_until DATE,
+         last_error VARCHAR2(1000),
+         created_at DATE DEFAULT SYSDATE,
+         sent_at DATE
+     )
+     """),
+    ("index ix_email_outbox_due",
+     "CREATE INDEX ix_email_outbox_due ON email_outbox (status, next_attempt_at)"),
+    # Persisted Active/Expired state; kept by the write paths and rollover_warranty_status()
+    ("column warranties.status",
+     """
+     ALTER TABLE warranties ADD (
+         status VARCHAR2(10) DEFAULT 'Active' NOT NULL
+         CONSTRAINT ck_warranties_status CHECK (status IN ('Active', 'Expired'))
+     )
+     """),
+    ("index ix_warranties_status_expiry",
+     "CREATE INDEX ix_warranties_status_expiry ON warranties (status, expiry_date)"),
+    # Inverted index for admin search, maintained by the write paths (see index_search_entities)
+    ("table search_tokens",
+     """
+     CREATE TABLE search_tokens (
+         entity_type CHAR(1) NOT NULL,
+         token VARCHAR2(40) NOT NULL,
+         entity_id NUMBER NOT NULL,
+         weight NUMBER(3) NOT NULL,
+         CONSTRAINT pk_search_tokens PRIMARY KEY (entity_type, token, entity_id)
+     ) ORGANIZATION INDEX
+     """),
+    ("index ix_search_tokens_entity",
+     "CREATE INDEX ix_search_tokens_entity ON search_tokens (entity_type, entity_id)"),
+    # Persistent scheduler: one row per job (its row lock elects the runner) plus run history
+    ("table scheduled_jobs",
+     """
+     CREATE TABLE scheduled_jobs (
+         job_name VARCHAR2(50) PRIMARY KEY,
+         schedule VARCHAR2(100) NOT NULL,
+         next_run_at DATE NOT NULL,
+         last_run_at DATE,
+         last_status VARCHAR2(10),
+         last_duration_ms NUMBER
+     )
+     """),
+    ("table job_runs",
+     """
+     CREATE TABLE job_runs (
+         run_id NUMBER GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+         job_name VARCHAR2(50) NOT NULL,
+         scheduled_for DATE NOT NULL,
+         started_at DATE NOT NULL,
+         duration_ms NUMBER NOT NULL,
+         status VARCHAR2(10) NOT NULL CHECK (status IN ('Succeeded', 'Failed', 'Skipped')),
+         missed_runs NUMBER DEFAULT 0 NOT NULL,
+         runner VARCHAR2(100),
+         detail VARCHAR2(1000)
+     )
+     """),
+    ("index ix_job_runs_job_started",
+     "CREATE INDEX ix_job_runs_job_started ON job_runs (job_name, started_at)"),
+    # Per-user watermark for the incremental notification generator
+    ("table notification_watermarks",
+     """
+     CREATE TABLE notification_watermarks (
+         user_id NUMBER PRIMARY KEY,
+         last_evaluated DATE NOT NULL,
+         CONSTRAINT fk_notif_watermark_user FOREIGN KEY (user_id) REFERENCES users(user_id) ON DELETE CASCADE
+     )
+     """),
+]
+
+def _ensure_startup_indexes(c):
+    for label, ddl in _STARTUP_DDL:
+        cur = None
+        try:
+            cur = c.cursor()
+            cur.execute(ddl)
+            c.commit()
+            app.logger.info("Created %s", label)
+        except Exception as ie:
+            app.logger.info("Ensure %s note: %s", label, ie)
+        finally:
+            if cur: cur.close()
+
+def _ensure_sqlite_schema(c):
+    cur = c.cursor()
+    try:
+        cur.execute("SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name = 'users'")
+        if cur.fetchone()[0]:
+            return
+    finally:
+        cur.close()
+    with open(os.path.join(app.root_path, "db", "db_setup_sqlite.sql"), encoding="utf-8") as f:
+        c.executescript(f.read())
+    app.logger.info("✅ Created SQLite schema in %s", SQLITE_PATH)
 
-# --- Database Connection ---
 try:
-    dsn = cx_Oracle.makedsn(os.getenv("DB_HOST"), os.getenv("DB_PORT"), service_name=os.getenv("DB_SERVICE"))
-    conn = cx_Oracle.connect(user=os.getenv("DB_USER"), password=os.getenv("DB_PASSWORD"), dsn=dsn)
-    print("✅ Oracle DB Connected:", conn.version)
-    # Ensure unique constraint for duplicates: (user_id, lower(product_name), lower(nvl(brand,'')))
+    if DB_BACKEND == "sqlite":
+        db_pool = SqlitePool(SQLITE_PATH, min=DB_POOL_MIN, max=DB_POOL_MAX, increment=DB_POOL_INCREMENT,
+                             busy_timeout=SQLITE_BUSY_TIMEOUT, stmtcachesize=DB_STMT_CACHE_SIZE)
+        db_pool.wait_timeout = DB_POOL_WAIT_TIMEOUT
+        _POOL_NATIVE_PING = True  # a local file has no sessions to go stale
+        _boot = db_pool.acquire()
+        try:
+            app.logger.info("✅ SQLite DB Pool Ready: %s %s (min=%s, max=%s)", SQLITE_PATH, _boot.version, DB_POOL_MIN, DB_POOL_MAX)
+            _ensure_sqlite_schema(_boot)
+        finally:
+            db_pool.release(_boot)
+    else:
+        dsn = cx_Oracle.makedsn(os.getenv("DB_HOST"), os.getenv("DB_PORT"), service_name=os.getenv("DB_SERVICE"))
+        db_pool = cx_Oracle.SessionPool(
+            user=os.getenv("DB_USER"),
+            password=os.getenv("DB_PASSWORD"),
+            dsn=dsn,
+            min=DB_POOL_MIN,
+            max=DB_POOL_MAX,
+            increment=DB_POOL_INCREMENT,
+            threaded=True,
+            getmode=cx_Oracle.SPOOL_ATTRVAL_TIMEDWAIT,
+            encoding="UTF-8",
+        )
+        db_pool.wait_timeout = DB_POOL_WAIT_TIMEOUT
+        # Sessions created by the pool keep this many parsed statements open for reuse
+        db_pool.stmtcachesize = DB_STMT_CACHE_SIZE
+        try:
+            # cx_Oracle >= 8.2 pings sessions idle longer than this on acquire
+            db_pool.ping_interval = DB_POOL_PING_INTERVAL
+            _POOL_NATIVE_PING = True
+        except AttributeError:
+            _POOL_NATIVE_PING = False
+        _boot = db_pool.acquire()
+        try:
+            app.logger.info("✅ Oracle DB Pool Connected: %s (min=%s, max=%s, increment=%s)",
+                            _boot.version, DB_POOL_MIN, DB_POOL_MAX, DB_POOL_INCREMENT)
+            _ensure_startup_indexes(_boot)
+        finally:
+            db_pool.release(_boot)
+except Exception as e:
+    print(f"❌ Database connection failed: {e}")
+    db_pool = None
+
+def _acquire_connection():
+    if db_pool is None:
+        raise RuntimeError("Database connection is not available.")
+    t0 = time.perf_counter()
+    c = db_pool.acquire()
+    if not _POOL_NATIVE_PING:
+        try:
+            c.ping()
+        except dbapi.Error:
+            # Stale session (e.g. DB restart / firewall idle kill): drop it and take a fresh one
+            db_pool.drop(c)
+            c = db_pool.acquire()
+            with _pool_stats_lock:
+                _pool_wait["reconnects"] += 1
+    waited_ms = (time.perf_counter() - t0) * 1000.0
+    with _pool_stats_lock:
+        _pool_wait["acquires"] += 1
+        _pool_wait["total_ms"] += waited_ms
+        if waited_ms > _pool_wait["max_ms"]:
+            _pool_wait["max_ms"] = waited_ms
+    return c
+
+def get_db():
+    """Return the pooled connection bound to the current app context, acquiring one on first use."""
+    if 'db_conn' not in g:
+        g.db_conn = _acquire_connection()
+    trace = g.get('metrics_trace')
+    if trace is not None:
+        # Sampled request: hand out timed cursors on the same session
+        if 'db_traced' not in g:
+            g.db_traced = TracedConnection(g.db_conn, trace)
+        return g.db_traced
+    return g.db_conn
+
+@app.teardown_appcontext
+def _release_db(exc):
+    c = g.pop('db_conn', None)
+    if c is None or db_pool is None:
+        return
+    try:
+        if exc is not None:
+            c.rollback()
+        db_pool.release(c)
+    except dbapi.Error as e:
+        # Session died mid-request; make sure the pool does not hand it out again
+        app.logger.warning("Releasing pooled connection failed, dropping it: %s", e)
+        try:
+            db_pool.drop(c)
+        except Exception:
+            pass
+        with _pool_stats_lock:
+            _pool_wait["reconnects"] += 1
+
+def db_pool_stats():
+    if db_pool is None:
+        return {"available": False}
+    with _pool_stats_lock:
+        acquires = _pool_wait["acquires"]
+        stats = {
+            "available": True,
+            "busy": db_pool.busy,
+            "open": db_pool.opened,
+            "min": db_pool.min,
+            "max": db_pool.max,
+            "increment": db_pool.increment,
+            "acquires": acquires,
+            "wait_ms_avg": round(_pool_wait["total_ms"] / acquires, 3) if acquires else 0.0,
+            "wait_ms_max": round(_pool_wait["max_ms"], 3),
+            "reconnects": _pool_wait["reconnects"],
+        }
+    return stats
+
+conn = LocalProxy(get_db)
+
+# --- Prepared SQL registry ---
+# Hot statements are named constants with every value bound, so each has exactly one SQL
+# text: one shared cursor in the library cache and a hit in each session's statement cache
+# (DB_STMT_CACHE_SIZE) rather than a hard parse per user or id. The /* wt:<name> */ tag
+# lets /admin/db/sql find them in V$SQL; execute_sql() keeps per-name timings in-process.
+class NamedSql(str):
+    """SQL text that carries its registry name; usable anywhere a str is."""
+
+SQL = {}
+_sql_stats = {}
+_sql_lock = threading.Lock()
+
+def backend_sql(text, sqlite=None):
+    """`text`, or its hand-written `sqlite` variant when DB_BACKEND=sqlite (for statements the
+    SQLite cursor rejects with UnsupportedSql, e.g. MERGE and ROWNUM)."""
+    return sqlite if sqlite is not None and DB_BACKEND == "sqlite" else text
+
+def register_sql(name, text, sqlite=None):
+    stmt = NamedSql(f"/* wt:{name} */ {backend_sql(text, sqlite).strip()}")
+    stmt.name = name
+    with _sql_lock:
+        existing = SQL.get(name)
+        if existing is not None:
+            if existing != stmt:
+                raise ValueError(f"SQL name {name!r} registered twice with different text")
+            return existing
+        SQL[name] = stmt
+    return stmt
+
+def _record_sql(name, ms, rows=1):
+    with _sql_lock:
+        st = _sql_stats.get(name)
+        if st is None:
+            st = _sql_stats[name] = {"executions": 0, "rows": 0, "total_ms": 0.0, "max_ms": 0.0}
+        st["executions"] += 1
+        st["rows"] += rows
+        st["total_ms"] += ms
+        if ms > st["max_ms"]:
+            st["max_ms"] = ms
+
+def execute_sql(cur, stmt, binds=None):
+    t0 = time.perf_counter()
+    try:
+        if binds is None:
+            cur.execute(stmt)
+        else:
+            cur.execute(stmt, binds)
+    finally:
+        _record_sql(stmt.name, (time.perf_counter() - t0) * 1000)
+    return cur
+
+def executemany_sql(cur, stmt, rows, **kwargs):
+    t0 = time.perf_counter()
+    try:
+        cur.executemany(stmt, rows, **kwargs)
+    finally:
+        _record_sql(stmt.name, (time.perf_counter() - t0) * 1000, len(rows))
+    return cur
+
+def sql_stats():
+    with _sql_lock:
+        out = []
+        for name, st in _sql_stats.items():
+            out.append({
+                "name": name,
+                "executions": st["executions"],
+                "rows": st["rows"],
+                "avg_ms": round(st["total_ms"] / st["executions"], 3) if st["executions"] else 0.0,
+                "max_ms": round(st["max_ms"], 3),
+                "total_ms": round(st["total_ms"], 1),
+            })
+    out.sort(key=lambda r: r["total_ms"], reverse=True)
+    return out
+
+def db_parse_stats(cur):
+    """Parse counters from the V$ views (needs SELECT on V$MYSTAT/V$STATNAME/V$SQL).
+
+    session: this session's parse/execute counters. statements: shared-pool stats of the
+    registered statements (loads ~ hard parses). literal_offenders: statement shapes that
+    differ only in literals (same FORCE_MATCHING_SIGNATURE, several SQL_IDs), i.e. the
+    unbound SQL still producing hard parses.
+    """
+    out = {}
+    if DB_BACKEND == "sqlite":
+        out["error"] = "V$ views are Oracle-only; DB_BACKEND=sqlite has no shared pool to report on"
+        return out
     try:
-        cur = conn.cursor()
         cur.execute(
             """
-            CREATE UNIQUE INDEX ux_warranties_user_prod_brand
-            ON warranties (user_id, LOWER(product_name), LOWER(NVL(brand,'')))
+            SELECT n.name, s.value FROM v$mystat s JOIN v$statname n ON n.statistic# = s.statistic#
+            WHERE n.name IN ('parse count (total)', 'parse count (hard)', 'execute count', 'session cursor cache hits')
             """
         )
-        conn.commit()
-        print("✅ Created unique index ux_warranties_user_prod_brand")
-    except Exception as ie:
-        # ORA-00955 name is already used by an existing object, or table may not exist yet in some envs
-        print(f"Index ensure note: {ie}")
-    finally:
-        if 'cur' in locals() and cur: cur.close()
-    # Ensure uniqueness to prevent duplicate notification messages for the same warranty
-    try:
-        cur = conn.cursor()
+        out["session"] = {name: int(value) for name, value in cur}
         cur.execute(
             """
-            CREATE UNIQUE INDEX ux_notifications_user_warranty_message
-            ON notifications (user_id, warranty_id, message)
+            SELECT REGEXP_SUBSTR(sql_text, 'wt:([A-Za-z0-9_.]+)', 1, 1, NULL, 1) AS name,
+                   SUM(executions), SUM(parse_calls), SUM(loads), COUNT(*)
+            FROM v$sql WHERE sql_text LIKE '/* wt:%'
+            GROUP BY REGEXP_SUBSTR(sql_text, 'wt:([A-Za-z0-9_.]+)', 1, 1, NULL, 1)
+            ORDER BY 4 DESC
             """
         )
-        conn.commit()
-        print("✅ Created unique index ux_notifications_user_warranty_message")
-    except Exception as ie:
-        print(f"Notification index ensure note: {ie}")
+        out["statements"] = [
+            {"name": r[0], "executions": int(r[1] or 0), "parse_calls": int(r[2] or 0),
+             "hard_parses": int(r[3] or 0), "child_cursors": int(r[4])}
+            for r in cur
+        ]
+        cur.execute(
+            """
+            SELECT force_matching_signature, COUNT(DISTINCT sql_id), SUM(loads), MIN(SUBSTR(sql_text, 1, 160))
+            FROM v$sql
+            WHERE parsing_schema_name = SYS_CONTEXT('USERENV', 'CURRENT_SCHEMA') AND force_matching_signature > 0
+            GROUP BY force_matching_signature
+            HAVING COUNT(DISTINCT sql_id) > 1
+            ORDER BY 2 DESC
+            FETCH FIRST 20 ROWS ONLY
+            """
+        )
+        out["literal_offenders"] = [
+            {"variants": int(r[1]), "hard_parses": int(r[2] or 0), "sample": r[3]} for r in cur
+        ]
+    except dbapi.DatabaseError as e:
+        out["error"] = f"V$ views unavailable (grant SELECT_CATALOG_ROLE for full stats): {e}"
+    return out
+
+# --- Metrics ---
+# Unsampled requests cost two perf_counter() calls, a random() and one locked histogram
+# update. Sampled requests also get TracedCursor (per-statement time and rows) and template
+# and SMTP timings; those counters cover sampled requests only, and
+# warracker_http_requests_sampled_total says how many that was.
+_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus sense (caller holds the metrics lock)."""
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self):
+        self.counts = [0] * (len(_LATENCY_BUCKETS) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(_LATENCY_BUCKETS, seconds)] += 1
+        self.sum += seconds
+        self.count += 1
+
+class Metrics:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.requests = {}      # (endpoint, method, status) -> Histogram
+            self.sampled = {}       # endpoint -> sampled request count
+            self.sql = {}           # statement label -> [executions, seconds, rows]
+            self.templates = {}     # template name -> [renders, seconds]
+            self.smtp = Histogram()
+            self.smtp_errors = 0
+
+    def observe_request(self, endpoint, method, status, seconds, trace):
+        with self.lock:
+            key = (endpoint, method, status)
+            h = self.requests.get(key)
+            if h is None:
+                h = self.requests[key] = Histogram()
+            h.observe(seconds)
+            if trace is None:
+                return
+            self.sampled[endpoint] = self.sampled.get(endpoint, 0) + 1
+            for label, (n, secs, rows) in trace["sql"].items():
+                st = self.sql.get(label)
+                if st is None:
+                    st = self.sql[label] = [0, 0.0, 0]
+                st[0] += n
+                st[1] += secs
+                st[2] += rows
+            for name, (n, secs) in trace["templates"].items():
+                st = self.templates.get(name)
+                if st is None:
+                    st = self.templates[name] = [0, 0.0]
+                st[0] += n
+                st[1] += secs
+
+    def observe_smtp(self, seconds, ok):
+        with self.lock:
+            self.smtp.observe(seconds)
+            if not ok:
+                self.smtp_errors += 1
+
+metrics = Metrics()
+
+def _new_trace():
+    return {"sql": {}, "templates": {}, "db_s": 0.0, "db_n": 0, "tpl_s": 0.0, "smtp_s": 0.0}
+
+def _sql_label(statement):
+    name = getattr(statement, "name", None)
+    if name:
+        return name
+    # Unregistered SQL: label by its leading text so literal-free statements still group
+    return "adhoc:" + " ".join(str(statement).split())[:48]
+
+def _trace_sql(trace, label, seconds, rows):
+    st = trace["sql"].get(label)
+    if st is None:
+        st = trace["sql"][label] = [0, 0.0, 0]
+    st[0] += 1
+    st[1] += seconds
+    st[2] += rows
+    trace["db_s"] += seconds
+    trace["db_n"] += 1
+
+class TracedCursor(dbapi.Cursor):
+    """Cursor that times execute/executemany and counts rows fetched per statement.
+
+    Rows are taken from rowcount (rows fetched so far for a query, rows affected for DML)
+    when the cursor is re-executed or closed.
+    """
+
+    def __init__(self, connection, trace):
+        super().__init__(connection)
+        self._trace = trace
+        self._label = None
+        self._elapsed = 0.0
+
+    def _flush(self):
+        if self._label is not None:
+            _trace_sql(self._trace, self._label, self._elapsed, max(self.rowcount or 0, 0))
+            self._label = None
+
+    def execute(self, statement, *args, **kwargs):
+        self._flush()
+        t0 = time.perf_counter()
+        try:
+            return super().execute(statement, *args, **kwargs)
+        finally:
+            self._label, self._elapsed = _sql_label(statement), time.perf_counter() - t0
+
+    def executemany(self, statement, *args, **kwargs):
+        self._flush()
+        t0 = time.perf_counter()
+        try:
+            return super().executemany(statement, *args, **kwargs)
+        finally:
+            self._label, self._elapsed = _sql_label(statement), time.perf_counter() - t0
+
+    def close(self):
+        self._flush()
+        super().close()
+
+class TracedConnection:
+    """Per-request view of a pooled connection whose cursor() returns TracedCursor."""
+
+    def __init__(self, connection, trace):
+        self._connection = connection
+        self._trace = trace
+
+    def cursor(self):
+        return TracedCursor(self._connection, self._trace)
+
+    def __getattr__(self, name):
+        return getattr(self._connection, name)
+
+@app.before_request
+def _metrics_start():
+    if not METRICS_ENABLED:
+        return
+    g.metrics_t0 = time.perf_counter()
+    if METRICS_SAMPLE_RATE > 0 and random.random() < METRICS_SAMPLE_RATE:
+        g.metrics_trace = _new_trace()
+
+@app.after_request
+def _metrics_finish(response):
+    t0 = g.get('metrics_t0')
+    if t0 is None:
+        return response
+    elapsed = time.perf_counter() - t0
+    trace = g.get('metrics_trace')
+    metrics.observe_request(request.endpoint or "unmatched", request.method, response.status_code, elapsed, trace)
+    if trace is not None and SERVER_TIMING:
+        response.headers["Server-Timing"] = ", ".join((
+            f'db;dur={trace["db_s"] * 1000:.1f};desc="{trace["db_n"]} queries"',
+            f'tpl;dur={trace["tpl_s"] * 1000:.1f}',
+            f'smtp;dur={trace["smtp_s"] * 1000:.1f}',
+            f'total;dur={elapsed * 1000:.1f}',
+        ))
+    return response
+
+def _current_trace():
+    return g.get('metrics_trace') if has_request_context() else None
+
+@before_render_template.connect_via(app)
+def _metrics_template_start(sender, template, context, **extra):
+    trace = _current_trace()
+    if trace is not None:
+        trace["_tpl_t0"] = time.perf_counter()
+
+@template_rendered.connect_via(app)
+def _metrics_template_done(sender, template, context, **extra):
+    trace = _current_trace()
+    if trace is None or "_tpl_t0" not in trace:
+        return
+    secs = time.perf_counter() - trace.pop("_tpl_t0")
+    name = template.name or "inline"
+    st = trace["templates"].get(name)
+    if st is None:
+        st = trace["templates"][name] = [0, 0.0]
+    st[0] += 1
+    st[1] += secs
+    trace["tpl_s"] += secs
+
+def _prom_escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _prom_labels(**labels):
+    return "{" + ",".join(f'{k}="{_prom_escape(v)}"' for k, v in labels.items()) + "}"
+
+def _prom_histogram(lines, name, h, **labels):
+    cumulative = 0
+    for bound, n in zip(_LATENCY_BUCKETS + ("+Inf",), h.counts):
+        cumulative += n
+        lines.append(f"{name}_bucket{_prom_labels(**labels, le=bound)} {cumulative}")
+    lines.append(f"{name}_sum{_prom_labels(**labels) if labels else ''} {h.sum:.6f}")
+    lines.append(f"{name}_count{_prom_labels(**labels) if labels else ''} {h.count}")
+
+def render_prometheus():
+    lines = []
+    with metrics.lock:
+        lines.append("# HELP warracker_http_request_duration_seconds Request latency by endpoint (all requests).")
+        lines.append("# TYPE warracker_http_request_duration_seconds histogram")
+        for (endpoint, method, status), h in sorted(metrics.requests.items()):
+            _prom_histogram(lines, "warracker_http_request_duration_seconds", h,
+                            endpoint=endpoint, method=method, status=status)
+        lines.append("# HELP warracker_http_requests_sampled_total Requests traced in detail (SQL/template counters cover only these).")
+        lines.append("# TYPE warracker_http_requests_sampled_total counter")
+        for endpoint, n in sorted(metrics.sampled.items()):
+            lines.append(f"warracker_http_requests_sampled_total{_prom_labels(endpoint=endpoint)} {n}")
+        lines.append("# HELP warracker_sql_executions_total Statement executions in sampled requests.")
+        lines.append("# TYPE warracker_sql_executions_total counter")
+        lines.append("# HELP warracker_sql_seconds_total Time in execute() per statement in sampled requests.")
+        lines.append("# TYPE warracker_sql_seconds_total counter")
+        lines.append("# HELP warracker_sql_rows_total Rows fetched or affected per statement in sampled requests.")
+        lines.append("# TYPE warracker_sql_rows_total counter")
+        for label, (n, secs, rows) in sorted(metrics.sql.items()):
+            lbl = _prom_labels(statement=label)
+            lines.append(f"warracker_sql_executions_total{lbl} {n}")
+            lines.append(f"warracker_sql_seconds_total{lbl} {secs:.6f}")
+            lines.append(f"warracker_sql_rows_total{lbl} {rows}")
+        lines.append("# HELP warracker_template_render_seconds_total Template render time in sampled requests.")
+        lines.append("# TYPE warracker_template_render_seconds_total counter")
+        lines.append("# HELP warracker_template_renders_total Template renders in sampled requests.")
+        lines.append("# TYPE warracker_template_renders_total counter")
+        for name, (n, secs) in sorted(metrics.templates.items()):
+            lbl = _prom_labels(template=name)
+            lines.append(f"warracker_template_renders_total{lbl} {n}")
+            lines.append(f"warracker_template_render_seconds_total{lbl} {secs:.6f}")
+        lines.append("# HELP warracker_smtp_send_seconds SMTP delivery time per message (all sends).")
+        lines.append("# TYPE warracker_smtp_send_seconds histogram")
+        _prom_histogram(lines, "warracker_smtp_send_seconds", metrics.smtp)
+        lines.append("# HELP warracker_smtp_errors_total SMTP sends that raised.")
+        lines.append("# TYPE warracker_smtp_errors_total counter")
+        lines.append(f"warracker_smtp_errors_total {metrics.smtp_errors}")
+    pool = db_pool_stats()
+    if pool.get("available"):
+        lines.append("# HELP warracker_db_pool_sessions Pooled Oracle sessions by state.")
+        lines.append("# TYPE warracker_db_pool_sessions gauge")
+        lines.append(f'warracker_db_pool_sessions{{state="busy"}} {pool["busy"]}')
+        lines.append(f'warracker_db_pool_sessions{{state="open"}} {pool["open"]}')
+        lines.append("# HELP warracker_db_pool_acquires_total Session acquires from the pool.")
+        lines.append("# TYPE warracker_db_pool_acquires_total counter")
+        lines.append(f'warracker_db_pool_acquires_total {pool["acquires"]}')
+    return "\n".join(lines) + "\n"
+
+# --- Caches ---
+class TtlLruCache:
+    """Thread-safe in-process LRU with per-entry TTL.
+
+    This is the default cache backend. Any object with the same get/set/delete/incr/clear
+    methods (e.g. a Redis adapter) can be plugged in instead.
+    """
+
+    def __init__(self, maxsize=10000, ttl=300):
+        self.maxsize = int(maxsize)
+        self.ttl = float(ttl)
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            value, expires = item
+            if expires < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + (self.ttl if ttl is None else ttl))
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def incr(self, key, delta=1):
+        """Adjust a cached number in place; a missing key stays missing (next read refills it)."""
+        with self._lock:
+            item = self._data.get(key)
+            if item is None or item[1] < time.monotonic():
+                return None
+            value = max(0, item[0] + delta)
+            self._data[key] = (value, item[1])
+            return value
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+class NullCache:
+    """Backend that never stores anything (UNREAD_CACHE_BACKEND=none)."""
+
+    def get(self, key):
+        return None
+
+    def set(self, key, value, ttl=None):
+        pass
+
+    def delete(self, key):
+        pass
+
+    def incr(self, key, delta=1):
+        return None
+
+    def clear(self):
+        pass
+
+CatalogProduct = namedtuple(
+    "CatalogProduct", "product_id brand model_name category image_url verified created_at"
+)
+
+class ProductSuggestIndex:
+    """Typeahead index over products(brand, model_name, category).
+
+    Each product's lowercased "brand model category" text is split into tokens kept in a
+    sorted (token, product_id) list, and posted under its trigrams (trigram -> set of
+    product_ids). Terms of 3+ characters are intersected through the trigram postings;
+    when that leaves more than RANK_CAP candidates (or every term is shorter), word-prefix
+    matches of the longest term are taken first by bisecting the token list. At most
+    RANK_CAP candidates are ranked, so a one-letter query against a large catalog costs
+    about as much as a specific one. Ranking: whole-query prefix of the
+    text or model name, then word-prefix, then substring; verified products and shorter
+    model names win ties.
+    """
+
+    RANK_CAP = 500
+    PREFIX_SCAN = 2000
+    # Diffs larger than this are applied by rebuilding; insort is O(n) per token
+    REBUILD_THRESHOLD = 2000
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._grams = {}
+        self._tokens = []
+        self._docs = {}
+
+    def __len__(self):
+        return len(self._docs)
+
+    @staticmethod
+    def _trigrams(text):
+        return {text[i:i + 3] for i in range(len(text) - 2)}
+
+    def _post(self, p):
+        model = (p.model_name or "").strip().lower()
+        text = " ".join(x for x in ((p.brand or "").strip().lower(), model,
+                                    (p.category or "").strip().lower()) if x)
+        self._docs[p.product_id] = (p, text, " " + text, model, (p.verified != 'Y', len(model), text))
+        for gram in self._trigrams(text):
+            self._grams.setdefault(gram, set()).add(p.product_id)
+        return set(text.split())
+
+    def _unpost(self, product_id):
+        doc = self._docs.pop(product_id, None)
+        if doc is None:
+            return
+        text = doc[1]
+        for gram in self._trigrams(text):
+            ids = self._grams.get(gram)
+            if ids is not None:
+                ids.discard(product_id)
+                if not ids:
+                    del self._grams[gram]
+        for token in set(text.split()):
+            i = bisect.bisect_left(self._tokens, (token, product_id))
+            if i < len(self._tokens) and self._tokens[i] == (token, product_id):
+                del self._tokens[i]
+
+    def _add_locked(self, p):
+        self._unpost(p.product_id)
+        for token in self._post(p):
+            bisect.insort(self._tokens, (token, p.product_id))
+
+    def _rebuild_locked(self, products):
+        self._grams, self._docs = {}, {}
+        tokens = []
+        for p in products:
+            tokens.extend((token, p.product_id) for token in self._post(p))
+        tokens.sort()
+        self._tokens = tokens
+
+    def sync(self, products):
+        """Bring the index in line with a full catalog snapshot, touching only what changed."""
+        fresh = {p.product_id: p for p in products}
+        with self._lock:
+            removed = [pid for pid in self._docs if pid not in fresh]
+            changed = [p for pid, p in fresh.items()
+                       if pid not in self._docs or self._docs[pid][0] != p]
+            if len(removed) + len(changed) > self.REBUILD_THRESHOLD:
+                self._rebuild_locked(fresh.values())
+                return
+            for product_id in removed:
+                self._unpost(product_id)
+            for p in changed:
+                self._add_locked(p)
+
+    def add(self, product):
+        with self._lock:
+            self._add_locked(product)
+
+    def remove(self, product_id):
+        with self._lock:
+            self._unpost(product_id)
+
+    def _prefix_ids(self, term, scan_limit):
+        tokens = self._tokens
+        i = bisect.bisect_left(tokens, (term,))
+        end = min(len(tokens), i + scan_limit)
+        while i < end and tokens[i][0].startswith(term):
+            yield tokens[i][1]
+            i += 1
+
+    def _prefix_set(self, term):
+        """Ids with a token starting with `term`, or None when too many match to be selective."""
+        ids = set(self._prefix_ids(term, self.PREFIX_SCAN + 1))
+        return None if len(ids) > self.PREFIX_SCAN else ids
+
+    def _substring_ids(self, term):
+        postings = [self._grams.get(gram) for gram in self._trigrams(term)]
+        if not all(postings):
+            return set()
+        postings.sort(key=len)
+        return postings[0].intersection(*postings[1:])
+
+    def search(self, q, limit=10):
+        query = " ".join((q or "").lower().split())
+        terms = query.split()
+        if not terms:
+            return []
+        lead = max(terms, key=len)
+        padded_terms = [" " + t for t in terms]
+        hits = {}
+        with self._lock:
+            docs = self._docs
+
+            def rank(product_ids):
+                for product_id in itertools.islice(product_ids, self.RANK_CAP):
+                    if product_id in hits:
+                        continue
+                    p, text, padded, model, static_key = docs[product_id]
+                    if not all(t in text for t in terms) or not all(t in padded for t in short_terms):
+                        continue
+                    if text.startswith(query) or model.startswith(query):
+                        tier = 0
+                    elif all(t in padded for t in padded_terms):
+                        tier = 1
+                    else:
+                        tier = 2
+                    hits[product_id] = ((tier,) + static_key, p)
+
+            # Long terms match anywhere (trigram postings); one- and two-letter terms must
+            # start a word. Sets too broad to narrow anything are skipped.
+            short_terms = [" " + t for t in terms if len(t) < 3]
+            narrowing = []
+            for t in terms:
+                if t == lead and len(t) < 3:
+                    continue  # the prefix walk below already covers it
+                ids = self._substring_ids(t) if len(t) >= 3 else self._prefix_set(t)
+                if ids is None:
+                    continue
+                if not ids:
+                    return []
+                narrowing.append(ids)
+            pool = None
+            if narrowing:
+                narrowing.sort(key=len)
+                pool = narrowing[0].intersection(*narrowing[1:])
+            if pool is not None and len(pool) <= self.RANK_CAP:
+                rank(pool)
+            else:
+                rank(pid for pid in self._prefix_ids(lead, self.PREFIX_SCAN) if pool is None or pid in pool)
+                if pool is not None and len(hits) < limit:
+                    rank(pool)
+        return [p for _key, p in heapq.nsmallest(limit, hits.values(), key=lambda h: h[0])]
+
+SQL_CATALOG_GENERATION = register_sql(
+    "catalog.generation", "SELECT generation FROM cache_generations WHERE cache_name = 'products'"
+)
+
+class ProductCatalog:
+    """Process-wide copy of the products table keyed by _normalize_pair(brand, model_name).
+
+    Readers never lock: they use the current snapshot dicts, which are either swapped
+    whole on reload or get single-key inserts (atomic under the GIL). A generation number
+    in cache_generations is bumped by every product insert. Each process checks it at most
+    every CATALOG_CHECK_SECONDS and reloads on change. Misses fall through to the database.
+    """
+
+    def __init__(self, check_seconds=30):
+        self.check_seconds = check_seconds
+        self.generation = None
+        self.by_key = {}
+        self.by_id = {}
+        self._checked_at = 0.0
+        self._reload_lock = threading.Lock()
+
+    @property
+    def loaded(self):
+        return self.generation is not None
+
+    def _db_generation(self, cur):
+        execute_sql(cur, SQL_CATALOG_GENERATION)
+        row = cur.fetchone()
+        return int(row[0]) if row else 0
+
+    def reload(self):
+        cur = conn.cursor()
+        try:
+            generation = self._db_generation(cur)
+            cur.arraysize = 5000
+            cur.execute(
+                "SELECT product_id, brand, model_name, category, image_url, verified, created_at "
+                "FROM products ORDER BY brand, model_name"
+            )
+            by_key, by_id = {}, {}
+            for row in cur:
+                p = CatalogProduct(int(row[0]), *row[1:])
+                by_key[_normalize_pair(p.brand, p.model_name)] = p
+                by_id[p.product_id] = p
+        finally:
+            cur.close()
+        # Swap both maps in; readers holding the old dicts finish on a consistent view
+        self.by_key, self.by_id = by_key, by_id
+        self.generation = generation
+        self._checked_at = time.monotonic()
+        product_suggest_index.sync(by_id.values())
+
+    def _maybe_reload(self):
+        if time.monotonic() - self._checked_at < self.check_seconds and self.loaded:
+            return
+        # Only one thread checks/reloads; everyone else keeps reading the current snapshot
+        if not self._reload_lock.acquire(blocking=False):
+            return
+        try:
+            if not self.loaded:
+                self.reload()
+                return
+            cur = conn.cursor()
+            try:
+                generation = self._db_generation(cur)
+            finally:
+                cur.close()
+            if generation != self.generation:
+                self.reload()
+            else:
+                self._checked_at = time.monotonic()
+        except Exception as e:
+            app.logger.warning("Product catalog refresh failed: %s", e)
+            self._checked_at = time.monotonic()
+        finally:
+            self._reload_lock.release()
+
+    def lookup(self, brand, model_name):
+        self._maybe_reload()
+        return self.by_key.get(_normalize_pair(brand, model_name))
+
+    def remember(self, products, generation):
+        """Record products this process just created under `generation` (its own bump).
+
+        If nobody else bumped in between, adopt the generation so our own write
+        doesn't trigger a full reload here.
+        """
+        for product in products:
+            self.by_key[_normalize_pair(product.brand, product.model_name)] = product
+            self.by_id[product.product_id] = product
+            product_suggest_index.add(product)
+        if self.loaded and generation == self.generation + 1:
+            self.generation = generation
+
+    def invalidate(self):
+        """Force a generation check on the next read (call after committing a bump)."""
+        self._checked_at = 0.0
+
+    def suggest(self, q, limit=10):
+        self._maybe_reload()
+        return product_suggest_index.search(q, limit)
+
+    def search(self, q):
+        """Case-insensitive substring match on brand/model/category, ordered like admin_products."""
+        self._maybe_reload()
+        needle = (q or '').strip().lower()
+        hits = [p for p in list(self.by_id.values())
+                if needle in (p.brand or '').lower()
+                or needle in (p.model_name or '').lower()
+                or needle in (p.category or '').lower()]
+        hits.sort(key=lambda p: ((p.brand or ''), (p.model_name or '')))
+        return hits
+
+_BUMP_CATALOG_GENERATION_SQL = backend_sql(
+    """
+    MERGE INTO cache_generations g
+    USING (SELECT 'products' AS cache_name FROM dual) src ON (g.cache_name = src.cache_name)
+    WHEN MATCHED THEN UPDATE SET g.generation = g.generation + 1, g.updated_at = SYSDATE
+    WHEN NOT MATCHED THEN INSERT (cache_name, generation, updated_at) VALUES (src.cache_name, 1, SYSDATE)
+    """,
+    sqlite="""
+    INSERT INTO cache_generations (cache_name, generation, updated_at) VALUES ('products', 1, SYSDATE)
+    ON CONFLICT (cache_name) DO UPDATE SET generation = generation + 1, updated_at = excluded.updated_at
+    """)
+
+def bump_catalog_generation(cur):
+    """Invalidate every process's product catalog; runs in the caller's transaction.
+
+    Returns the new generation (the row stays locked until commit, so it is ours).
+    """
+    cur.execute(_BUMP_CATALOG_GENERATION_SQL)
+    execute_sql(cur, SQL_CATALOG_GENERATION)
+    return int(cur.fetchone()[0])
+
+CATALOG_CHECK_SECONDS = int(os.getenv("CATALOG_CHECK_SECONDS", "30"))
+product_suggest_index = ProductSuggestIndex()
+product_catalog = ProductCatalog(check_seconds=CATALOG_CHECK_SECONDS)
+
+UNREAD_CACHE_BACKEND = os.getenv("UNREAD_CACHE_BACKEND", "memory").lower()
+UNREAD_CACHE_TTL = int(os.getenv("UNREAD_CACHE_TTL", "300"))
+UNREAD_CACHE_SIZE = int(os.getenv("UNREAD_CACHE_SIZE", "50000"))
+unread_count_cache = (NullCache() if UNREAD_CACHE_BACKEND == "none"
+                      else TtlLruCache(maxsize=UNREAD_CACHE_SIZE, ttl=UNREAD_CACHE_TTL))
+
+def set_unread_count_cache(backend):
+    """Swap in another cache backend (same interface as TtlLruCache)."""
+    global unread_count_cache
+    unread_count_cache = backend
+
+SQL_UNREAD_COUNT = register_sql(
+    "notifications.unread_count",
+    "SELECT COUNT(*) FROM notifications WHERE user_id = :1 AND status = 'Unread'"
+)
+
+def get_unread_count(user_id):
+    uid = int(user_id)
+    count = unread_count_cache.get(uid)
+    if count is not None:
+        return count
+    cur = conn.cursor()
+    try:
+        execute_sql(cur, SQL_UNREAD_COUNT, (uid,))
+        count = int(cur.fetchone()[0] or 0)
     finally:
-        if 'cur' in locals() and cur: cur.close()
-except Exception as e:
-    print(f"❌ Database connection failed: {e}")
-    conn = None
+        cur.close()
+    unread_count_cache.set(uid, count)
+    return count
 
 # NEW: This function runs on every page load to get the unread notification count for the bell icon.
 @app.context_processor
@@ -74,16 +1157,93 @@ def inject_notification_count():
     if 'user_id' not in session:
         return dict(unread_count=0)
     try:
-        cur = conn.cursor()
-        sql_count = f"SELECT COUNT(*) FROM notifications WHERE user_id = {int(session['user_id'])} AND status = 'Unread'"
-        cur.execute(sql_count)
-        count = cur.fetchone()[0]
-        return dict(unread_count=count)
+        return dict(unread_count=get_unread_count(session['user_id']))
     except Exception as e:
         print(f"Error fetching notification count: {e}")
         return dict(unread_count=0)
-    finally:
-        if 'cur' in locals() and cur: cur.close()
+
+# --- Row records ---
+# Compact __slots__ records built straight from cursor rows (cursor.rowfactory), in SELECT-list
+# order. Dates stay as datetime objects; templates format them with the |datefmt filter, so
+# rows that are never rendered (or rendered once) don't pay for strftime up front.
+class _Record:
+    __slots__ = ()
+
+    def as_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __repr__(self):
+        return f"{type(self).__name__}({', '.join(f'{n}={getattr(self, n)!r}' for n in self.__slots__)})"
+
+class WarrantyRecord(_Record):
+    __slots__ = ("warranty_id", "user_name", "product_name", "brand", "purchase_date", "expiry_date", "invoice_path", "status")
+
+    def __init__(self, warranty_id, user_name, product_name, brand, purchase_date, expiry_date, invoice_path, status):
+        self.warranty_id = warranty_id
+        self.user_name = user_name
+        self.product_name = product_name
+        self.brand = brand
+        self.purchase_date = purchase_date
+        self.expiry_date = expiry_date
+        self.invoice_path = invoice_path
+        self.status = status
+
+class ClaimRecord(_Record):
+    __slots__ = ("claim_id", "user_name", "product_name", "claim_date", "description", "status")
+
+    def __init__(self, claim_id, user_name, product_name, claim_date, description, status):
+        self.claim_id = claim_id
+        self.user_name = user_name
+        self.product_name = product_name
+        self.claim_date = claim_date
+        self.description = description
+        self.status = status
+
+class ProductRecord(_Record):
+    __slots__ = ("product_id", "brand", "model_name", "category", "image_url", "created_at")
+
+    def __init__(self, product_id, brand, model_name, category, image_url, created_at):
+        self.product_id = product_id
+        self.brand = brand
+        self.model_name = model_name
+        self.category = category
+        self.image_url = image_url
+        self.created_at = created_at
+
+class UserRecord(_Record):
+    __slots__ = ("user_id", "full_name", "email")
+
+    def __init__(self, user_id, full_name, email):
+        self.user_id = user_id
+        self.full_name = full_name
+        self.email = email
+
+class NotificationRecord(_Record):
+    __slots__ = ("notification_id", "message", "created_at", "status")
+
+    def __init__(self, notification_id, message, created_at, status):
+        self.notification_id = notification_id
+        self.message = message
+        self.created_at = created_at
+        self.status = status
+
+    def to_json(self):
+        # Key names the bell panel script already reads
+        return {
+            "NOTIFICATION_ID": self.notification_id,
+            "MESSAGE": self.message,
+            "CREATED_AT": self.created_at.strftime("%Y-%m-%d"),
+            "STATUS": self.status,
+        }
+
+def fetch_records(cur, record_cls):
+    """fetchall() of an executed cursor as record_cls instances (set after execute)."""
+    cur.rowfactory = record_cls
+    return cur.fetchall()
+
+@app.template_filter('datefmt')
+def datefmt_filter(value, fmt='%Y-%m-%d'):
+    return value.strftime(fmt) if value else ''
 
 # --- Helper Functions ---
 def allowed_file(filename):
@@ -99,32 +1259,18 @@ def login_required(f):
     return decorated_function
 
 # Email/notification helpers (inlined)
-def send_email(to_email, subject, body):
-    try:
-        if not (SMTP_USER and SMTP_PASS and SMTP_FROM and to_email):
-            return False
-        msg = EmailMessage()
-        msg["Subject"] = subject
-        msg["From"] = SMTP_FROM
-        msg["To"] = to_email
-        # Plain text fallback
-        msg.set_content(body)
-
-        # Simple HTML version with color accents
-        lower = (body or "").lower()
-        tag_label = "Notice"
-        tag_bg = "#eef2ff"  # indigo-50
-        tag_fg = "#4338ca"  # indigo-700
-        if "has expired" in lower:
-            tag_label = "Expired"
-            tag_bg = "#fee2e2"  # red-100
-            tag_fg = "#b91c1c"  # red-700
-        elif "expires on" in lower or "expiring" in lower:
-            tag_label = "Expiring"
-            tag_bg = "#fef3c7"  # amber-100
-            tag_fg = "#b45309"  # amber-700
-
-        html = f"""
+def _email_tag(body):
+    lower = (body or "").lower()
+    if "has expired" in lower:
+        return "Expired", "#fee2e2", "#b91c1c"  # red-100 / red-700
+    if "expires on" in lower or "expiring" in lower:
+        return "Expiring", "#fef3c7", "#b45309"  # amber-100 / amber-700
+    return "Notice", "#eef2ff", "#4338ca"  # indigo-50 / indigo-700
+
+def _render_email_html(subject, body):
+    # Simple HTML version with color accents
+    tag_label, tag_bg, tag_fg = _email_tag(body)
+    return f"""
         <html>
           <body style="font-family:Inter,Segoe UI,Arial,sans-serif;background:#0b1220;padding:24px;">
             <div style="max-width:600px;margin:0 auto;background:#101827;border:1px solid #1f2a44;border-radius:12px;padding:24px;color:#e5e7eb;">
@@ -139,108 +1285,933 @@ def send_email(to_email, subject, body):
           </body>
         </html>
         """
-        msg.add_alternative(html, subtype="html")
 
-        context = ssl.create_default_context()
-        with smtplib.SMTP(SMTP_HOST, SMTP_PORT) as server:
-            server.starttls(context=context)
+_TAG_COLORS = {
+    "Expired": ("#fee2e2", "#b91c1c"),  # red-100 / red-700
+    "Expiring": ("#fef3c7", "#b45309"),  # amber-100 / amber-700
+    "Notice": ("#eef2ff", "#4338ca"),  # indigo-50 / indigo-700
+}
+
+def _render_digest_html(subject, entries):
+    """Same card as _render_email_html, with one row per (tag, message) entry."""
+    items_html = []
+    for tag, message in entries:
+        bg, fg = _TAG_COLORS.get(tag, _TAG_COLORS["Notice"])
+        items_html.append(
+            f"""
+              <tr>
+                <td style="padding:10px 0;border-bottom:1px solid #1f2a44;vertical-align:top;width:90px;">
+                  <span style="display:inline-block;padding:4px 10px;border-radius:999px;background:{bg};color:{fg};font-weight:700;font-size:11px;">{tag}</span>
+                </td>
+                <td style="padding:10px 0 10px 10px;border-bottom:1px solid #1f2a44;line-height:1.5;color:#cbd5e1;">{html_escape(message)}</td>
+              </tr>"""
+        )
+    return f"""
+        <html>
+          <body style="font-family:Inter,Segoe UI,Arial,sans-serif;background:#0b1220;padding:24px;">
+            <div style="max-width:600px;margin:0 auto;background:#101827;border:1px solid #1f2a44;border-radius:12px;padding:24px;color:#e5e7eb;">
+              <h2 style="margin:0 0 12px 0;font-size:18px;color:#ffffff;">{subject}</h2>
+              <table style="width:100%;border-collapse:collapse;">{''.join(items_html)}
+              </table>
+              <hr style="border:none;border-top:1px solid #1f2a44;margin:18px 0;" />
+              <p style="margin:0;color:#9aa7bd;font-size:12px;">This is an automated message from Warracker.</p>
+            </div>
+          </body>
+        </html>
+        """
+
+def _smtp_configured():
+    return bool(SMTP_FROM and (not SMTP_AUTH or (SMTP_USER and SMTP_PASS)))
+
+def _build_email_message(to_email, subject, body, html=None):
+    msg = EmailMessage()
+    msg["Subject"] = subject
+    msg["From"] = SMTP_FROM
+    msg["To"] = to_email
+    # Plain text fallback
+    msg.set_content(body)
+    msg.add_alternative(html or _render_email_html(subject, body), subtype="html")
+    return msg
+
+class SmtpSession:
+    """One authenticated SMTP connection reused across many messages by a single worker."""
+
+    def __init__(self):
+        self.server = None
+        self.last_used = 0.0
+
+    def _connect(self):
+        self.close()
+        server = smtplib.SMTP(SMTP_HOST, SMTP_PORT, timeout=SMTP_TIMEOUT)
+        if SMTP_STARTTLS:
+            server.starttls(context=ssl.create_default_context())
+        if SMTP_AUTH:
             server.login(SMTP_USER, SMTP_PASS)
-            server.send_message(msg)
-        return True
-    except Exception as e:
-        print(f"Email send failed: {e}")
-        return False
+        self.server = server
 
-def create_notification(user_id, warranty_id, message, email_subject=None, send_email_now=True):
-    cur = None
+    def send(self, msg):
+        t0 = time.perf_counter()
+        ok = False
+        try:
+            if self.server is None or time.monotonic() - self.last_used > SMTP_IDLE_SECONDS:
+                self._connect()
+            try:
+                self.server.send_message(msg)
+            except smtplib.SMTPServerDisconnected:
+                # Server dropped the idle session; reconnect once and retry
+                self._connect()
+                self.server.send_message(msg)
+            ok = True
+        finally:
+            elapsed = time.perf_counter() - t0
+            metrics.observe_smtp(elapsed, ok)
+            trace = _current_trace()
+            if trace is not None:
+                trace["smtp_s"] += elapsed
+        self.last_used = time.monotonic()
+
+    def close(self):
+        if self.server is not None:
+            try:
+                self.server.quit()
+            except Exception:
+                pass
+            self.server = None
+
+def _deliver_now(to_email, subject, body, html=None, smtp=None):
+    own = smtp is None
+    smtp = smtp or SmtpSession()
+    try:
+        smtp.send(_build_email_message(to_email, subject, body, html))
+    finally:
+        if own:
+            smtp.close()
+
+def send_email(to_email, subject, body, html=None):
+    """Queue an email in the outbox and return; this never talks to SMTP.
+
+    Delivery needs a running outbox worker: the in-process pool started by `python app.py`,
+    or `flask outbox-worker` next to a WSGI server. With EMAIL_OUTBOX disabled the message is
+    delivered synchronously instead.
+    """
     try:
+        if not (_smtp_configured() and to_email):
+            return False
+        if not EMAIL_OUTBOX:
+            _deliver_now(to_email, subject, body, html)
+            return True
         cur = conn.cursor()
-        sql_chk = f"SELECT COUNT(*) FROM notifications WHERE user_id = {int(user_id)} AND warranty_id = {int(warranty_id)} AND message = :msg"
-        cur.execute(sql_chk, {"msg": message})
-        exists = cur.fetchone()[0]
-        if exists == 0:
+        try:
+            cur.setinputsizes(None, None, dbapi.CLOB, dbapi.CLOB)
             cur.execute(
-                f"INSERT INTO notifications (user_id, warranty_id, message) VALUES ({int(user_id)}, {int(warranty_id)}, :msg)",
-                {"msg": message}
+                "INSERT INTO email_outbox (to_email, subject, body_text, body_html) VALUES (:1, :2, :3, :4)",
+                (to_email, subject, body, html)
             )
             conn.commit()
-        if send_email_now:
-            cur.execute("SELECT email FROM users WHERE user_id = :1", (user_id,))
-            row = cur.fetchone()
-            to_email = row[0] if row else None
-            subject = email_subject or "Warracker Notification"
-            send_email(to_email, subject, message)
+        finally:
+            cur.close()
+        _outbox_wakeup.set()
+        return True
     except Exception as e:
+        print(f"Email send failed: {e}")
+        return False
+
+def send_emails_bulk(messages):
+    """Queue many (to_email, subject, body, html) messages with one array insert and commit."""
+    rows = [(to, subj, body, html) for to, subj, body, html in messages if to]
+    if not rows or not _smtp_configured():
+        return 0
+    if not EMAIL_OUTBOX:
+        smtp = SmtpSession()
         try:
-            print("create_notification failed")
-            print("Params:", {"user_id": user_id, "warranty_id": warranty_id, "message": message})
-        except Exception:
-            pass
-        print(f"create_notification error: {e}")
+            for to, subj, body, html in rows:
+                try:
+                    smtp.send(_build_email_message(to, subj, body, html))
+                except Exception as e:
+                    app.logger.warning("Email send failed: %s", e)
+                    smtp.close()
+        finally:
+            smtp.close()
+        return len(rows)
+    cur = conn.cursor()
+    try:
+        cur.setinputsizes(None, None, dbapi.CLOB, dbapi.CLOB)
+        cur.executemany(
+            "INSERT INTO email_outbox (to_email, subject, body_text, body_html) VALUES (:1, :2, :3, :4)",
+            rows
+        )
+        conn.commit()
     finally:
-        if cur:
-            cur.close()
+        cur.close()
+    _outbox_wakeup.set()
+    return len(rows)
 
-def run_cadence_warranty_notifications():
-    """Send warranty notifications with cadence rules:
-    - Expiring in 7 days or less: send daily
-    - Expiring in 8–30 days: send weekly (on Monday)
-    - Expired: send daily for 7 days after expiry
-    """
-    cur = None
+# --- Invoice storage ---
+# Invoices are stored once per content under uploads/blobs/<h[0:2]>/<h[2:4]>/<sha256>.<ext>.
+# warranties.invoice_path holds just "<sha256>.<ext>", so url_for('uploaded_file', ...) keeps
+# working, re-uploads and identical files from different users share one blob, and no
+# directory grows past a few hundred entries. Names of any other shape are legacy flat
+# files in uploads/ until `flask invoices-migrate` moves them.
+INVOICE_CHUNK_SIZE = 64 * 1024
+INVOICE_GC_GRACE_SECONDS = int(os.getenv("INVOICE_GC_GRACE_SECONDS", "86400"))
+# How /uploads hands the file body over: "none" (Python streams it), "x-sendfile"
+# (Apache mod_xsendfile / lighttpd) or "x-accel" (nginx internal location at INVOICE_ACCEL_PREFIX)
+INVOICE_SENDFILE = os.getenv("INVOICE_SENDFILE", "none").lower()
+INVOICE_ACCEL_PREFIX = os.getenv("INVOICE_ACCEL_PREFIX", "/_protected_uploads")
+INVOICE_OWNER_CACHE_TTL = int(os.getenv("INVOICE_OWNER_CACHE_TTL", "300"))
+app.config['USE_X_SENDFILE'] = INVOICE_SENDFILE == "x-sendfile"
+_INVOICE_REF_RE = re.compile(r"^([0-9a-f]{64})\.([a-z0-9]{1,8})$")
+
+class InvoiceStore:
+    def __init__(self, root):
+        self.root = root
+        self.blob_root = os.path.join(root, "blobs")
+        self.tmp_root = os.path.join(self.blob_root, "tmp")
+
+    @staticmethod
+    def is_ref(name):
+        return bool(name) and _INVOICE_REF_RE.match(name) is not None
+
+    def blob_path(self, ref):
+        m = _INVOICE_REF_RE.match(ref or "")
+        if m is None:
+            raise ValueError(f"not an invoice blob reference: {ref!r}")
+        digest = m.group(1)
+        return os.path.join(self.blob_root, digest[:2], digest[2:4], ref)
+
+    def locate(self, name):
+        """(directory, filename) on disk for an invoice_path value, blob or legacy."""
+        if self.is_ref(name):
+            return os.path.dirname(self.blob_path(name)), name
+        return self.root, name
+
+    def put_stream(self, stream, ext):
+        """Copy stream to a temp file in chunks while hashing, then link it in as a blob."""
+        os.makedirs(self.tmp_root, exist_ok=True)
+        digest = hashlib.sha256()
+        fd, tmp = tempfile.mkstemp(dir=self.tmp_root)
+        try:
+            with os.fdopen(fd, "wb") as out:
+                while True:
+                    chunk = stream.read(INVOICE_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    digest.update(chunk)
+                    out.write(chunk)
+            ref = f"{digest.hexdigest()}.{ext.lower()}"
+            path = self.blob_path(ref)
+            if os.path.exists(path):
+                # Same content already stored; touch it so a GC pass in progress leaves it alone
+                os.utime(path)
+            else:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                os.replace(tmp, path)
+                tmp = None
+            return ref
+        finally:
+            if tmp is not None and os.path.exists(tmp):
+                os.remove(tmp)
+
+    def put_upload(self, file_storage):
+        return self.put_stream(file_storage.stream, file_storage.filename.rsplit('.', 1)[1])
+
+    def put_file(self, path):
+        with open(path, "rb") as f:
+            return self.put_stream(f, path.rsplit('.', 1)[1])
+
+    def iter_blobs(self):
+        if not os.path.isdir(self.blob_root):
+            return
+        for shard in os.listdir(self.blob_root):
+            shard_dir = os.path.join(self.blob_root, shard)
+            if shard == "tmp" or not os.path.isdir(shard_dir):
+                continue
+            for sub in os.listdir(shard_dir):
+                sub_dir = os.path.join(shard_dir, sub)
+                for name in os.listdir(sub_dir):
+                    yield name, os.path.join(sub_dir, name)
+
+    def gc(self, referenced, grace_seconds=INVOICE_GC_GRACE_SECONDS, dry_run=False):
+        """Delete blobs not in `referenced` and older than the grace period.
+
+        The grace period covers uploads whose blob is written before the warranty row
+        referencing it commits (and dedup hits, which refresh the blob's mtime).
+        """
+        cutoff = time.time() - grace_seconds
+        # Thumbnails/previews (<sha256>.<kind>.<fmt>) live as long as their original
+        referenced_hashes = {r.split('.', 1)[0] for r in referenced if self.is_ref(r)}
+        removed = kept = freed = 0
+        for name, path in list(self.iter_blobs()):
+            if name in referenced or (not self.is_ref(name) and name.split('.', 1)[0] in referenced_hashes):
+                kept += 1
+                continue
+            st = os.stat(path)
+            if st.st_mtime > cutoff:
+                kept += 1
+                continue
+            removed += 1
+            freed += st.st_size
+            if not dry_run:
+                os.remove(path)
+        if not dry_run and os.path.isdir(self.tmp_root):
+            # Temp files left by a crashed upload
+            for name in os.listdir(self.tmp_root):
+                path = os.path.join(self.tmp_root, name)
+                if os.stat(path).st_mtime < cutoff:
+                    os.remove(path)
+        return {"removed": removed, "kept": kept, "freed_bytes": freed}
+
+invoice_store = InvoiceStore(app.config['UPLOAD_FOLDER'])
+
+def _referenced_invoices(cur):
+    cur.execute("SELECT DISTINCT invoice_path FROM warranties WHERE invoice_path IS NOT NULL")
+    return {r[0] for r in cur}
+
+def migrate_legacy_invoices(dry_run=False, keep_originals=False):
+    """Move flat uploads/ invoices into the blob store and repoint warranties.invoice_path."""
+    cur = conn.cursor()
+    try:
+        legacy = sorted(name for name in _referenced_invoices(cur) if not invoice_store.is_ref(name))
+        moves, missing = [], []
+        for name in legacy:
+            path = os.path.join(invoice_store.root, name)
+            if not os.path.isfile(path) or '.' not in name:
+                missing.append(name)
+                continue
+            moves.append((invoice_store.put_file(path) if not dry_run else None, name))
+        if moves and not dry_run:
+            cur.executemany("UPDATE warranties SET invoice_path = :1 WHERE invoice_path = :2", moves)
+            conn.commit()
+            invoice_owner_cache.clear()
+            if not keep_originals:
+                for _ref, name in moves:
+                    os.remove(os.path.join(invoice_store.root, name))
+        blobs = len({ref for ref, _name in moves})
+        return {"migrated": len(moves), "blobs": blobs, "missing": missing}
+    finally:
+        cur.close()
+
+@app.cli.command("invoices-migrate")
+@click.option("--dry-run", is_flag=True, help="Only report what would move.")
+@click.option("--keep-originals", is_flag=True, help="Leave the flat files in uploads/ after repointing.")
+def invoices_migrate_command(dry_run, keep_originals):
+    """Move legacy uploads/<name> invoices into the content-addressed blob store."""
+    result = migrate_legacy_invoices(dry_run=dry_run, keep_originals=keep_originals)
+    verb = "Would migrate" if dry_run else "Migrated"
+    click.echo(f"{verb} {result['migrated']} invoice files" + ("" if dry_run else f" into {result['blobs']} blobs"))
+    for name in result["missing"]:
+        click.echo(f"  missing on disk, left as is: {name}")
+
+@app.cli.command("invoices-gc")
+@click.option("--grace-hours", default=INVOICE_GC_GRACE_SECONDS / 3600.0, show_default=True,
+              help="Keep unreferenced blobs younger than this.")
+@click.option("--dry-run", is_flag=True, help="Only report what would be deleted.")
+def invoices_gc_command(grace_hours, dry_run):
+    """Delete invoice blobs no warranty references any more."""
+    cur = conn.cursor()
     try:
+        referenced = _referenced_invoices(cur)
+    finally:
+        cur.close()
+    result = invoice_store.gc(referenced, grace_seconds=int(grace_hours * 3600), dry_run=dry_run)
+    verb = "Would remove" if dry_run else "Removed"
+    click.echo(f"{verb} {result['removed']} blobs ({result['freed_bytes'] / 1e6:.1f} MB), kept {result['kept']}")
+
+# --- Invoice serving ---
+# Blobs never change, so their hash is a strong ETag and responses may be cached as
+# immutable; "private" keeps shared proxies from storing another user's invoice. Legacy
+# flat files get a content-hash ETag computed once per (path, mtime, size) and a short max-age.
+INVOICE_IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+INVOICE_LEGACY_MAX_AGE = 3600
+
+# user_id -> frozenset of invoice_path values the user may download; one query per user per TTL
+invoice_owner_cache = TtlLruCache(maxsize=50000, ttl=INVOICE_OWNER_CACHE_TTL)
+_legacy_etags = TtlLruCache(maxsize=10000, ttl=24 * 3600)
+
+SQL_USER_INVOICES = register_sql(
+    "invoices.user_refs", "SELECT invoice_path FROM warranties WHERE user_id = :1 AND invoice_path IS NOT NULL"
+)
+
+def user_invoice_refs(user_id, refresh=False):
+    uid = int(user_id)
+    refs = None if refresh else invoice_owner_cache.get(uid)
+    if refs is None:
         cur = conn.cursor()
+        try:
+            execute_sql(cur, SQL_USER_INVOICES, (uid,))
+            refs = frozenset(r[0] for r in cur)
+        finally:
+            cur.close()
+        invoice_owner_cache.set(uid, refs)
+    return refs
+
+def invalidate_user_invoices(user_id):
+    invoice_owner_cache.delete(int(user_id))
+
+def user_owns_invoice(user_id, ref):
+    # invalidate_user_invoices only reaches this process, so a miss may just be another
+    # worker's upload: re-query once before answering no
+    return ref in user_invoice_refs(user_id) or ref in user_invoice_refs(user_id, refresh=True)
+
+def _legacy_etag(path):
+    st = os.stat(path)
+    key = (path, st.st_mtime_ns, st.st_size)
+    etag = _legacy_etags.get(key)
+    if etag is None:
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(INVOICE_CHUNK_SIZE), b""):
+                digest.update(chunk)
+        etag = digest.hexdigest()
+        _legacy_etags.set(key, etag)
+    return etag
+
+def serve_invoice(name):
+    immutable = invoice_store.is_ref(name)
+    directory, filename = invoice_store.locate(name)
+    path = safe_join(directory, filename)
+    if path is None or not os.path.isfile(path):
+        abort(404)
+    etag = name.split('.', 1)[0] if immutable else _legacy_etag(path)
+    return _send_stored_file(path, filename, etag, immutable)
+
+def _send_stored_file(path, filename, etag, immutable):
+    if INVOICE_SENDFILE == "x-accel":
+        # nginx serves the body (and Range) from its internal location; we only answer
+        # conditional requests and set the headers it passes through
+        rel = os.path.relpath(path, invoice_store.root).replace(os.sep, "/")
+        response = Response(mimetype=mimetypes.guess_type(filename)[0] or "application/octet-stream")
+        response.headers["X-Accel-Redirect"] = f"{INVOICE_ACCEL_PREFIX.rstrip('/')}/{rel}"
+        response.set_etag(etag)
+        response.make_conditional(request)
+    else:
+        # send_file answers If-None-Match/If-Range/Range itself; with USE_X_SENDFILE it sets
+        # X-Sendfile and leaves the body to the proxy
+        response = send_file(path, etag=etag, conditional=True, max_age=None)
+    response.cache_control.no_cache = None
+    response.cache_control.private = True
+    response.cache_control.public = False
+    if immutable:
+        response.cache_control.max_age = INVOICE_IMMUTABLE_MAX_AGE
+        response.cache_control.immutable = True
+    else:
+        response.cache_control.max_age = INVOICE_LEGACY_MAX_AGE
+    return response
+
+# --- Invoice thumbnails ---
+# Listing pages show a small thumbnail and the detail page a larger preview instead of the
+# multi-megabyte original, which now loads only when opened or downloaded. Derivatives are
+# made off the request path on a small worker pool and stored next to the blob as
+# <sha256>.thumb.<fmt> / <sha256>.preview.<fmt>; like the blob they never change.
+try:
+    from PIL import Image, ImageOps, features as _pil_features
+except ImportError:  # without Pillow every invoice shows the file-type placeholder
+    Image = None
+THUMB_WORKERS = int(os.getenv("THUMB_WORKERS", "2"))
+THUMB_SIZES = {"thumb": 160, "preview": 960}  # longest edge in px
+THUMB_QUALITY = int(os.getenv("THUMB_QUALITY", "80"))
+PDFTOPPM = shutil.which("pdftoppm")  # poppler-utils, renders the first page of PDFs
+_THUMB_FORMAT = ("webp", "WEBP") if Image is not None and _pil_features.check("webp") else ("jpg", "JPEG")
+
+_thumb_pool = None
+_thumb_pending = set()
+_thumb_lock = threading.Lock()
+
+def derivative_name(ref, kind):
+    return f"{ref.split('.', 1)[0]}.{kind}.{_THUMB_FORMAT[0]}"
+
+def derivative_path(ref, kind):
+    return os.path.join(os.path.dirname(invoice_store.blob_path(ref)), derivative_name(ref, kind))
+
+def _open_invoice_image(ref):
+    path = invoice_store.blob_path(ref)
+    longest = max(THUMB_SIZES.values())
+    if ref.endswith(".pdf"):
+        if PDFTOPPM is None:
+            return None
+        os.makedirs(invoice_store.tmp_root, exist_ok=True)
+        with tempfile.TemporaryDirectory(dir=invoice_store.tmp_root) as tmp:
+            out = os.path.join(tmp, "page")
+            subprocess.run(
+                [PDFTOPPM, "-f", "1", "-l", "1", "-singlefile", "-scale-to", str(longest), "-jpeg", path, out],
+                check=True, capture_output=True, timeout=60
+            )
+            img = Image.open(out + ".jpg")
+            img.load()
+            return img
+    img = Image.open(path)
+    # JPEG only: let the decoder downscale by 1/2..1/8 instead of decoding a 12 MP photo in full
+    img.draft("RGB", (longest, longest))
+    return ImageOps.exif_transpose(img)
+
+def generate_derivatives(ref, force=False):
+    """Write the missing thumbnail/preview for one invoice blob; returns the kinds written."""
+    if Image is None:
+        return []
+    todo = [k for k in THUMB_SIZES if force or not os.path.exists(derivative_path(ref, k))]
+    if not todo:
+        return []
+    img = _open_invoice_image(ref)
+    if img is None:
+        return []
+    img = img.convert("RGB")
+    os.makedirs(invoice_store.tmp_root, exist_ok=True)
+    # Largest first so each smaller size is scaled down from the previous one
+    for kind in sorted(todo, key=lambda k: -THUMB_SIZES[k]):
+        img.thumbnail((THUMB_SIZES[kind], THUMB_SIZES[kind]))
+        fd, tmp = tempfile.mkstemp(dir=invoice_store.tmp_root)
+        try:
+            with os.fdopen(fd, "wb") as out:
+                img.save(out, _THUMB_FORMAT[1], quality=THUMB_QUALITY)
+            os.replace(tmp, derivative_path(ref, kind))
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+    return todo
+
+def _thumb_job(ref):
+    try:
+        generate_derivatives(ref)
+    except Exception:
+        app.logger.exception("Thumbnail generation failed for %s", ref)
+    finally:
+        with _thumb_lock:
+            _thumb_pending.discard(ref)
+
+def schedule_derivatives(ref):
+    """Queue thumbnail/preview generation for an invoice blob (no-op if already queued)."""
+    global _thumb_pool
+    if Image is None or not invoice_store.is_ref(ref):
+        return False
+    with _thumb_lock:
+        if ref in _thumb_pending:
+            return False
+        if _thumb_pool is None:
+            _thumb_pool = ThreadPoolExecutor(max_workers=THUMB_WORKERS, thread_name_prefix="thumbs")
+        _thumb_pending.add(ref)
+    _thumb_pool.submit(_thumb_job, ref)
+    return True
+
+def _thumbnail_placeholder(name):
+    label = name.rsplit('.', 1)[-1].upper()[:4] if '.' in name else "FILE"
+    svg = (
+        '<svg xmlns="http://www.w3.org/2000/svg" width="120" height="120" viewBox="0 0 120 120">'
+        '<rect width="120" height="120" rx="12" fill="#1f2a44"/>'
+        '<text x="60" y="68" font-family="Inter,Segoe UI,Arial,sans-serif" font-size="24" font-weight="700" '
+        f'fill="#9aa7bd" text-anchor="middle">{html_escape(label)}</text></svg>'
+    )
+    # Not cached: the real thumbnail replaces it once the worker has written it
+    return Response(svg, mimetype="image/svg+xml", headers={"Cache-Control": "no-store"})
+
+def serve_invoice_derivative(name, kind):
+    if invoice_store.is_ref(name):
+        path = derivative_path(name, kind)
+        if os.path.isfile(path):
+            etag = f"{name.split('.', 1)[0]}-{kind}{THUMB_SIZES[kind]}"
+            return _send_stored_file(path, os.path.basename(path), etag, True)
+        # Uploaded before the worker ran (or it failed): try again in the background
+        schedule_derivatives(name)
+    return _thumbnail_placeholder(name)
+
+@app.cli.command("thumbnails-backfill")
+@click.option("--force", is_flag=True, help="Regenerate derivatives that already exist.")
+@click.option("--workers", default=THUMB_WORKERS, show_default=True, help="Parallel image workers.")
+def thumbnails_backfill_command(force, workers):
+    """Generate thumbnails and previews for every referenced invoice blob."""
+    if Image is None:
+        click.echo("Pillow is not installed; no thumbnails can be generated.")
+        return
+    cur = conn.cursor()
+    try:
+        refs = _referenced_invoices(cur)
+    finally:
+        cur.close()
+    blobs = sorted(r for r in refs if invoice_store.is_ref(r))
+
+    def run(ref):
+        try:
+            return ref, generate_derivatives(ref, force=force), None
+        except Exception as e:
+            return ref, [], e
+
+    t0 = time.perf_counter()
+    written = failed = 0
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="thumbs-backfill") as pool:
+        for ref, kinds, err in pool.map(run, blobs):
+            if err is not None:
+                failed += 1
+                click.echo(f"  {ref}: {err}")
+            elif kinds:
+                written += 1
+    click.echo(f"Thumbnails: {written} invoices processed, {len(blobs) - written - failed} already done or "
+          f"unsupported, {failed} failed in {time.perf_counter() - t0:.1f}s")
+    if PDFTOPPM is None:
+        click.echo("pdftoppm not found; PDF invoices keep the placeholder (install poppler-utils).")
+    if len(refs) > len(blobs):
+        click.echo(f"{len(refs) - len(blobs)} invoices are still legacy flat files; run `flask invoices-migrate` first.")
+
+# --- Email outbox workers ---
+# Rows move Pending -> Sending (leased) -> Sent, or back to Pending with exponential backoff,
+# or to Dead after EMAIL_MAX_ATTEMPTS. A lease that expires (worker crash) is reclaimed.
+_outbox_wakeup = threading.Event()
+_outbox_workers = []
+
+def _read_lob(v):
+    return v.read() if hasattr(v, "read") else v
+
+def _claim_outbox_batch(limit):
+    cur = conn.cursor()
+    try:
+        # Rows are locked as they are fetched, so keep the fetch size at the batch size
+        cur.arraysize = limit
+        cur.prefetchrows = limit
         cur.execute(
             """
-            SELECT u.user_id, w.warranty_id, w.product_name, TRUNC(w.expiry_date)
-            FROM warranties w
-            JOIN users u ON w.user_id = u.user_id
-            WHERE w.expiry_date <= TRUNC(SYSDATE) + 30
+            SELECT outbox_id, to_email, subject, body_text, body_html, attempts
+            FROM email_outbox
+            WHERE (status = 'Pending' AND next_attempt_at <= SYSDATE)
+               OR (status = 'Sending' AND locked_until < SYSDATE)
+            ORDER BY outbox_id
+            FOR UPDATE SKIP LOCKED
             """
         )
-        rows = cur.fetchall()
-        from datetime import date as _d
-        today = _d.today()
-        weekday = today.weekday()  # Monday=0
-
-        for uid, wid, pname, exp_dt in rows:
-            exp_date = exp_dt.date()
-            days_until = (exp_date - today).days
-            should_send = False
-            cadence_tag = "Notice"
-            if days_until < 0:
-                # expired: send daily for 7 days
-                if abs(days_until) <= 7:
-                    should_send = True
-                    cadence_tag = "Expired"
-            elif days_until <= 7:
-                # within a week: daily
-                should_send = True
-                cadence_tag = "Expiring"
-            elif days_until <= 30:
-                # 8–30 days: weekly (Monday)
-                if weekday == 0:
-                    should_send = True
-                    cadence_tag = "Expiring"
-
-            if not should_send:
-                continue
+        rows = [(r[0], r[1], r[2], _read_lob(r[3]), _read_lob(r[4]), int(r[5] or 0)) for r in cur.fetchmany(limit)]
+        if rows:
+            cur.executemany(
+                "UPDATE email_outbox SET status = 'Sending', locked_until = SYSDATE + :1 / 86400 WHERE outbox_id = :2",
+                [(EMAIL_LEASE_SECONDS, r[0]) for r in rows]
+            )
+        conn.commit()
+        return rows
+    finally:
+        cur.close()
 
-            if days_until < 0:
-                msg = f"Your warranty for '{pname}' has expired on {exp_date.strftime('%B %d, %Y')}."
-                subject = "🔴 Warracker • Warranty Expired"
-            else:
-                msg = f"Your warranty for '{pname}' expires on {exp_date.strftime('%B %d, %Y')}."
-                # Distinguish weekly vs daily subtly in subject
-                subject = "🟡 Warracker • Warranty Reminder"
+def _finish_outbox_rows(sent_ids, failures):
+    cur = conn.cursor()
+    try:
+        if sent_ids:
+            cur.executemany(
+                "UPDATE email_outbox SET status = 'Sent', sent_at = SYSDATE, locked_until = NULL WHERE outbox_id = :1",
+                [(i,) for i in sent_ids]
+            )
+        if failures:
+            retry, dead = [], []
+            for outbox_id, attempts, err in failures:
+                if attempts >= EMAIL_MAX_ATTEMPTS:
+                    dead.append((attempts, err[:1000], outbox_id))
+                else:
+                    delay = EMAIL_BACKOFF_SECONDS * (2 ** (attempts - 1))
+                    retry.append((attempts, err[:1000], delay, outbox_id))
+            if retry:
+                cur.executemany(
+                    """
+                    UPDATE email_outbox
+                    SET status = 'Pending', attempts = :1, last_error = :2,
+                        next_attempt_at = SYSDATE + :3 / 86400, locked_until = NULL
+                    WHERE outbox_id = :4
+                    """,
+                    retry
+                )
+            if dead:
+                cur.executemany(
+                    "UPDATE email_outbox SET status = 'Dead', attempts = :1, last_error = :2, locked_until = NULL WHERE outbox_id = :3",
+                    dead
+                )
+        conn.commit()
+    finally:
+        cur.close()
 
-            # Send email immediately; notification record is inserted once due to unique index
-            create_notification(int(uid), int(wid), msg, email_subject=subject, send_email_now=True)
-    except Exception as e:
-        print(f"run_cadence_warranty_notifications error: {e}")
+def drain_email_outbox(smtp=None, batch_size=None):
+    """Deliver one claimed batch; returns the number of rows processed."""
+    batch = _claim_outbox_batch(batch_size or EMAIL_BATCH_SIZE)
+    if not batch:
+        return 0
+    own = smtp is None
+    smtp = smtp or SmtpSession()
+    sent, failures = [], []
+    try:
+        for outbox_id, to_email, subject, body, html, attempts in batch:
+            try:
+                smtp.send(_build_email_message(to_email, subject, body, html))
+                sent.append(outbox_id)
+            except Exception as e:
+                app.logger.warning("Outbox delivery failed for #%s: %s", outbox_id, e)
+                failures.append((outbox_id, attempts + 1, str(e)))
+                # Start the next message on a clean connection
+                smtp.close()
+    finally:
+        _finish_outbox_rows(sent, failures)
+        if own:
+            smtp.close()
+    return len(batch)
+
+def _email_worker_loop():
+    smtp = SmtpSession()
+    while True:
+        processed = 0
+        try:
+            with app.app_context():
+                processed = drain_email_outbox(smtp)
+        except Exception:
+            app.logger.exception("Email worker error")
+            smtp.close()
+        if not processed:
+            # Idle: drop the SMTP session once it goes stale, then wait for new mail or the poll tick
+            if smtp.server is not None and time.monotonic() - smtp.last_used > SMTP_IDLE_SECONDS:
+                smtp.close()
+            _outbox_wakeup.wait(EMAIL_POLL_SECONDS)
+            _outbox_wakeup.clear()
+
+def start_email_workers_if_enabled():
+    # Avoid double-start under the Flask reloader
+    if app.debug and os.environ.get("WERKZEUG_RUN_MAIN") != "true":
+        return
+    if not EMAIL_OUTBOX or _outbox_workers:
+        return
+    for i in range(EMAIL_WORKERS):
+        t = threading.Thread(target=_email_worker_loop, name=f"email-outbox-worker-{i}", daemon=True)
+        t.start()
+        _outbox_workers.append(t)
+
+@app.cli.command("outbox-drain")
+def outbox_drain_command():
+    """Deliver every due outbox message once (e.g. against a local aiosmtpd) and exit."""
+    smtp = SmtpSession()
+    total = 0
+    try:
+        while True:
+            n = drain_email_outbox(smtp)
+            if not n:
+                break
+            total += n
+    finally:
+        smtp.close()
+    click.echo(f"Processed {total} outbox message(s).")
+
+@app.cli.command("outbox-worker")
+@click.option("--workers", default=EMAIL_WORKERS, show_default=True, help="Delivery threads.")
+def outbox_worker_command(workers):
+    """Deliver outbox mail until stopped (run as its own process next to gunicorn/uwsgi).
+
+    Web processes only queue mail; this polls email_outbox every EMAIL_POLL_SECONDS.
+    """
+    for i in range(workers):
+        threading.Thread(target=_email_worker_loop, name=f"email-outbox-worker-{i}", daemon=True).start()
+    click.echo(f"Outbox worker running with {workers} thread(s), polling every {EMAIL_POLL_SECONDS:g}s; Ctrl+C stops it.")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+
+def _reminder_message(product_name, exp_date, today):
+    if exp_date < today:
+        return f"Your warranty for '{product_name}' has expired on {exp_date.strftime('%B %d, %Y')}."
+    return f"Your warranty for '{product_name}' expires on {exp_date.strftime('%B %d, %Y')}."
+
+# Insert-if-absent keyed on ux_notifications_user_warranty_message; arraydmlrowcounts tells
+# us per row whether MERGE inserted (1) or found an existing notification (0).
+_MERGE_NOTIFICATION_SQL = register_sql("notifications.merge", """
+    MERGE INTO notifications n
+    USING (SELECT :1 AS user_id, :2 AS warranty_id, :3 AS message FROM dual) src
+    ON (n.user_id = src.user_id AND n.warranty_id = src.warranty_id AND n.message = src.message)
+    WHEN NOT MATCHED THEN
+        INSERT (user_id, warranty_id, message) VALUES (src.user_id, src.warranty_id, src.message)
+""", sqlite="""
+    INSERT INTO notifications (user_id, warranty_id, message) VALUES (:1, :2, :3)
+    ON CONFLICT (user_id, warranty_id, message) DO NOTHING
+""")
+NOTIFICATION_BATCH_SIZE = 5000
+
+# IN-lists are padded up to one of these sizes (repeating the last id), so any batch of
+# user ids maps onto four statement texts instead of one per distinct length
+_IN_LIST_BUCKETS = (1, 10, 100, 1000)
+
+def _user_emails_sql(n):
+    placeholders = ", ".join(f":{k + 1}" for k in range(n))
+    return register_sql(f"users.emails_in_{n}", f"SELECT user_id, email FROM users WHERE user_id IN ({placeholders})")
+
+def _lookup_user_emails(cur, user_ids):
+    emails = {}
+    ids = sorted(set(int(u) for u in user_ids))
+    for i in range(0, len(ids), 1000):  # Oracle IN-list limit
+        chunk = ids[i:i + 1000]
+        bucket = next(b for b in _IN_LIST_BUCKETS if b >= len(chunk))
+        execute_sql(cur, _user_emails_sql(bucket), chunk + [chunk[-1]] * (bucket - len(chunk)))
+        for uid, email in cur:
+            emails[int(uid)] = email
+    return emails
+
+def create_notifications_bulk(items, email_subject=None, send_email_now=False):
+    """Write many (user_id, warranty_id, message) notifications in array-bound MERGE batches
+    with a single commit. Returns the subset of items that were newly inserted.
+
+    With send_email_now every item is emailed (cadence reminders repeat even when the
+    in-app notification already exists), using one email lookup for all users.
+    """
+    rows = list(dict.fromkeys((int(u), int(w), m) for u, w, m in items))
+    if not rows:
+        return []
+    new_rows = []
+    cur = None
+    try:
+        cur = conn.cursor()
+        for i in range(0, len(rows), NOTIFICATION_BATCH_SIZE):
+            batch = rows[i:i + NOTIFICATION_BATCH_SIZE]
+            executemany_sql(cur, _MERGE_NOTIFICATION_SQL, batch, batcherrors=True, arraydmlrowcounts=True)
+            failed = set()
+            for err in cur.getbatcherrors():
+                # ORA-00001 means a concurrent writer inserted the same row first: not new
+                if err.code != 1:
+                    # Row values stay out of the log (user ids and reminder text)
+                    app.logger.warning("create_notifications_bulk row %d failed: %s", i + err.offset, err.message)
+                failed.add(err.offset)
+            counts = cur.getarraydmlrowcounts()
+            for ix, row in enumerate(batch):
+                if ix not in failed and ix < len(counts) and counts[ix] > 0:
+                    new_rows.append(row)
+        conn.commit()
+        # Write-through: bump cached unread counts for users who got new notifications
+        new_per_user = {}
+        for uid, _wid, _msg in new_rows:
+            new_per_user[uid] = new_per_user.get(uid, 0) + 1
+        for uid, n in new_per_user.items():
+            unread_count_cache.incr(uid, n)
+        if send_email_now:
+            emails = _lookup_user_emails(cur, [r[0] for r in rows])
+            subject = email_subject or "Warracker Notification"
+            send_emails_bulk((emails.get(uid), subject, message, None) for uid, _wid, message in rows)
+    except Exception:
+        app.logger.exception("create_notifications_bulk failed (%d rows)", len(rows))
+    finally:
+        if cur:
+            cur.close()
+    return new_rows
+
+def create_notification(user_id, warranty_id, message, email_subject=None, send_email_now=True):
+    return bool(create_notifications_bulk([(user_id, warranty_id, message)], email_subject=email_subject, send_email_now=send_email_now))
+
+# Cadence rules evaluated in SQL; only rows due today come back, tag and message precomputed.
+# The message text must match _reminder_message() byte for byte so MERGE dedupes against
+# notifications created elsewhere ('fmMonthfm DD' = unpadded month name, zero-padded day).
+_CADENCE_DUE_SQL = """
+    SELECT user_id, warranty_id,
+           CASE WHEN days_until < 0 THEN 'Expired' ELSE 'Expiring' END AS tag,
+           'Your warranty for ''' || product_name || ''' '
+             || CASE WHEN days_until < 0 THEN 'has expired on ' ELSE 'expires on ' END
+             || TO_CHAR(exp_day, 'fmMonthfm DD, YYYY', 'NLS_DATE_LANGUAGE=ENGLISH') || '.' AS message
+    FROM (
+        SELECT w.user_id, w.warranty_id, w.product_name, TRUNC(w.expiry_date) AS exp_day,
+               TRUNC(w.expiry_date) - TRUNC(SYSDATE) AS days_until
+        FROM warranties w
+        WHERE w.expiry_date >= TRUNC(SYSDATE) - 7
+          AND w.expiry_date < TRUNC(SYSDATE) + 31
+          AND ORA_HASH(w.user_id, :max_bucket) = :shard
+    )
+    WHERE days_until BETWEEN -7 AND 7
+       OR (days_until BETWEEN 8 AND 30 AND :is_monday = 1)
+"""
+CADENCE_SHARDS = int(os.getenv("CADENCE_SHARDS", "8"))
+CADENCE_WORKERS = int(os.getenv("CADENCE_WORKERS", "4"))
+
+def _digest_due_today(mode, today=None):
+    if mode == "daily":
+        return True
+    if mode == "weekly":
+        return (today or date.today()).weekday() == DIGEST_WEEKDAY
+    return False
+
+def send_reminder_digests(entries):
+    """Group (user_id, tag, message) entries per user and queue one digest email each."""
+    by_user = {}
+    for uid, tag, msg in entries:
+        by_user.setdefault(int(uid), []).append((tag, msg))
+    if not by_user:
+        return 0
+    cur = conn.cursor()
+    try:
+        emails = _lookup_user_emails(cur, by_user.keys())
     finally:
-        if cur:
+        cur.close()
+    messages = []
+    for uid, items in by_user.items():
+        # Expired first, then by message so the list reads chronologically per tag
+        items.sort(key=lambda it: (it[0] != 'Expired', it[1]))
+        n_expired = sum(1 for tag, _ in items if tag == 'Expired')
+        subject = f"Warracker • {len(items)} warranty reminder{'s' if len(items) != 1 else ''}"
+        if n_expired:
+            subject = f"🔴 {subject} ({n_expired} expired)"
+        else:
+            subject = f"🟡 {subject}"
+        text = "\n".join(f"- [{tag}] {msg}" for tag, msg in items)
+        messages.append((emails.get(uid), subject, text, _render_digest_html(subject, items)))
+    return send_emails_bulk(messages)
+
+def _run_cadence_shard(shard, shards, is_monday, email_mode):
+    t0 = time.perf_counter()
+    stats = {"shard": shard}
+    # Each shard runs in its own app context, i.e. on its own pooled session
+    with app.app_context():
+        cur = conn.cursor()
+        try:
+            cur.arraysize = NOTIFICATION_BATCH_SIZE
+            cur.execute(_CADENCE_DUE_SQL, {"max_bucket": shards - 1, "shard": shard, "is_monday": 1 if is_monday else 0})
+            expired_items, reminder_items = [], []
+            for uid, wid, tag, msg in cur:
+                (expired_items if tag == 'Expired' else reminder_items).append((int(uid), int(wid), msg))
+        finally:
             cur.close()
+        t1 = time.perf_counter()
+        digests = 0
+        if email_mode == "immediate":
+            # Emails go out every due day; notification rows are inserted once thanks to MERGE
+            new = create_notifications_bulk(expired_items, email_subject="🔴 Warracker • Warranty Expired", send_email_now=True)
+            new += create_notifications_bulk(reminder_items, email_subject="🟡 Warracker • Warranty Reminder", send_email_now=True)
+        else:
+            new = create_notifications_bulk(expired_items + reminder_items, send_email_now=False)
+            if _digest_due_today(email_mode):
+                entries = [(uid, 'Expired', msg) for uid, _wid, msg in expired_items]
+                entries += [(uid, 'Expiring', msg) for uid, _wid, msg in reminder_items]
+                digests = send_reminder_digests(entries)
+        t2 = time.perf_counter()
+    stats.update(rows=len(expired_items) + len(reminder_items), new=len(new), emails_digest=digests,
+                 query_ms=round((t1 - t0) * 1000, 1), write_ms=round((t2 - t1) * 1000, 1),
+                 total_ms=round((t2 - t0) * 1000, 1))
+    return stats
+
+def run_cadence_warranty_notifications(shards=None, workers=None, email_mode=None):
+    """Send warranty notifications with cadence rules:
+    - Expiring in 7 days or less: send daily
+    - Expiring in 8–30 days: send weekly (on Monday)
+    - Expired: send daily for 7 days after expiry
+
+    Work is partitioned by ORA_HASH(user_id) into `shards` and run on a thread pool.
+    email_mode (default NOTIFY_EMAIL_MODE) picks immediate emails or a per-user digest.
+    Returns the per-shard timing report.
+    """
+    email_mode = (email_mode or NOTIFY_EMAIL_MODE).lower()
+    if email_mode not in ("immediate", "daily", "weekly"):
+        email_mode = "immediate"
+    shards = max(1, int(shards or CADENCE_SHARDS))
+    workers = max(1, int(workers or CADENCE_WORKERS))
+    is_monday = date.today().weekday() == 0
+    t0 = time.perf_counter()
+    report = []
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="cadence-shard") as pool:
+        futures = [pool.submit(_run_cadence_shard, shard, shards, is_monday, email_mode) for shard in range(shards)]
+        for f in futures:
+            try:
+                report.append(f.result())
+            except Exception:
+                app.logger.exception("run_cadence_warranty_notifications shard failed")
+    for st in report:
+        app.logger.info("cadence shard %s/%s: rows=%s new=%s digests=%s query=%sms write=%sms total=%sms",
+                        st['shard'], shards, st['rows'], st['new'], st['emails_digest'], st['query_ms'],
+                        st['write_ms'], st['total_ms'])
+    app.logger.info("cadence run: %s due rows in %sms (%s shards, %s workers, email mode %s)",
+                    sum(st['rows'] for st in report), round((time.perf_counter() - t0) * 1000, 1), shards, workers,
+                    email_mode)
+    return report
 
 def run_batch_warranty_notifications(days=7):
     cur = None
@@ -259,69 +2230,547 @@ def run_batch_warranty_notifications(days=7):
             (int(days),)
         )
         rows = cur.fetchall()
-        from datetime import date as _d
-        today = _d.today()
-        for uid, wid, pname, exp_dt in rows:
-            exp_date = exp_dt.date()
-            if exp_date < today:
-                msg = f"Your warranty for '{pname}' has expired on {exp_date.strftime('%B %d, %Y')}."
-            else:
-                msg = f"Your warranty for '{pname}' expires on {exp_date.strftime('%B %d, %Y')}."
-            create_notification(int(uid), int(wid), msg, email_subject="Warranty Reminder", send_email_now=True)
-    except Exception as e:
-        print(f"run_batch_warranty_notifications error: {e}")
+        today = date.today()
+        items = [(int(uid), int(wid), _reminder_message(pname, exp_dt.date(), today)) for uid, wid, pname, exp_dt in rows]
+        create_notifications_bulk(items, email_subject="Warranty Reminder", send_email_now=True)
+    except Exception:
+        app.logger.exception("run_batch_warranty_notifications failed")
     finally:
         if cur:
             cur.close()
 
-def generate_warranty_notifications(user_id, days=7, send_email_now=False):
+# --- Incremental notification generator ---
+# A warranty needs a reminder when it enters the reminder window (expiry - days) and again
+# when it expires (expiry + 1). Each user has a day-level watermark in notification_watermarks;
+# a run only looks at warranties whose threshold fell in (watermark, today], then advances it.
+# Warranty inserts/updates are evaluated directly via notify_warranty_changed().
+REMINDER_WINDOW_DAYS = 7
+
+_CROSSED_THRESHOLD_SQL = """
+    SELECT w.user_id, w.warranty_id, w.product_name, TRUNC(w.expiry_date)
+    FROM warranties w
+    LEFT JOIN notification_watermarks nw ON nw.user_id = w.user_id
+    WHERE {scope}
+      AND (
+            (nw.last_evaluated IS NULL
+             AND (w.expiry_date < SYSDATE OR w.expiry_date BETWEEN TRUNC(SYSDATE) AND TRUNC(SYSDATE) + :days))
+         OR (TRUNC(w.expiry_date) - :days > nw.last_evaluated AND TRUNC(w.expiry_date) - :days <= TRUNC(SYSDATE))
+         OR (TRUNC(w.expiry_date) + 1 > nw.last_evaluated AND TRUNC(w.expiry_date) + 1 <= TRUNC(SYSDATE))
+      )
+"""
+
+_ADVANCE_WATERMARK_SQL = backend_sql("""
+    MERGE INTO notification_watermarks nw
+    USING ({source}) src ON (nw.user_id = src.user_id)
+    WHEN MATCHED THEN UPDATE SET nw.last_evaluated = TRUNC(SYSDATE)
+    WHEN NOT MATCHED THEN INSERT (user_id, last_evaluated) VALUES (src.user_id, TRUNC(SYSDATE))
+""", sqlite="""
+    INSERT INTO notification_watermarks (user_id, last_evaluated)
+    SELECT src.user_id, TRUNC(SYSDATE) FROM ({source}) src WHERE 1 = 1
+    ON CONFLICT (user_id) DO UPDATE SET last_evaluated = excluded.last_evaluated
+""")
+
+def _run_incremental_notifications(scope_sql, binds, days, send_email_now):
     cur = None
+    created = 0
     try:
         cur = conn.cursor()
-        cur.execute(
-            """
-            SELECT warranty_id, product_name, expiry_date
-            FROM warranties
-            WHERE user_id = :1
-              AND (
-                    expiry_date < SYSDATE
-                 OR expiry_date BETWEEN TRUNC(SYSDATE) AND TRUNC(SYSDATE) + :2
-              )
-            """,
-            (int(user_id), int(days))
-        )
+        q_binds = dict(binds)
+        q_binds["days"] = int(days)
+        cur.execute(_CROSSED_THRESHOLD_SQL.format(scope=scope_sql), q_binds)
         rows = cur.fetchall()
-        from datetime import date as _d
-        today = _d.today()
-        for w_id, product_name, exp_dt in rows:
-            exp_date = exp_dt.date()
-            if exp_date < today:
-                msg = f"Your warranty for '{product_name}' has expired on {exp_date.strftime('%B %d, %Y')}."
-            else:
-                msg = f"Your warranty for '{product_name}' expires on {exp_date.strftime('%B %d, %Y')}."
-            create_notification(user_id, int(w_id), msg, email_subject="Warranty Reminder", send_email_now=send_email_now)
-    except Exception as e:
-        print(f"generate_warranty_notifications error: {e}")
+        today = date.today()
+        items = [(int(uid), int(wid), _reminder_message(pname, exp_dt.date(), today)) for uid, wid, pname, exp_dt in rows]
+        created = len(create_notifications_bulk(items, email_subject="Warranty Reminder", send_email_now=send_email_now))
+        source = "SELECT :uid AS user_id FROM dual" if "uid" in binds else "SELECT user_id FROM users"
+        cur.execute(_ADVANCE_WATERMARK_SQL.format(source=source), binds)
+        conn.commit()
+    except Exception:
+        app.logger.exception("incremental notification run failed")
     finally:
         if cur:
             cur.close()
+    return created
 
-def _scheduler_loop():
-    while True:
+def generate_warranty_notifications(user_id, days=REMINDER_WINDOW_DAYS, send_email_now=False):
+    """Create reminders for one user's warranties that crossed a threshold since their watermark."""
+    return _run_incremental_notifications("w.user_id = :uid", {"uid": int(user_id)}, days, send_email_now)
+
+def generate_all_warranty_notifications(days=REMINDER_WINDOW_DAYS):
+    """Scheduler entry point: incremental evaluation across every user in one pass."""
+    return _run_incremental_notifications("1 = 1", {}, days, send_email_now=False)
+
+def notify_warranty_changed(user_id, warranty_id, product_name, expiry_date, days=REMINDER_WINDOW_DAYS):
+    """Evaluate a just-inserted/updated warranty without touching the rest of the user's list."""
+    try:
+        today = date.today()
+        exp_date = expiry_date.date() if isinstance(expiry_date, datetime) else expiry_date
+        if exp_date < today or (exp_date - today).days <= int(days):
+            msg = _reminder_message(product_name, exp_date, today)
+            create_notification(int(user_id), int(warranty_id), msg, email_subject="Warranty Reminder", send_email_now=False)
+    except Exception:
+        app.logger.exception("notify_warranty_changed failed")
+
+# --- Warranty status rollover ---
+# warranties.status is 'Active' through the expiry day and 'Expired' from the day after.
+# Inserts and edits write it directly; rollover_warranty_status() flips the rows whose expiry
+# day has passed, shortly after each midnight, using ix_warranties_status_expiry.
+STATUS_ROLLOVER_BATCH = int(os.getenv("STATUS_ROLLOVER_BATCH", "50000"))
+
+def warranty_status(expiry_date, today=None):
+    if isinstance(expiry_date, datetime):
+        expiry_date = expiry_date.date()
+    return 'Active' if expiry_date >= (today or date.today()) else 'Expired'
+
+_ROLLOVER_STATUS_SQL = (
+    backend_sql(
+        "UPDATE warranties SET status = 'Expired' WHERE status = 'Active' AND expiry_date < TRUNC(SYSDATE) AND ROWNUM <= :1",
+        sqlite="UPDATE warranties SET status = 'Expired' WHERE rowid IN ("
+               "SELECT rowid FROM warranties WHERE status = 'Active' AND expiry_date < TRUNC(SYSDATE) LIMIT :1)"),
+    # Only rows written before the column existed, or by a clock-skewed writer
+    backend_sql(
+        "UPDATE warranties SET status = 'Active' WHERE status = 'Expired' AND expiry_date >= TRUNC(SYSDATE) AND ROWNUM <= :1",
+        sqlite="UPDATE warranties SET status = 'Active' WHERE rowid IN ("
+               "SELECT rowid FROM warranties WHERE status = 'Expired' AND expiry_date >= TRUNC(SYSDATE) LIMIT :1)"),
+)
+
+def rollover_warranty_status():
+    """Bring status in line with TRUNC(SYSDATE); returns (expired, reactivated) row counts."""
+    counts = []
+    cur = conn.cursor()
+    try:
+        for sql in _ROLLOVER_STATUS_SQL:
+            total = 0
+            while True:
+                cur.execute(sql, (STATUS_ROLLOVER_BATCH,))
+                n = cur.rowcount or 0
+                conn.commit()
+                total += n
+                if n < STATUS_ROLLOVER_BATCH:
+                    break
+            counts.append(total)
+    finally:
+        cur.close()
+    if counts[0] or counts[1]:
+        reports_cache.clear()
+    return counts[0], counts[1]
+
+# --- Job scheduler ---
+# Cron-style jobs whose next due time lives in scheduled_jobs, so restarts neither skip nor
+# repeat a day. Every process (and every gunicorn worker) may run a Scheduler: to run a job,
+# a process must take that job's row with SELECT ... FOR UPDATE SKIP LOCKED on a dedicated
+# session and hold the lock until the run is recorded, so each due slot runs once. A run
+# missed while everything was down is caught up by one run (catch_up=True) or recorded as
+# Skipped. Time comes from a clock object; FakeClock + MemoryJobStore drive it without a DB.
+SCHEDULER_ENABLED = os.getenv("SCHEDULER_ENABLED", "true").lower() == "true"
+SCHEDULER_POLL_SECONDS = float(os.getenv("SCHEDULER_POLL_SECONDS", "30"))
+JOB_RETRY_SECONDS = int(os.getenv("JOB_RETRY_SECONDS", "900"))  # a failed run is retried after this
+NOTIFY_CRON = os.getenv("NOTIFY_CRON", "0 7 * * *")
+STATUS_ROLLOVER_CRON = os.getenv("STATUS_ROLLOVER_CRON", "1 0 * * *")
+SCHEDULER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+class CronSchedule:
+    """Five-field cron expression: minute hour day-of-month month day-of-week (0 or 7 = Sunday).
+
+    Fields take *, numbers, a-b ranges, comma lists and /step. As in cron, when both
+    day-of-month and day-of-week are restricted a day matching either one qualifies.
+    """
+    _RANGES = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 7))
+
+    def __init__(self, expr):
+        fields = expr.split()
+        if len(fields) != 5:
+            raise ValueError(f"cron expression needs 5 fields: {expr!r}")
+        self.expr = " ".join(fields)
+        minutes, hours, days, months, weekdays = (
+            self._parse(f, lo, hi) for f, (lo, hi) in zip(fields, self._RANGES)
+        )
+        self.minutes, self.hours = sorted(minutes), sorted(hours)
+        self.days, self.months = days, months
+        self.weekdays = {d % 7 for d in weekdays}
+        self.dom_any, self.dow_any = fields[2] == "*", fields[4] == "*"
+
+    @staticmethod
+    def _parse(field, lo, hi):
+        values = set()
+        for part in field.split(","):
+            step = 1
+            if "/" in part:
+                part, step = part.split("/", 1)
+                step = int(step)
+            if part == "*":
+                start, end = lo, hi
+            elif "-" in part:
+                start, end = (int(x) for x in part.split("-", 1))
+            else:
+                start = int(part)
+                end = hi if step > 1 else start
+            if not (lo <= start <= end <= hi) or step < 1:
+                raise ValueError(f"cron field {field!r} out of range {lo}-{hi}")
+            values.update(range(start, end + 1, step))
+        return values
+
+    def _day_matches(self, day):
+        dom = day.day in self.days
+        dow = day.isoweekday() % 7 in self.weekdays
+        if self.dom_any or self.dow_any:
+            return dom and dow
+        return dom or dow
+
+    def next_after(self, dt):
+        """First matching minute strictly after dt."""
+        start = dt.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        day = start.date()
+        for _ in range(366 * 5):
+            if day.month in self.months and self._day_matches(day):
+                for h in self.hours:
+                    for m in self.minutes:
+                        candidate = datetime(day.year, day.month, day.day, h, m)
+                        if candidate >= start:
+                            return candidate
+            day += timedelta(days=1)
+        raise ValueError(f"cron expression never fires: {self.expr!r}")
+
+    def slots_between(self, after, until, cap=1000):
+        """Number of slots in (after, until], counting at most cap."""
+        n, t = 0, after
+        while n < cap:
+            t = self.next_after(t)
+            if t > until:
+                break
+            n += 1
+        return n
+
+class Job:
+    def __init__(self, name, schedule, func, catch_up=True):
+        self.name = name
+        self.schedule = CronSchedule(schedule)
+        self.func = func  # func(scheduled_for) -> optional detail string
+        self.catch_up = catch_up
+
+class SystemClock:
+    def now(self):
+        return datetime.now().replace(microsecond=0)
+
+    def sleep(self, seconds):
+        time.sleep(seconds)
+
+class FakeClock:
+    """Manually advanced clock; sleep() moves time forward instead of blocking."""
+
+    def __init__(self, start):
+        self.current = start
+
+    def now(self):
+        return self.current
+
+    def sleep(self, seconds):
+        self.advance(seconds=seconds)
+
+    def advance(self, **delta):
+        self.current += timedelta(**delta)
+
+class OracleJobStore:
+    """scheduled_jobs / job_runs. A claim keeps its own pooled session, and the row lock on
+    it, until finish() commits the next due time and the history row together."""
+
+    def ensure(self, jobs, now):
+        cur = conn.cursor()
         try:
-            # Cadence-based notifications
-            run_cadence_warranty_notifications()
-        except Exception as e:
-            print(f"Scheduler loop error: {e}")
-        time.sleep(86400)
+            for job in jobs:
+                # New job: due now (first run happens on start). Changed schedule: recompute.
+                cur.execute(
+                    backend_sql(
+                        """
+                        MERGE INTO scheduled_jobs j
+                        USING (SELECT :name AS job_name FROM dual) src
+                        ON (j.job_name = src.job_name)
+                        WHEN MATCHED THEN UPDATE SET j.schedule = :sched, j.next_run_at = :next_at
+                            WHERE j.schedule <> :sched
+                        WHEN NOT MATCHED THEN INSERT (job_name, schedule, next_run_at)
+                            VALUES (:name, :sched, :now_at)
+                        """,
+                        sqlite="""
+                        INSERT INTO scheduled_jobs (job_name, schedule, next_run_at) VALUES (:name, :sched, :now_at)
+                        ON CONFLICT (job_name) DO UPDATE SET schedule = :sched, next_run_at = :next_at
+                            WHERE schedule <> :sched
+                        """),
+                    {"name": job.name, "sched": job.schedule.expr,
+                     "next_at": job.schedule.next_after(now), "now_at": now}
+                )
+            conn.commit()
+        finally:
+            cur.close()
+
+    def claim(self, name, now, force=False):
+        c = db_pool.acquire()
+        cur = c.cursor()
+        try:
+            # SQLite: no row lock to hold (its write lock would block the job's own writes on
+            # other connections), so run a single scheduler process against one file
+            cur.execute(
+                backend_sql(
+                    "SELECT next_run_at FROM scheduled_jobs WHERE job_name = :1 AND (next_run_at <= :2 OR :3 = 1) "
+                    "FOR UPDATE SKIP LOCKED",
+                    sqlite="SELECT next_run_at FROM scheduled_jobs WHERE job_name = :1 AND (next_run_at <= :2 OR :3 = 1)"),
+                (name, now, 1 if force else 0)
+            )
+            row = cur.fetchone()
+        except Exception:
+            cur.close()
+            c.rollback()
+            db_pool.release(c)
+            raise
+        cur.close()
+        if row is None:
+            # Not due, or another process holds it right now
+            c.rollback()
+            db_pool.release(c)
+            return None
+        return {"connection": c, "due_at": row[0]}
+
+    def finish(self, claim, run, next_run_at):
+        c = claim["connection"]
+        try:
+            cur = c.cursor()
+            try:
+                cur.execute(
+                    """
+                    UPDATE scheduled_jobs SET next_run_at = :next_at, last_run_at = :started,
+                           last_status = :status, last_duration_ms = :ms
+                    WHERE job_name = :name
+                    """,
+                    {"next_at": next_run_at, "started": run["started_at"], "status": run["status"],
+                     "ms": run["duration_ms"], "name": run["job_name"]}
+                )
+                cur.execute(
+                    """
+                    INSERT INTO job_runs (job_name, scheduled_for, started_at, duration_ms, status, missed_runs, runner, detail)
+                    VALUES (:1, :2, :3, :4, :5, :6, :7, :8)
+                    """,
+                    (run["job_name"], run["scheduled_for"], run["started_at"], run["duration_ms"],
+                     run["status"], run["missed_runs"], run["runner"], (run["detail"] or "")[:1000] or None)
+                )
+            finally:
+                cur.close()
+            c.commit()
+        except Exception:
+            c.rollback()
+            raise
+        finally:
+            db_pool.release(c)
+
+    def history(self, limit=50, name=None):
+        cur = conn.cursor()
+        try:
+            cur.execute(
+                """
+                SELECT job_name, scheduled_for, started_at, duration_ms, status, missed_runs, runner, detail
+                FROM job_runs WHERE (:name IS NULL OR job_name = :name)
+                ORDER BY run_id DESC FETCH FIRST :lim ROWS ONLY
+                """,
+                {"name": name, "lim": int(limit)}
+            )
+            cols = ("job_name", "scheduled_for", "started_at", "duration_ms", "status", "missed_runs", "runner", "detail")
+            return [dict(zip(cols, r)) for r in cur]
+        finally:
+            cur.close()
+
+    def jobs(self):
+        cur = conn.cursor()
+        try:
+            cur.execute(
+                "SELECT job_name, schedule, next_run_at, last_run_at, last_status, last_duration_ms "
+                "FROM scheduled_jobs ORDER BY job_name"
+            )
+            cols = ("job_name", "schedule", "next_run_at", "last_run_at", "last_status", "last_duration_ms")
+            return [dict(zip(cols, r)) for r in cur]
+        finally:
+            cur.close()
+
+class MemoryJobStore:
+    """Same interface as OracleJobStore, in-process; a held claim plays the role of the row lock."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._jobs = {}
+        self._held = set()
+        self.runs = []
+
+    def ensure(self, jobs, now):
+        with self._lock:
+            for job in jobs:
+                row = self._jobs.get(job.name)
+                if row is None:
+                    self._jobs[job.name] = {"job_name": job.name, "schedule": job.schedule.expr, "next_run_at": now,
+                                            "last_run_at": None, "last_status": None, "last_duration_ms": None}
+                elif row["schedule"] != job.schedule.expr:
+                    row.update(schedule=job.schedule.expr, next_run_at=job.schedule.next_after(now))
+
+    def claim(self, name, now, force=False):
+        with self._lock:
+            row = self._jobs.get(name)
+            if row is None or name in self._held or not (force or row["next_run_at"] <= now):
+                return None
+            self._held.add(name)
+            return {"name": name, "due_at": row["next_run_at"]}
+
+    def finish(self, claim, run, next_run_at):
+        with self._lock:
+            self._jobs[claim["name"]].update(next_run_at=next_run_at, last_run_at=run["started_at"],
+                                             last_status=run["status"], last_duration_ms=run["duration_ms"])
+            self.runs.append(run)
+            self._held.discard(claim["name"])
+
+    def history(self, limit=50, name=None):
+        runs = [r for r in reversed(self.runs) if name is None or r["job_name"] == name]
+        return runs[:limit]
+
+    def jobs(self):
+        with self._lock:
+            return [dict(self._jobs[k]) for k in sorted(self._jobs)]
+
+class Scheduler:
+    def __init__(self, jobs, store, clock=None, runner=SCHEDULER_ID):
+        self.jobs = {job.name: job for job in jobs}
+        self.store = store
+        self.clock = clock or SystemClock()
+        self.runner = runner
+        self._stop = threading.Event()
+        self._ensured = False
 
-def start_email_scheduler_if_enabled():
+    def run_pending(self, force=None):
+        """Run every due job this process wins the claim for; returns the run records."""
+        now = self.clock.now()
+        if not self._ensured:
+            self.store.ensure(self.jobs.values(), now)
+            self._ensured = True
+        done = []
+        for name, job in self.jobs.items():
+            claim = self.store.claim(name, now, force=(name == force))
+            if claim is None:
+                continue
+            due_at = claim["due_at"]
+            # Slots after due_at that also passed while nobody ran the job
+            missed = job.schedule.slots_between(due_at, now) if due_at < now else 0
+            run = {"job_name": name, "scheduled_for": due_at, "started_at": now, "missed_runs": missed,
+                   "runner": self.runner, "detail": None}
+            # A forced run ahead of schedule leaves the upcoming slot in place
+            next_run_at = job.schedule.next_after(now) if due_at <= now else due_at
+            t0 = time.perf_counter()
+            if missed and not job.catch_up and name != force:
+                run["status"] = "Skipped"
+            else:
+                try:
+                    with app.app_context():
+                        run["detail"] = job.func(due_at)
+                    run["status"] = "Succeeded"
+                except Exception as e:
+                    run["status"] = "Failed"
+                    run["detail"] = str(e)
+                    next_run_at = min(next_run_at, now + timedelta(seconds=JOB_RETRY_SECONDS))
+                    app.logger.exception("Scheduled job %s failed", name)
+            run["duration_ms"] = int((time.perf_counter() - t0) * 1000)
+            self.store.finish(claim, run, next_run_at)
+            done.append(run)
+        return done
+
+    def loop(self):
+        while not self._stop.is_set():
+            try:
+                for run in self.run_pending():
+                    app.logger.info("Job %s (%s): %s in %s ms%s", run['job_name'], run['scheduled_for'], run['status'],
+                                    run['duration_ms'], f", caught up {run['missed_runs']} missed" if run['missed_runs'] else "")
+            except Exception:
+                app.logger.exception("Scheduler error")
+            self.clock.sleep(SCHEDULER_POLL_SECONDS)
+
+    def stop(self):
+        self._stop.set()
+
+def _job_warranty_notifications(scheduled_for):
+    created = generate_all_warranty_notifications()
+    reconcile_admin_stats()
+    report = run_cadence_warranty_notifications()
+    return f"{created} in-app reminders, {len(report)} cadence shards"
+
+def _job_status_rollover(scheduled_for):
+    expired, reactivated = rollover_warranty_status()
+    return f"{expired} expired, {reactivated} reactivated"
+
+SCHEDULED_JOBS = [
+    Job("warranty-notifications", NOTIFY_CRON, _job_warranty_notifications),
+    Job("status-rollover", STATUS_ROLLOVER_CRON, _job_status_rollover),
+]
+
+scheduler = Scheduler(SCHEDULED_JOBS, OracleJobStore())
+
+def start_scheduler_if_enabled():
+    """In-process scheduler thread for `python app.py`. WSGI servers never call this; there
+    `flask run-scheduler` must run as its own process."""
     # Avoid double-start under the Flask reloader
+    if not SCHEDULER_ENABLED or db_pool is None:
+        return
     if app.debug and os.environ.get("WERKZEUG_RUN_MAIN") != "true":
         return
-    t = threading.Thread(target=_scheduler_loop, name="warranty-email-scheduler", daemon=True)
+    t = threading.Thread(target=scheduler.loop, name="job-scheduler", daemon=True)
     t.start()
 
+@app.cli.command("run-scheduler")
+def run_scheduler_command():
+    """Run the job scheduler in the foreground; required as its own process under gunicorn/uwsgi."""
+    scheduler.loop()
+
+@app.cli.command("jobs-run")
+@click.argument("name")
+def jobs_run_command(name):
+    """Run one scheduled job now (still takes the job's row lock)."""
+    if name not in scheduler.jobs:
+        raise click.BadParameter(f"unknown job; choose from {', '.join(scheduler.jobs)}")
+    runs = scheduler.run_pending(force=name)
+    forced = [r for r in runs if r["job_name"] == name]
+    if not forced:
+        click.echo(f"{name} is running in another process.")
+    for r in runs:
+        click.echo(f"{r['job_name']}: {r['status']} in {r['duration_ms']} ms {r['detail'] or ''}")
+
+@app.cli.command("jobs-history")
+@click.option("--job", "name", default=None, help="Only this job.")
+@click.option("--limit", default=20, show_default=True)
+def jobs_history_command(name, limit):
+    """Show scheduled jobs and their recent runs."""
+    for j in scheduler.store.jobs():
+        click.echo(f"{j['job_name']:24s} {j['schedule']:14s} next {j['next_run_at']}  last {j['last_status'] or '-'}"
+              f" ({j['last_duration_ms'] if j['last_duration_ms'] is not None else '-'} ms)")
+    click.echo()
+    for r in scheduler.store.history(limit=limit, name=name):
+        click.echo(f"{r['started_at']}  {r['job_name']:24s} {r['status']:9s} {r['duration_ms']:>8} ms  "
+              f"slot {r['scheduled_for']}  missed {r['missed_runs']}  {r['runner'] or ''}  {r['detail'] or ''}")
+
+@app.cli.command("scheduler-simulate")
+@click.option("--start", default="2025-01-06 06:00", show_default=True, help="Fake clock start (YYYY-MM-DD HH:MM).")
+@click.option("--hours", default=72, show_default=True, help="Simulated hours.")
+@click.option("--down", default="20-50", show_default=True, help="Hours (from-to) during which no process runs.")
+@click.option("--processes", default=2, show_default=True, help="Schedulers sharing one store.")
+def scheduler_simulate_command(start, hours, down, processes):
+    """Dry-run the job definitions on a fake clock and in-memory store (no DB, jobs are no-ops)."""
+    clock = FakeClock(datetime.strptime(start, "%Y-%m-%d %H:%M"))
+    store = MemoryJobStore()
+    jobs = [Job(j.name, j.schedule.expr, lambda due: "simulated", j.catch_up) for j in SCHEDULED_JOBS]
+    schedulers = [Scheduler(jobs, store, clock, runner=f"proc-{i}") for i in range(processes)]
+    down_from, down_to = (float(x) for x in down.split("-"))
+    end = clock.now() + timedelta(hours=hours)
+    t0 = clock.now()
+    while clock.now() < end:
+        elapsed = (clock.now() - t0).total_seconds() / 3600
+        if not (down_from <= elapsed < down_to):
+            for sch in schedulers:
+                sch.run_pending()
+        clock.advance(seconds=SCHEDULER_POLL_SECONDS)
+    for r in store.runs:
+        click.echo(f"{r['started_at']}  {r['runner']:7s} {r['job_name']:24s} slot {r['scheduled_for']}  "
+              f"{r['status']}" + (f" (caught up {r['missed_runs']} missed)" if r['missed_runs'] else ""))
+
 def admin_required(f):
     @wraps(f)
     def decorated_function(*args, **kwargs):
@@ -343,6 +2792,19 @@ def _get_page_and_size():
     offset = (page - 1) * size
     return page, size, offset
 
+# Keyset cursor for deep pages: "<expiry as YYYYmmddHHMMSS>.<warranty_id>"
+def _make_keyset_cursor(expiry_dt, warranty_id):
+    return f"{expiry_dt.strftime('%Y%m%d%H%M%S')}.{int(warranty_id)}"
+
+def _parse_keyset_cursor(raw):
+    if not raw:
+        return None
+    try:
+        ts, wid = raw.split('.', 1)
+        return datetime.strptime(ts, '%Y%m%d%H%M%S'), int(wid)
+    except (ValueError, TypeError):
+        return None
+
 @app.route('/change-password', methods=['GET', 'POST'])
 @login_required
 def change_password():
@@ -379,7 +2841,7 @@ def warranty_detail(warranty_id):
         cur = conn.cursor()
         cur.execute(
             """
-            SELECT warranty_id, product_name, brand, purchase_date, expiry_date, invoice_path
+            SELECT warranty_id, product_name, brand, purchase_date, expiry_date, invoice_path, status
             FROM warranties
             WHERE warranty_id = :1 AND user_id = :2
             """,
@@ -395,7 +2857,7 @@ def warranty_detail(warranty_id):
             'brand': row[2],
             'purchase_date': row[3].strftime('%Y-%m-%d'),
             'expiry_date': row[4].strftime('%Y-%m-%d'),
-            'status': "Active" if row[4].date() >= date.today() else "Expired",
+            'status': row[6],
             'invoice_path': row[5],
         }
         cur.execute(
@@ -433,28 +2895,305 @@ def expiring():
         # Oracle can add numeric days to SYSDATE
         cur.execute(
             """
-            SELECT warranty_id, product_name, brand, purchase_date, expiry_date
+            SELECT warranty_id, NULL, product_name, brand, purchase_date, expiry_date, invoice_path, status
             FROM warranties
             WHERE user_id = :1 AND expiry_date BETWEEN SYSDATE AND SYSDATE + :2
             ORDER BY expiry_date ASC
             """,
             (session['user_id'], days)
         )
-        for row in cur.fetchall():
-            items.append({
-                'id': row[0],
-                'product_name': row[1],
-                'brand': row[2],
-                'purchase_date': row[3].strftime('%Y-%m-%d'),
-                'expiry_date': row[4].strftime('%Y-%m-%d'),
-                'status': 'Active' if row[4].date() >= date.today() else 'Expired'
-            })
+        items = fetch_records(cur, WarrantyRecord)
     except Exception as e:
         flash(f"❌ Error loading expiring warranties: {e}", "danger")
     finally:
         if 'cur' in locals() and cur: cur.close()
     return render_template('expiring.html', items=items, days=days)
 
+# --- Admin search index ---
+# search_tokens is an index-organized inverted index: one row per (entity, token) with a
+# field weight. Write paths replace an entity's tokens in the same transaction, so admin
+# search is a PK range scan on (entity_type, token LIKE 'term%') instead of a leading-
+# wildcard LIKE over the warranties/users join. Entity types: 'W' warranty, 'U' user.
+# Products are searched from the in-process catalog (ProductCatalog) instead.
+SEARCH_TOKEN_LEN = 40
+SEARCH_MAX_TERMS = 6
+SEARCH_REINDEX_BATCH = 5000
+_SEARCH_TOKEN_RE = re.compile(r"[^\W_]+")
+
+def search_terms(text):
+    """Lowercased word tokens, truncated to the column width; also used to split queries."""
+    return [t[:SEARCH_TOKEN_LEN] for t in _SEARCH_TOKEN_RE.findall((text or "").lower())]
+
+def _warranty_search_fields(product_name, brand):
+    return [(product_name, 3), (brand, 2)]
+
+def _user_search_fields(full_name, email):
+    return [(full_name, 3), ((email or "").split("@")[0], 1)]
+
+def index_search_entities(cur, entity_type, docs):
+    """Replace the tokens of each (entity_id, [(text, weight), ...]) in docs; committed with the caller."""
+    ids, rows = [], []
+    for entity_id, fields in docs:
+        weights = {}
+        for text, weight in fields:
+            for token in search_terms(text):
+                if weights.get(token, 0) < weight:
+                    weights[token] = weight
+        ids.append((entity_type, int(entity_id)))
+        rows.extend((entity_type, token, int(entity_id), weight) for token, weight in weights.items())
+    if not ids:
+        return
+    try:
+        cur.executemany("DELETE FROM search_tokens WHERE entity_type = :1 AND entity_id = :2", ids)
+        if rows:
+            cur.executemany(
+                "INSERT INTO search_tokens (entity_type, token, entity_id, weight) VALUES (:1, :2, :3, :4)",
+                rows
+            )
+    except Exception as e:
+        # Never fail the user's write over search; `flask search-reindex` repairs it
+        app.logger.warning("index_search_entities note: %s", e)
+
+def unindex_search_entity(cur, entity_type, entity_id):
+    try:
+        cur.execute(
+            "DELETE FROM search_tokens WHERE entity_type = :1 AND entity_id = :2",
+            (entity_type, int(entity_id))
+        )
+    except Exception as e:
+        app.logger.warning("unindex_search_entity note: %s", e)
+
+def _search_hits_sql(terms, entity_type):
+    """Inner query of (hit_id, score) for entities whose tokens prefix-match every term.
+
+    An exact token match scores double its field weight. Warranties ('W') also match
+    through their owner's name, so "john dell" finds John's Dell warranties.
+    """
+    binds = {"nterms": len(terms)}
+    parts = []
+    for i, term in enumerate(terms):
+        binds[f"t{i}"], binds[f"e{i}"] = term + "%", term
+        score = f"MAX(CASE WHEN st.token = :e{i} THEN st.weight * 2 ELSE st.weight END)"
+        parts.append(
+            f"SELECT {i} AS term_no, st.entity_id AS hit_id, {score} AS score FROM search_tokens st "
+            f"WHERE st.entity_type = '{entity_type}' AND st.token LIKE :t{i} GROUP BY st.entity_id"
+        )
+        if entity_type == 'W':
+            parts.append(
+                f"SELECT {i}, w.warranty_id, {score} FROM search_tokens st "
+                f"JOIN warranties w ON w.user_id = st.entity_id "
+                f"WHERE st.entity_type = 'U' AND st.token LIKE :t{i} GROUP BY w.warranty_id"
+            )
+    sql = (
+        "SELECT hit_id, SUM(score) AS score FROM (" + " UNION ALL ".join(parts) + ") "
+        "GROUP BY hit_id HAVING COUNT(DISTINCT term_no) = :nterms"
+    )
+    return sql, binds
+
+def _admin_warranty_search(cur, terms, status, offset, size):
+    hits_sql, bind = _search_hits_sql(terms, 'W')
+    sql = (
+        "SELECT w.warranty_id, u.full_name, w.product_name, w.brand, w.purchase_date, w.expiry_date, "
+        "NULL, w.status "
+        f"FROM ({hits_sql}) hits "
+        "JOIN warranties w ON w.warranty_id = hits.hit_id "
+        "JOIN users u ON w.user_id = u.user_id WHERE 1=1"
+    )
+    if status in ("Active", "Expired"):
+        sql += " AND w.status = :st"
+        bind['st'] = status
+    sql += " ORDER BY hits.score DESC, w.expiry_date ASC, w.warranty_id OFFSET :off ROWS FETCH NEXT :lim ROWS ONLY"
+    bind['off'] = offset
+    bind['lim'] = size
+    cur.execute(sql, bind)
+    return fetch_records(cur, WarrantyRecord)
+
+def rebuild_search_index():
+    """Re-tokenize every warranty and user; returns (warranties, users) indexed."""
+    counts = {}
+    cur = conn.cursor()
+    write = conn.cursor()
+    try:
+        write.execute("DELETE FROM search_tokens")
+        conn.commit()
+        for entity_type, sql, fields in (
+            ('W', "SELECT warranty_id, product_name, brand FROM warranties", _warranty_search_fields),
+            ('U', "SELECT user_id, full_name, email FROM users", _user_search_fields),
+        ):
+            counts[entity_type] = 0
+            cur.arraysize = SEARCH_REINDEX_BATCH
+            cur.execute(sql)
+            while True:
+                rows = cur.fetchmany(SEARCH_REINDEX_BATCH)
+                if not rows:
+                    break
+                index_search_entities(write, entity_type, [(r[0], fields(r[1], r[2])) for r in rows])
+                conn.commit()
+                counts[entity_type] += len(rows)
+    finally:
+        write.close()
+        cur.close()
+    return counts['W'], counts['U']
+
+def _backfill_search_index_if_empty():
+    cur = conn.cursor()
+    try:
+        cur.execute(backend_sql(
+            "SELECT (SELECT COUNT(*) FROM search_tokens WHERE ROWNUM = 1), "
+            "(SELECT COUNT(*) FROM warranties WHERE ROWNUM = 1) FROM dual",
+            sqlite="SELECT EXISTS (SELECT 1 FROM search_tokens), EXISTS (SELECT 1 FROM warranties)"
+        ))
+        has_tokens, has_warranties = cur.fetchone()
+    finally:
+        cur.close()
+    if not has_tokens and has_warranties:
+        app.logger.info("Search index is empty; rebuilding in the background")
+
+        def run():
+            with app.app_context():
+                try:
+                    w, u = rebuild_search_index()
+                    app.logger.info("Search index built: %d warranties, %d users", w, u)
+                except Exception:
+                    app.logger.exception("Search index build failed")
+        threading.Thread(target=run, name="search-index-backfill", daemon=True).start()
+
+@app.cli.command("search-reindex")
+def search_reindex_command():
+    """Rebuild search_tokens from the warranties and users tables."""
+    t0 = time.perf_counter()
+    w, u = rebuild_search_index()
+    click.echo(f"Indexed {w} warranties and {u} users in {time.perf_counter() - t0:.1f}s.")
+
+# The pre-index admin_warranties filter, kept for the benchmark
+_ADMIN_WARRANTY_LIKE_SQL = (
+    "SELECT w.warranty_id, u.full_name, w.product_name, w.brand, w.purchase_date, w.expiry_date, "
+    "CASE WHEN w.expiry_date >= SYSDATE THEN 'Active' ELSE 'Expired' END AS status "
+    "FROM warranties w JOIN users u ON w.user_id = u.user_id "
+    "WHERE (LOWER(w.product_name) LIKE :q OR LOWER(NVL(w.brand,'')) LIKE :q OR LOWER(u.full_name) LIKE :q) "
+    "ORDER BY w.expiry_date ASC OFFSET 0 ROWS FETCH NEXT 20 ROWS ONLY"
+)
+_BENCH_EMAIL_DOMAIN = "bench.invalid"
+
+def _seed_search_bench(n_warranties, n_users):
+    """Insert synthetic users/warranties (emails @bench.invalid) and index them."""
+    rnd = random.Random(5)
+    first = ["Asha", "Ravi", "John", "Meera", "Arjun", "Priya", "Kiran", "Sanjay", "Divya", "Rahul", "Anita", "Vikram"]
+    last = ["Rao", "Sharma", "Reddy", "Iyer", "Patel", "Nair", "Gupta", "Das", "Khan", "Singh"]
+    catalog = _synthetic_catalog(5000, seed=9)
+    cur = conn.cursor()
+    try:
+        cur.executemany(
+            "INSERT INTO users (full_name, email, password) VALUES (:1, :2, 'x')",
+            [(f"{rnd.choice(first)} {rnd.choice(last)}", f"bench{i}@{_BENCH_EMAIL_DOMAIN}") for i in range(n_users)]
+        )
+        cur.execute("SELECT user_id, full_name, email FROM users WHERE email LIKE :1", (f"%@{_BENCH_EMAIL_DOMAIN}",))
+        users = cur.fetchall()
+        index_search_entities(cur, 'U', [(uid, _user_search_fields(name, email)) for uid, name, email in users])
+        conn.commit()
+        user_ids = [int(u[0]) for u in users]
+        today = date.today()
+        for start in range(0, n_warranties, IMPORT_BATCH_SIZE * 10):
+            batch = []
+            for i in range(start, min(n_warranties, start + IMPORT_BATCH_SIZE * 10)):
+                p = catalog[i % len(catalog)]
+                purchase = today - relativedelta(days=rnd.randint(0, 1500))
+                months = rnd.choice((6, 12, 24, 36))
+                # Suffix keeps (user, product, brand) unique across the run
+                expiry = purchase + relativedelta(months=months)
+                batch.append((user_ids[i % len(user_ids)], f"{p.model_name} #{i}", p.brand,
+                              purchase, months, expiry, warranty_status(expiry, today)))
+            cur.executemany(
+                """
+                INSERT INTO warranties (user_id, product_name, brand, purchase_date, warranty_period_months, expiry_date, status)
+                VALUES (:1, :2, :3, :4, :5, :6, :7)
+                """,
+                batch
+            )
+            conn.commit()
+        write = conn.cursor()
+        try:
+            cur.arraysize = SEARCH_REINDEX_BATCH
+            cur.execute(
+                "SELECT w.warranty_id, w.product_name, w.brand FROM warranties w "
+                "JOIN users u ON u.user_id = w.user_id WHERE u.email LIKE :1",
+                (f"%@{_BENCH_EMAIL_DOMAIN}",)
+            )
+            while True:
+                rows = cur.fetchmany(SEARCH_REINDEX_BATCH)
+                if not rows:
+                    break
+                index_search_entities(write, 'W', [(r[0], _warranty_search_fields(r[1], r[2])) for r in rows])
+                conn.commit()
+        finally:
+            write.close()
+    finally:
+        cur.close()
+    reconcile_admin_stats()
+
+@app.cli.command("bench-admin-search")
+@click.option("--queries", default=50, show_default=True, help="Search strings to time on each path.")
+@click.option("--seed-warranties", default=0, show_default=True,
+              help="First insert this many synthetic warranties (e.g. 1000000) under @bench.invalid users.")
+@click.option("--seed-users", default=10000, show_default=True, help="Synthetic users to spread them over.")
+@click.option("--cleanup", is_flag=True, help="Delete the @bench.invalid users (and their warranties) and exit.")
+def bench_admin_search_command(queries, seed_warranties, seed_users, cleanup):
+    """Time admin warranty search: leading-wildcard LIKE vs the search_tokens index."""
+    if cleanup:
+        cur = conn.cursor()
+        try:
+            cur.execute(
+                "DELETE FROM search_tokens WHERE (entity_type = 'U' AND entity_id IN (SELECT user_id FROM users WHERE email LIKE :1)) "
+                "OR (entity_type = 'W' AND entity_id IN (SELECT w.warranty_id FROM warranties w JOIN users u ON u.user_id = w.user_id WHERE u.email LIKE :1))",
+                (f"%@{_BENCH_EMAIL_DOMAIN}",)
+            )
+            cur.execute("DELETE FROM users WHERE email LIKE :1", (f"%@{_BENCH_EMAIL_DOMAIN}",))
+            removed = cur.rowcount
+            conn.commit()
+        finally:
+            cur.close()
+        reconcile_admin_stats()
+        click.echo(f"Removed {removed} benchmark user(s).")
+        return
+    if seed_warranties:
+        t0 = time.perf_counter()
+        _seed_search_bench(seed_warranties, seed_users)
+        click.echo(f"Seeded {seed_warranties} warranties in {time.perf_counter() - t0:.1f}s")
+
+    cur = conn.cursor()
+    try:
+        cur.execute("SELECT COUNT(*) FROM warranties")
+        total = cur.fetchone()[0]
+        cur.execute(
+            "SELECT product_name, brand, (SELECT full_name FROM users u WHERE u.user_id = w.user_id) "
+            "FROM warranties w ORDER BY DBMS_RANDOM.VALUE FETCH FIRST :1 ROWS ONLY",
+            (queries,)
+        )
+        rnd = random.Random(3)
+        workload = []
+        for product_name, brand, owner in cur.fetchall():
+            words = search_terms(" ".join(x for x in (product_name, brand, owner) if x))
+            if words:
+                picked = rnd.sample(words, min(len(words), rnd.choice((1, 2))))
+                workload.append(" ".join(w[:rnd.randint(3, max(3, len(w)))] for w in picked))
+        if not workload:
+            click.echo("No warranties to sample queries from.")
+            return
+        like_ms, index_ms = [], []
+        for q in workload:
+            t0 = time.perf_counter()
+            cur.execute(_ADMIN_WARRANTY_LIKE_SQL, {"q": f"%{q.lower()}%"})
+            cur.fetchall()
+            like_ms.append((time.perf_counter() - t0) * 1000)
+            t0 = time.perf_counter()
+            _admin_warranty_search(cur, search_terms(q)[:SEARCH_MAX_TERMS], None, 0, 20)
+            index_ms.append((time.perf_counter() - t0) * 1000)
+    finally:
+        cur.close()
+    click.echo(f"{total} warranties, {len(workload)} queries")
+    click.echo(f"LIKE '%q%' join scan: p50={_percentile(like_ms, 50):.1f} ms  p99={_percentile(like_ms, 99):.1f} ms")
+    click.echo(f"search_tokens index: p50={_percentile(index_ms, 50):.1f} ms  p99={_percentile(index_ms, 99):.1f} ms")
+
 @app.route('/admin/warranties')
 @admin_required
 def admin_warranties():
@@ -464,128 +3203,155 @@ def admin_warranties():
     page, size, offset = _get_page_and_size()
     try:
         cur = conn.cursor()
-        base_sql = (
-            "SELECT w.warranty_id, u.full_name, w.product_name, w.brand, w.purchase_date, w.expiry_date, "
-            "CASE WHEN w.expiry_date >= SYSDATE THEN 'Active' ELSE 'Expired' END AS status "
-            "FROM warranties w JOIN users u ON w.user_id = u.user_id WHERE 1=1"
-        )
-        params = []
-        if q:
-            base_sql += " AND (LOWER(w.product_name) LIKE :q OR LOWER(NVL(w.brand,'')) LIKE :q OR LOWER(u.full_name) LIKE :q)"
-            params.append(f"%{q.lower()}%")
-        if status in ("Active", "Expired"):
-            base_sql += " AND (CASE WHEN w.expiry_date >= SYSDATE THEN 'Active' ELSE 'Expired' END) = :st"
-            params.append(status)
-        base_sql += " ORDER BY w.expiry_date ASC OFFSET :off ROWS FETCH NEXT :lim ROWS ONLY"
-        bind = {}
-        # Map params by name in order appended above
-        # jinja building used :q then :st, so fill accordingly
-        if q:
-            bind['q'] = f"%{q.lower()}%"
-        if status in ("Active", "Expired"):
-            bind['st'] = status
-        bind['off'] = offset
-        bind['lim'] = size
-        cur.execute(base_sql, bind)
-        for r in cur.fetchall():
-            rows.append({
-                'warranty_id': r[0],
-                'user_name': r[1],
-                'product_name': r[2],
-                'brand': r[3],
-                'purchase_date': r[4].strftime('%Y-%m-%d'),
-                'expiry_date': r[5].strftime('%Y-%m-%d'),
-                'status': r[6]
-            })
+        terms = search_terms(q)[:SEARCH_MAX_TERMS]
+        if terms:
+            # Relevance-ordered, from the search_tokens index
+            rows = _admin_warranty_search(cur, terms, status, offset, size)
+        else:
+            base_sql = (
+                "SELECT w.warranty_id, u.full_name, w.product_name, w.brand, w.purchase_date, w.expiry_date, "
+                "NULL, w.status "
+                "FROM warranties w JOIN users u ON w.user_id = u.user_id WHERE 1=1"
+            )
+            bind = {}
+            if status in ("Active", "Expired"):
+                base_sql += " AND w.status = :st"
+                bind['st'] = status
+            base_sql += " ORDER BY w.expiry_date ASC OFFSET :off ROWS FETCH NEXT :lim ROWS ONLY"
+            bind['off'] = offset
+            bind['lim'] = size
+            cur.execute(base_sql, bind)
+            rows = fetch_records(cur, WarrantyRecord)
     except Exception as e:
         flash(f"❌ Error loading warranties: {e}", "danger")
     finally:
         if 'cur' in locals() and cur: cur.close()
     return render_template('admin_warranties.html', warranties=rows, current_status=status, q=q, page=page, size=size)
 
-def _csv_response(headers, rows):
-    sio = io.StringIO()
-    writer = csv.writer(sio)
-    writer.writerow(headers)
-    for row in rows:
-        writer.writerow(row)
-    data = sio.getvalue()
-    sio.close()
-    return Response(data, mimetype='text/csv; charset=utf-8')
+CSV_FETCH_ROWS = int(os.getenv("CSV_FETCH_ROWS", "2000"))
+
+def _csv_response(headers, cur, filename):
+    """Stream an executed cursor as CSV in fetchmany() chunks; memory stays at one chunk.
+
+    Pass ?gzip=1 to receive the same stream gzip-compressed as <filename>.gz.
+    The cursor is owned by the response from here on and closed when the stream ends.
+    """
+    want_gzip = request.args.get('gzip', '').lower() in ('1', 'true', 'yes')
+
+    def rows_as_csv():
+        buf = io.StringIO()
+        writer = csv.writer(buf)
+        try:
+            writer.writerow(headers)
+            # Header goes out before the first fetch so the client sees bytes immediately
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate(0)
+            while True:
+                rows = cur.fetchmany(CSV_FETCH_ROWS)
+                if not rows:
+                    break
+                writer.writerows(rows)
+                yield buf.getvalue()
+                buf.seek(0)
+                buf.truncate(0)
+        except Exception:
+            app.logger.exception("CSV export stream failed (%s)", filename)
+            raise
+        finally:
+            cur.close()
+
+    def gzipped(chunks):
+        z = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31 -> gzip container
+        for chunk in chunks:
+            data = z.compress(chunk.encode('utf-8'))
+            if data:
+                yield data
+        yield z.flush()
+
+    cur.arraysize = CSV_FETCH_ROWS
+    cur.prefetchrows = CSV_FETCH_ROWS
+    if want_gzip:
+        resp = Response(stream_with_context(gzipped(rows_as_csv())), mimetype='application/gzip')
+        resp.headers['Content-Disposition'] = f'attachment; filename="{filename}.gz"'
+    else:
+        resp = Response(stream_with_context(rows_as_csv()), mimetype='text/csv; charset=utf-8')
+        resp.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return resp
 
 @app.route('/export/my_warranties')
 @login_required
 def export_my_warranties():
+    cur = None
     try:
         cur = conn.cursor()
         cur.execute(
-            "SELECT product_name, NVL(brand,''), purchase_date, expiry_date FROM warranties WHERE user_id = :1 ORDER BY expiry_date",
+            """
+            SELECT product_name, NVL(brand,''), TO_CHAR(purchase_date, 'YYYY-MM-DD'), TO_CHAR(expiry_date, 'YYYY-MM-DD')
+            FROM warranties WHERE user_id = :1 ORDER BY expiry_date
+            """,
             (session['user_id'],)
         )
-        rows = [(r[0], r[1], r[2].strftime('%Y-%m-%d'), r[3].strftime('%Y-%m-%d')) for r in cur.fetchall()]
-        return _csv_response(["Product Name", "Brand", "Purchase Date", "Expiry Date"], rows)
+        return _csv_response(["Product Name", "Brand", "Purchase Date", "Expiry Date"], cur, "my_warranties.csv")
     except Exception as e:
+        if cur: cur.close()
         flash(f"❌ Export failed: {e}", "danger")
         return redirect(url_for('my_warranties'))
-    finally:
-        if 'cur' in locals() and cur: cur.close()
 
 @app.route('/admin/export/warranties')
 @admin_required
 def admin_export_warranties():
+    cur = None
     try:
         cur = conn.cursor()
         cur.execute(
             """
-            SELECT u.full_name, w.product_name, NVL(w.brand,''), w.purchase_date, w.expiry_date,
-                   CASE WHEN w.expiry_date >= SYSDATE THEN 'Active' ELSE 'Expired' END
+            SELECT u.full_name, w.product_name, NVL(w.brand,''),
+                   TO_CHAR(w.purchase_date, 'YYYY-MM-DD'), TO_CHAR(w.expiry_date, 'YYYY-MM-DD'),
+                   w.status
             FROM warranties w JOIN users u ON w.user_id = u.user_id
             ORDER BY w.expiry_date
             """
         )
-        rows = [(r[0], r[1], r[2], r[3].strftime('%Y-%m-%d'), r[4].strftime('%Y-%m-%d'), r[5]) for r in cur.fetchall()]
-        return _csv_response(["User", "Product", "Brand", "Purchase Date", "Expiry Date", "Status"], rows)
+        return _csv_response(["User", "Product", "Brand", "Purchase Date", "Expiry Date", "Status"], cur, "warranties.csv")
     except Exception as e:
+        if cur: cur.close()
         flash(f"❌ Export failed: {e}", "danger")
         return redirect(url_for('admin_warranties'))
-    finally:
-        if 'cur' in locals() and cur: cur.close()
 
 @app.route('/admin/export/claims')
 @admin_required
 def admin_export_claims():
+    cur = None
     try:
         cur = conn.cursor()
         cur.execute(
             """
-            SELECT u.full_name, w.product_name, c.claim_date, c.status, c.description
+            SELECT u.full_name, w.product_name, NVL(TO_CHAR(c.claim_date, 'YYYY-MM-DD'), ''), c.status, c.description
             FROM service_claims c
             JOIN warranties w ON c.warranty_id = w.warranty_id
             JOIN users u ON w.user_id = u.user_id
             ORDER BY c.claim_date DESC
             """
         )
-        rows = [(r[0], r[1], r[2].strftime('%Y-%m-%d') if r[2] else '', r[3], r[4]) for r in cur.fetchall()]
-        return _csv_response(["User", "Product", "Claim Date", "Status", "Description"], rows)
+        return _csv_response(["User", "Product", "Claim Date", "Status", "Description"], cur, "claims.csv")
     except Exception as e:
+        if cur: cur.close()
         flash(f"❌ Export failed: {e}", "danger")
         return redirect(url_for('admin_claims'))
-    finally:
-        if 'cur' in locals() and cur: cur.close()
 
 @app.route('/admin/export/products')
 @admin_required
 def admin_export_products():
+    cur = None
     try:
         cur = conn.cursor()
         cur.execute("SELECT brand, model_name, NVL(category,''), NVL(image_url,'') FROM products ORDER BY brand, model_name")
-        rows = [tuple(r) for r in cur.fetchall()]
-        return _csv_response(["Brand", "Model", "Category", "Image URL"], rows)
+        return _csv_response(["Brand", "Model", "Category", "Image URL"], cur, "products.csv")
     except Exception as e:
+        if cur: cur.close()
         flash(f"❌ Export failed: {e}", "danger")
         return redirect(url_for('admin_products'))
-    finally:
-        if 'cur' in locals() and cur: cur.close()
 
 @app.route('/claims', methods=['GET', 'POST'])
 @login_required
@@ -600,7 +3366,9 @@ def claims():
                 flash("Invalid warranty selection.", "danger")
                 return redirect(url_for('claims'))
             cur.execute("INSERT INTO service_claims (warranty_id, description) VALUES (:1, :2)", (warranty_id, description))
+            bump_admin_stats(cur, pending_claims=1)
             conn.commit()
+            reports_cache.clear()
             flash("✅ Claim submitted.", "success")
             try:
                 cur.execute("SELECT product_name FROM warranties WHERE warranty_id = :1", (warranty_id,))
@@ -695,27 +3463,126 @@ def admin_seed():
     except Exception as e:
         return str(e), 500
     finally:
-        if 'cur' in locals() and cur: cur.close()
+        if 'cur' in locals() and cur: cur.close()
+
+# --- Admin dashboard statistics ---
+# admin_stats holds one row per counter. Write paths adjust counters inside their own
+# transaction (bump_admin_stats) and reconcile_admin_stats() recomputes them from the base
+# tables. The 'reconciled' row's updated_at is the snapshot's "stale since" time.
+# expiring_soon is time-dependent, so between reconciles it is only approximately right.
+ADMIN_STATS_KEYS = ("users", "warranties", "expiring_soon", "pending_claims")
+ADMIN_STATS_MAX_AGE = int(os.getenv("ADMIN_STATS_MAX_AGE", "3600"))  # seconds before a background reconcile
+_stats_reconcile_lock = threading.Lock()
+
+def bump_admin_stats(cur, **deltas):
+    """Apply counter deltas on the caller's cursor; committed with the caller's write."""
+    rows = [(int(d), k) for k, d in deltas.items() if d]
+    if not rows:
+        return
+    try:
+        cur.executemany("UPDATE admin_stats SET stat_value = stat_value + :1, updated_at = SYSDATE WHERE stat_key = :2", rows)
+    except Exception as e:
+        # Never fail the user's write over a counter; the next reconcile repairs it
+        app.logger.warning("bump_admin_stats note: %s", e)
+
+# The expiring_soon window on the DB clock; write paths bump with the same test the reconcile counts
+_EXPIRING_SOON_WINDOW = "expiry_date BETWEEN SYSDATE AND SYSDATE + 30"
+_EXPIRING_SOON_FLAG = f"CASE WHEN {_EXPIRING_SOON_WINDOW} THEN 1 ELSE 0 END"
+
+_ADMIN_STATS_SOURCE = f"""
+    SELECT 'users' AS k, (SELECT COUNT(*) FROM users) AS v FROM dual
+    UNION ALL SELECT 'warranties', (SELECT COUNT(*) FROM warranties) FROM dual
+    UNION ALL SELECT 'expiring_soon', (SELECT COUNT(*) FROM warranties WHERE {_EXPIRING_SOON_WINDOW}) FROM dual
+    UNION ALL SELECT 'pending_claims', (SELECT COUNT(*) FROM service_claims WHERE status = 'Pending') FROM dual
+    UNION ALL SELECT 'reconciled', 0 FROM dual
+"""
+# One statement, so the counts and the stored counters come from the same read-consistent
+# snapshot: drift = true count - stored value at that instant. Bumps committed afterwards are
+# already in stat_value and not in the drift, so applying it as a delta loses none of them.
+_ADMIN_STATS_DRIFT_SQL = f"""
+    SELECT src.k, src.v - NVL(s.stat_value, 0), CASE WHEN s.stat_key IS NULL THEN 1 ELSE 0 END
+    FROM ({_ADMIN_STATS_SOURCE}) src LEFT JOIN admin_stats s ON s.stat_key = src.k
+"""
+
+def reconcile_admin_stats():
+    cur = conn.cursor()
+    try:
+        # Count without any table lock; only the short delta UPDATE below takes row locks
+        cur.execute(_ADMIN_STATS_DRIFT_SQL)
+        rows = cur.fetchall()
+        drift = [(int(d), k) for k, d, missing in rows if not missing]
+        cur.executemany("UPDATE admin_stats SET stat_value = stat_value + :1, updated_at = SYSDATE WHERE stat_key = :2", drift)
+        for k, d, missing in rows:
+            if not missing:
+                continue
+            try:
+                cur.execute("INSERT INTO admin_stats (stat_key, stat_value, updated_at) VALUES (:1, :2, SYSDATE)", [k, int(d)])
+            except dbapi.IntegrityError:
+                pass  # a concurrent reconcile created the row first; the next run settles it
+        conn.commit()
+    finally:
+        cur.close()
+
+def _reconcile_admin_stats_in_background():
+    # Single-flight: one reconcile at a time per process
+    if not _stats_reconcile_lock.acquire(blocking=False):
+        return
+
+    def run():
+        try:
+            with app.app_context():
+                reconcile_admin_stats()
+        except Exception:
+            app.logger.exception("Background reconcile_admin_stats failed")
+        finally:
+            _stats_reconcile_lock.release()
+
+    threading.Thread(target=run, name="admin-stats-reconcile", daemon=True).start()
+
+def load_admin_stats():
+    """Return (stats, stale_since) from the snapshot table."""
+    cur = conn.cursor()
+    try:
+        cur.execute("SELECT stat_key, stat_value, updated_at FROM admin_stats")
+        rows = cur.fetchall()
+    finally:
+        cur.close()
+    stats = {k: 0 for k in ADMIN_STATS_KEYS}
+    stale_since = None
+    for key, value, updated_at in rows:
+        if key == 'reconciled':
+            stale_since = updated_at
+        elif key in stats:
+            stats[key] = int(value or 0)
+    return stats, stale_since
 
 @app.route('/admin/dashboard')
 @admin_required
 def admin_dashboard():
-    stats = {"users": 0, "warranties": 0, "expiring_soon": 0, "pending_claims": 0}
+    stats = {k: 0 for k in ADMIN_STATS_KEYS}
+    stale_since = None
     try:
-        cur = conn.cursor()
-        cur.execute("SELECT COUNT(*) FROM users")
-        stats["users"] = cur.fetchone()[0]
-        cur.execute("SELECT COUNT(*) FROM warranties")
-        stats["warranties"] = cur.fetchone()[0]
-        cur.execute("SELECT COUNT(*) FROM warranties WHERE expiry_date BETWEEN SYSDATE AND SYSDATE + 30")
-        stats["expiring_soon"] = cur.fetchone()[0]
-        cur.execute("SELECT COUNT(*) FROM service_claims WHERE status = 'Pending'")
-        stats["pending_claims"] = cur.fetchone()[0]
+        stats, stale_since = load_admin_stats()
+        if stale_since is None:
+            # First view on a fresh database: build the snapshot once
+            reconcile_admin_stats()
+            stats, stale_since = load_admin_stats()
+        elif (datetime.now() - stale_since).total_seconds() > ADMIN_STATS_MAX_AGE:
+            _reconcile_admin_stats_in_background()
     except Exception as e:
         flash(f"❌ Error loading dashboard: {e}", "danger")
-    finally:
-        if 'cur' in locals() and cur: cur.close()
-    return render_template('admin_dashboard.html', stats=stats)
+    return render_template('admin_dashboard.html', stats=stats,
+                           stale_since=stale_since.strftime('%Y-%m-%d %H:%M') if stale_since else None)
+
+@app.route('/admin/dashboard/refresh', methods=['POST'])
+@admin_required
+def admin_dashboard_refresh():
+    try:
+        reconcile_admin_stats()
+        flash("✅ Dashboard statistics refreshed.", "success")
+    except Exception as e:
+        flash(f"❌ Error refreshing statistics: {e}", "danger")
+    return redirect(url_for('admin_dashboard'))
 
 @app.route('/admin/claims')
 @admin_required
@@ -750,15 +3617,7 @@ def admin_claims():
                 """,
                 {"off": offset, "lim": size}
             )
-        for row in cur.fetchall():
-            claims.append({
-                "claim_id": row[0],
-                "user_name": row[1],
-                "product_name": row[2],
-                "claim_date": row[3].strftime('%Y-%m-%d') if row[3] else '',
-                "description": row[4],
-                "status": row[5]
-            })
+        claims = fetch_records(cur, ClaimRecord)
     except Exception as e:
         flash(f"❌ Error loading claims: {e}", "danger")
     finally:
@@ -771,8 +3630,13 @@ def admin_update_claim_status(claim_id):
     new_status = request.form.get('status')
     try:
         cur = conn.cursor()
+        cur.execute("SELECT status FROM service_claims WHERE claim_id = :1 FOR UPDATE", (claim_id,))
+        prev = cur.fetchone()
         cur.execute("UPDATE service_claims SET status = :1 WHERE claim_id = :2", (new_status, claim_id))
+        if prev and (prev[0] == 'Pending') != (new_status == 'Pending'):
+            bump_admin_stats(cur, pending_claims=1 if new_status == 'Pending' else -1)
         conn.commit()
+        reports_cache.clear()
         flash("✅ Claim status updated.", "success")
         try:
             cur.execute(
@@ -812,7 +3676,9 @@ def admin_products():
                 "INSERT INTO products (brand, model_name, category) VALUES (:1, :2, :3)",
                 (brand, model_name, category)
             )
+            bump_catalog_generation(cur)
             conn.commit()
+            product_catalog.invalidate()
             flash("✅ Product added.", "success")
             return redirect(url_for('admin_products'))
         except Exception as e:
@@ -825,17 +3691,9 @@ def admin_products():
         q = request.args.get('q')
         cur = conn.cursor()
         if q:
-            like = f"%{q.lower()}%"
-            cur.execute(
-                """
-                SELECT product_id, brand, model_name, category, image_url, created_at
-                FROM products
-                WHERE LOWER(brand) LIKE :q OR LOWER(model_name) LIKE :q OR LOWER(NVL(category,'')) LIKE :q
-                ORDER BY brand, model_name
-                OFFSET :off ROWS FETCH NEXT :lim ROWS ONLY
-                """,
-                {"q": like, "off": offset, "lim": size}
-            )
+            # Served from the in-process catalog instead of a LIKE '%q%' scan
+            hits = product_catalog.search(q)[offset:offset + size]
+            products = [ProductRecord(p.product_id, p.brand, p.model_name, p.category, p.image_url, p.created_at) for p in hits]
         else:
             cur.execute(
                 """
@@ -846,16 +3704,7 @@ def admin_products():
                 """,
                 {"off": offset, "lim": size}
             )
-        for row in cur.fetchall():
-            products.append({
-                "product_id": row[0],
-                "brand": row[1],
-                "model_name": row[2],
-                "category": row[3],
-                "image_url": row[4],
-                "added_day": (row[5].strftime('%A') if row[5] else ''),
-                "added_datetime": (row[5].strftime('%Y-%m-%d %H:%M') if row[5] else '')
-            })
+            products = fetch_records(cur, ProductRecord)
     except Exception as e:
         flash(f"❌ Error loading products: {e}", "danger")
     finally:
@@ -900,7 +3749,9 @@ def admin_verify_product(product_id: int):
     try:
         cur = conn.cursor()
         cur.execute("UPDATE products SET verified = 'Y' WHERE product_id = :1", (product_id,))
+        bump_catalog_generation(cur)
         conn.commit()
+        product_catalog.invalidate()
         if cur.rowcount and cur.rowcount > 0:
             flash("✅ Product verified.", "success")
         else:
@@ -945,7 +3796,9 @@ def admin_delete_product(product_id: int):
     try:
         cur = conn.cursor()
         cur.execute("DELETE FROM products WHERE product_id = :1", (product_id,))
+        bump_catalog_generation(cur)
         conn.commit()
+        product_catalog.invalidate()
         flash("✅ Product deleted.", "success")
     except Exception as e:
         flash(f"❌ Error deleting product: {e}", "danger")
@@ -958,17 +3811,87 @@ def admin_delete_product(product_id: int):
 @admin_required
 def admin_users():
     page, size, offset = _get_page_and_size()
+    q = request.args.get('q')
     users = []
     try:
         cur = conn.cursor()
-        cur.execute("SELECT user_id, full_name, email FROM users ORDER BY full_name OFFSET :off ROWS FETCH NEXT :lim ROWS ONLY", {"off": offset, "lim": size})
-        for row in cur.fetchall():
-            users.append({"user_id": row[0], "full_name": row[1], "email": row[2]})
+        terms = search_terms(q)[:SEARCH_MAX_TERMS]
+        if terms:
+            hits_sql, bind = _search_hits_sql(terms, 'U')
+            bind.update({"off": offset, "lim": size})
+            cur.execute(
+                f"SELECT u.user_id, u.full_name, u.email FROM ({hits_sql}) hits JOIN users u ON u.user_id = hits.hit_id "
+                "ORDER BY hits.score DESC, u.full_name OFFSET :off ROWS FETCH NEXT :lim ROWS ONLY",
+                bind
+            )
+        else:
+            cur.execute("SELECT user_id, full_name, email FROM users ORDER BY full_name OFFSET :off ROWS FETCH NEXT :lim ROWS ONLY", {"off": offset, "lim": size})
+        users = fetch_records(cur, UserRecord)
     except Exception as e:
         flash(f"❌ Error loading users: {e}", "danger")
     finally:
         if 'cur' in locals() and cur: cur.close()
-    return render_template('admin_users.html', users=users, page=page, size=size)
+    return render_template('admin_users.html', users=users, q=q, page=page, size=size)
+
+REPORTS_CACHE_TTL = int(os.getenv("REPORTS_CACHE_TTL", "300"))
+# Claims summary pages, keyed by (page, size); cleared whenever a claim is added, changes status or is deleted
+reports_cache = TtlLruCache(maxsize=256, ttl=REPORTS_CACHE_TTL)
+
+def _section_page(prefix, default_size=20):
+    try:
+        page = int(request.args.get(f'{prefix}_page', '1'))
+        size = int(request.args.get(f'{prefix}_size', str(default_size)))
+    except ValueError:
+        page, size = 1, default_size
+    page = max(1, page)
+    size = min(max(5, size), 100)
+    return page, size, (page - 1) * size
+
+def _fetch_page(cur, sql, binds, size):
+    """Run an OFFSET/FETCH query for size + 1 rows; returns (rows, has_next)."""
+    b = dict(binds)
+    b["lim"] = size + 1
+    cur.arraysize = size + 1
+    cur.execute(sql, b)
+    rows = cur.fetchall()
+    return rows[:size], len(rows) > size
+
+def _claims_summary_page(cur, page, size, offset):
+    key = ("claims_summary", page, size)
+    cached = reports_cache.get(key)
+    if cached is not None:
+        return cached
+    rows, has_next = _fetch_page(
+        cur,
+        """
+        SELECT u.full_name AS user_name, w.product_name AS product_name,
+               COUNT(c.claim_id) AS total_claims,
+               SUM(CASE WHEN c.status = 'Pending' THEN 1 ELSE 0 END) AS pending_claims,
+               SUM(CASE WHEN c.status = 'In Progress' THEN 1 ELSE 0 END) AS in_progress_claims,
+               SUM(CASE WHEN c.status = 'Completed' THEN 1 ELSE 0 END) AS completed_claims,
+               SUM(CASE WHEN c.status = 'Denied' THEN 1 ELSE 0 END) AS denied_claims
+        FROM service_claims c
+        JOIN warranties w ON c.warranty_id = w.warranty_id
+        JOIN users u ON w.user_id = u.user_id
+        GROUP BY u.full_name, w.product_name
+        ORDER BY u.full_name, w.product_name
+        OFFSET :off ROWS FETCH NEXT :lim ROWS ONLY
+        """,
+        {"off": offset},
+        size
+    )
+    summary = [{
+        "user_name": r[0],
+        "product_name": r[1],
+        "total_claims": int(r[2] or 0),
+        "pending_claims": int(r[3] or 0),
+        "in_progress_claims": int(r[4] or 0),
+        "completed_claims": int(r[5] or 0),
+        "denied_claims": int(r[6] or 0)
+    } for r in rows]
+    result = (summary, has_next)
+    reports_cache.set(key, result)
+    return result
 
 @app.route('/admin/reports')
 @admin_required
@@ -976,61 +3899,223 @@ def admin_reports():
     expired = []
     upcoming = []
     claims_summary = []
+    ex_page, ex_size, ex_off = _section_page('ex')
+    up_page, up_size, up_off = _section_page('up')
+    cs_page, cs_size, cs_off = _section_page('cs')
+    ex_next = up_next = cs_next = False
     try:
         cur = conn.cursor()
-        # Expired warranties
-        cur.execute(
+        # Expired warranties: descending range scan on ix_warranties_status_expiry, stops after one page
+        rows, ex_next = _fetch_page(
+            cur,
             """
             SELECT w.product_name, u.full_name, w.expiry_date
             FROM warranties w
             JOIN users u ON w.user_id = u.user_id
-            WHERE w.expiry_date < SYSDATE
+            WHERE w.status = 'Expired'
             ORDER BY w.expiry_date DESC
-            """
+            OFFSET :off ROWS FETCH NEXT :lim ROWS ONLY
+            """,
+            {"off": ex_off},
+            ex_size
         )
-        expired = [{"product_name": r[0], "user_name": r[1], "expiry_date": r[2].strftime('%Y-%m-%d')} for r in cur.fetchall()]
+        expired = [{"product_name": r[0], "user_name": r[1], "expiry_date": r[2].strftime('%Y-%m-%d')} for r in rows]
         # Upcoming 30 days
-        cur.execute(
+        rows, up_next = _fetch_page(
+            cur,
             """
             SELECT w.product_name, u.full_name, w.expiry_date
             FROM warranties w
             JOIN users u ON w.user_id = u.user_id
             WHERE w.expiry_date BETWEEN SYSDATE AND SYSDATE + 30
             ORDER BY w.expiry_date ASC
-            """
-        )
-        upcoming = [{"product_name": r[0], "user_name": r[1], "expiry_date": r[2].strftime('%Y-%m-%d')} for r in cur.fetchall()]
-        # Claims summary
-        cur.execute(
-            """
-            SELECT u.full_name AS user_name, w.product_name AS product_name,
-                   COUNT(c.claim_id) AS total_claims,
-                   SUM(CASE WHEN c.status = 'Pending' THEN 1 ELSE 0 END) AS pending_claims,
-                   SUM(CASE WHEN c.status = 'In Progress' THEN 1 ELSE 0 END) AS in_progress_claims,
-                   SUM(CASE WHEN c.status = 'Completed' THEN 1 ELSE 0 END) AS completed_claims,
-                   SUM(CASE WHEN c.status = 'Denied' THEN 1 ELSE 0 END) AS denied_claims
-            FROM service_claims c
-            JOIN warranties w ON c.warranty_id = w.warranty_id
-            JOIN users u ON w.user_id = u.user_id
-            GROUP BY u.full_name, w.product_name
-            ORDER BY u.full_name, w.product_name
-            """
+            OFFSET :off ROWS FETCH NEXT :lim ROWS ONLY
+            """,
+            {"off": up_off},
+            up_size
         )
-        for r in cur.fetchall():
-            claims_summary.append({
-                "user_name": r[0],
-                "product_name": r[1],
-                "total_claims": int(r[2] or 0),
-                "pending_claims": int(r[3] or 0),
-                "in_progress_claims": int(r[4] or 0),
-                "completed_claims": int(r[5] or 0),
-                "denied_claims": int(r[6] or 0)
-            })
+        upcoming = [{"product_name": r[0], "user_name": r[1], "expiry_date": r[2].strftime('%Y-%m-%d')} for r in rows]
+        # Claims summary (cached)
+        claims_summary, cs_next = _claims_summary_page(cur, cs_page, cs_size, cs_off)
     except Exception as e:
         flash(f"❌ Error loading reports: {e}", "danger")
     finally:
         if 'cur' in locals() and cur: cur.close()
-    return render_template('admin_reports.html', expired=expired, upcoming=upcoming, claims_summary=claims_summary)
+    pages = {
+        "ex": {"page": ex_page, "size": ex_size, "has_next": ex_next},
+        "up": {"page": up_page, "size": up_size, "has_next": up_next},
+        "cs": {"page": cs_page, "size": cs_size, "has_next": cs_next},
+    }
+    return render_template('admin_reports.html', expired=expired, upcoming=upcoming, claims_summary=claims_summary, pages=pages)
+
+@app.route('/admin/db/pool')
+@admin_required
+def admin_db_pool():
+    return jsonify(db_pool_stats())
+
+@app.route('/admin/db/sql')
+@admin_required
+def admin_db_sql():
+    """Per-statement timings from this process plus Oracle parse counters."""
+    cur = conn.cursor()
+    try:
+        parse = db_parse_stats(cur)
+    finally:
+        cur.close()
+    return jsonify({"stmtcachesize": DB_STMT_CACHE_SIZE, "registered": len(SQL), "app": sql_stats(), **parse})
+
+@app.route('/admin/metrics')
+def admin_metrics():
+    """Prometheus text exposition; admin session or `Authorization: Bearer $METRICS_TOKEN`."""
+    token_ok = bool(METRICS_TOKEN) and hmac.compare_digest(
+        request.headers.get("Authorization", "").encode("utf-8"), f"Bearer {METRICS_TOKEN}".encode("utf-8"))
+    if not token_ok and 'admin_id' not in session:
+        return Response("forbidden\n", status=403, mimetype="text/plain")
+    return Response(render_prometheus(), mimetype="text/plain; version=0.0.4")
+
+@app.cli.command("bench-metrics")
+@click.option("--requests", "n", default=2000, show_default=True, help="Requests per mode.")
+@click.option("--path", default="/login", show_default=True, help="GET path to hit (should not need a session).")
+def bench_metrics(n, path):
+    """Compare request latency with metrics off, at METRICS_SAMPLE_RATE, and fully traced."""
+    global METRICS_ENABLED, METRICS_SAMPLE_RATE
+    saved = (METRICS_ENABLED, METRICS_SAMPLE_RATE)
+    client = app.test_client()
+    modes = [("off", False, 0.0), (f"sampled {saved[1]:g}", True, saved[1]), ("traced 1.0", True, 1.0)]
+    try:
+        for _ in range(min(200, n)):  # warm up Jinja and the URL map
+            client.get(path)
+        results = {}
+        # Interleave rounds so CPU frequency drift hits every mode equally
+        for _ in range(5):
+            for label, enabled, rate in modes:
+                METRICS_ENABLED, METRICS_SAMPLE_RATE = enabled, rate
+                t0 = time.perf_counter()
+                for _ in range(n // 5):
+                    client.get(path)
+                results.setdefault(label, []).append((time.perf_counter() - t0) / (n // 5))
+    finally:
+        METRICS_ENABLED, METRICS_SAMPLE_RATE = saved
+        metrics.reset()
+    base = min(results["off"])
+    for label, _, _ in modes:
+        best = min(results[label])
+        click.echo(f"{label:16s} {best * 1e6:9.1f} us/request  overhead {100.0 * (best - base) / base:+6.2f}%")
+
+_BENCH_ROUTE_MIX = (
+    # (weight, label, method, path template); {wid} is one of the session user's warranties
+    (30, "my_warranties", "GET", "/my-warranties"),
+    (10, "my_warranties_q", "GET", "/my-warranties?q=lap"),
+    (15, "get_notifications", "GET", "/get_notifications"),
+    (10, "warranty_detail", "GET", "/warranty/{wid}"),
+    (10, "expiring", "GET", "/expiring"),
+    (10, "suggest", "GET", "/api/products/suggest?q=so"),
+    (5, "add_warranty", "POST", "/add-warranty"),
+    (5, "edit_warranty", "POST", "/warranty/{wid}/edit"),
+    (5, "mark_read", "POST", "/mark_notifications_read"),
+)
+_BENCH_PRODUCTS = (("Laptop", "Dell"), ("Phone", "Samsung"), ("TV", "Sony"), ("Fridge", "LG"), ("Washer", "Bosch"))
+
+def _bench_warranty_form(rnd, tag):
+    product, brand = rnd.choice(_BENCH_PRODUCTS)
+    purchased = date.today() - timedelta(days=rnd.randint(0, 900))
+    return {"product_name": f"{product} {tag}", "brand": brand, "purchase_date": purchased.isoformat(),
+            "period_value": str(rnd.choice((6, 12, 24))), "period_unit": "months"}
+
+@app.cli.command("bench-routes")
+@click.option("--users", default=16, show_default=True, help="Synthetic @bench.invalid accounts (one logged-in client each).")
+@click.option("--threads", default=8, show_default=True, help="Concurrent client threads.")
+@click.option("--seconds", default=10.0, show_default=True, help="Length of the timed run.")
+@click.option("--warranties", default=20, show_default=True, help="Warranties each account adds before the run.")
+def bench_routes_command(users, threads, seconds, warranties):
+    """Drive the user routes from concurrent test clients against the configured DB_BACKEND
+    and report throughput and per-route latency. Remove the accounts afterwards with
+    `flask bench-admin-search --cleanup`."""
+    run_id = int(time.time())
+    sessions = []
+    for i in range(users):
+        rnd = random.Random(i)
+        client = app.test_client()
+        email = f"route-{run_id}-{i}@{_BENCH_EMAIL_DOMAIN}"
+        client.post("/register", data={"full_name": f"Bench User {i}", "email": email, "password": "bench-pass"})
+        if client.post("/login", data={"email": email, "password": "bench-pass"}).status_code >= 400:
+            raise click.ClickException(f"could not log in as {email}")
+        for k in range(warranties):
+            client.post("/add-warranty", data=_bench_warranty_form(rnd, f"{i}-{k}"))
+        with app.app_context():
+            cur = conn.cursor()
+            try:
+                cur.execute("SELECT w.warranty_id FROM warranties w JOIN users u ON u.user_id = w.user_id WHERE u.email = :1", (email,))
+                wids = [int(r[0]) for r in cur]
+            finally:
+                cur.close()
+        sessions.append((client, wids, rnd))
+    click.echo(f"Set up {users} accounts with {warranties} warranties each ({DB_BACKEND} backend)")
+
+    weights = [m[0] for m in _BENCH_ROUTE_MIX]
+    timings, errors = {}, {}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+
+    def worker(n):
+        mine = sessions[n::threads]
+        local, failed, seq = {}, {}, 0
+        while mine and time.perf_counter() < deadline:
+            client, wids, rnd = mine[seq % len(mine)]
+            seq += 1
+            _, label, method, path = rnd.choices(_BENCH_ROUTE_MIX, weights)[0]
+            if "{wid}" in path:
+                if not wids:
+                    continue
+                path = path.format(wid=rnd.choice(wids))
+            t0 = time.perf_counter()
+            if method == "GET":
+                resp = client.get(path)
+            elif label == "mark_read":
+                resp = client.post(path)
+            else:
+                resp = client.post(path, data=_bench_warranty_form(rnd, f"{n}-{seq}"))
+            local.setdefault(label, []).append((time.perf_counter() - t0) * 1000.0)
+            if resp.status_code >= 500:
+                failed[label] = failed.get(label, 0) + 1
+        with lock:
+            for label, samples in local.items():
+                timings.setdefault(label, []).extend(samples)
+            for label, count in failed.items():
+                errors[label] = errors.get(label, 0) + count
+
+    t0 = time.perf_counter()
+    pool = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    elapsed = time.perf_counter() - t0
+    total = sum(len(v) for v in timings.values())
+    click.echo(f"{total} requests in {elapsed:.1f}s with {threads} threads: {total / elapsed:.0f} req/s")
+    for label in sorted(timings, key=lambda k: -len(timings[k])):
+        samples = timings[label]
+        click.echo(f"  {label:18s} n={len(samples):6d}  p50={_percentile(samples, 50):7.2f} ms  "
+              f"p99={_percentile(samples, 99):7.2f} ms  5xx={errors.get(label, 0)}")
+
+@app.cli.command("sql-stats")
+def sql_stats_command():
+    """Print shared-pool parse stats for registered statements and literal-only SQL variants."""
+    cur = conn.cursor()
+    try:
+        parse = db_parse_stats(cur)
+    finally:
+        cur.close()
+    if "error" in parse:
+        click.echo(parse["error"])
+        return
+    click.echo(f"{'statement':40s} {'execs':>10s} {'parses':>10s} {'hard':>6s} {'children':>8s}")
+    for r in parse["statements"]:
+        click.echo(f"{r['name']:40s} {r['executions']:10d} {r['parse_calls']:10d} {r['hard_parses']:6d} {r['child_cursors']:8d}")
+    if parse["literal_offenders"]:
+        click.echo("\nSQL differing only in literals:")
+        for r in parse["literal_offenders"]:
+            click.echo(f"  {r['variants']:5d} variants, {r['hard_parses']:5d} hard parses: {r['sample']}")
 
 # --- Core Routes ---
 @app.route('/')
@@ -1038,125 +4123,284 @@ def admin_reports():
 def home():
     return render_template('home.html')
 
+_MY_WARRANTIES_WHERE = {
+    "all": "user_id = :uid",
+    "q": "user_id = :uid AND (LOWER(product_name) LIKE :q OR LOWER(NVL(brand,'')) LIKE :q)",
+}
+_MY_WARRANTIES_COLUMNS = "SELECT warranty_id, NULL, product_name, brand, purchase_date, expiry_date, invoice_path, status "
+SQL_MY_WARRANTIES = {}
+for _variant, _where in _MY_WARRANTIES_WHERE.items():
+    SQL_MY_WARRANTIES[("count", _variant)] = register_sql(
+        f"my_warranties.count_{_variant}", f"SELECT COUNT(*) FROM warranties WHERE {_where}")
+    SQL_MY_WARRANTIES[("page", _variant)] = register_sql(
+        f"my_warranties.page_{_variant}",
+        _MY_WARRANTIES_COLUMNS + f"FROM warranties WHERE {_where} "
+        "ORDER BY expiry_date ASC, warranty_id ASC OFFSET :off ROWS FETCH NEXT :lim ROWS ONLY")
+    SQL_MY_WARRANTIES[("after", _variant)] = register_sql(
+        f"my_warranties.after_{_variant}",
+        _MY_WARRANTIES_COLUMNS + f"FROM warranties WHERE {_where} "
+        "AND (expiry_date > :c_exp OR (expiry_date = :c_exp AND warranty_id > :c_id)) "
+        "ORDER BY expiry_date ASC, warranty_id ASC FETCH NEXT :lim ROWS ONLY")
+
 @app.route('/my-warranties')
 @login_required
 def my_warranties():
     page, size, offset = _get_page_and_size()
     warranties = []
+    total = 0
+    next_cursor = None
     try:
         cur = conn.cursor()
-        # Generate notifications (no email) for expired and next-7-days before listing
-        try:
-            generate_warranty_notifications(session['user_id'], days=7, send_email_now=False)
-        except Exception:
-            pass
         q = request.args.get('q')
+        cursor_after = _parse_keyset_cursor(request.args.get('after'))
+        binds = {"uid": int(session['user_id'])}
         if q:
-            sql = (
-                "SELECT warranty_id, product_name, brand, purchase_date, expiry_date, invoice_path "
-                "FROM warranties WHERE user_id = :1 "
-                "AND (LOWER(product_name) LIKE :2 OR LOWER(NVL(brand,'')) LIKE :2) "
-                "ORDER BY expiry_date ASC"
-            )
-            params = (int(session['user_id']), f"%{q.lower()}%")
+            binds["q"] = f"%{q.lower()}%"
+        variant = "q" if q else "all"
+
+        # Cheap count for page controls; served by ix_warranties_user_expiry
+        execute_sql(cur, SQL_MY_WARRANTIES[("count", variant)], binds)
+        total = int(cur.fetchone()[0] or 0)
+
+        page_binds = dict(binds)
+        page_binds["lim"] = int(size)
+        if cursor_after:
+            # Keyset page: seek past the last (expiry_date, warranty_id) seen instead of skipping rows
+            stmt = SQL_MY_WARRANTIES[("after", variant)]
+            page_binds["c_exp"], page_binds["c_id"] = cursor_after
         else:
-            sql = (
-                f"SELECT warranty_id, product_name, brand, purchase_date, expiry_date, invoice_path "
-                f"FROM warranties WHERE user_id = {int(session['user_id'])} "
-                f"ORDER BY expiry_date ASC"
-            )
-            params = None
+            stmt = SQL_MY_WARRANTIES[("page", variant)]
+            page_binds["off"] = int(offset)
         try:
-            if params is not None:
-                cur.execute(sql, params)
-            else:
-                cur.execute(sql)
-        except Exception as e:
-            print("my_warranties main SELECT failed")
-            print("SQL:", sql)
+            cur.arraysize = int(size)
+            execute_sql(cur, stmt, page_binds)
+        except Exception:
+            app.logger.exception("my_warranties SELECT failed (%s)", stmt.name)
             raise
 
-        rows = cur.fetchall()
-        # Python-side pagination
-        start_ix = int(offset)
-        end_ix = int(offset) + int(size)
-        paged = rows[start_ix:end_ix]
-
-        today = date.today()
-        thirty_days_from_now = today + relativedelta(days=30)
-        notify_on_list = False  # notifications now handled by generate_warranty_notifications
-
-        for row in paged:
-            warranty_id = row[0]
-            expiry_date_from_db = row[4].date()
-            
-            # Notification generation moved to generate_warranty_notifications
-            
-            warranties.append({
-                'id': warranty_id,
-                'product_name': row[1],
-                'brand': row[2],
-                'purchase_date': row[3].strftime('%Y-%m-%d'),
-                'expiry_date': row[4].strftime('%Y-%m-%d'),
-                'invoice_path': row[5],
-                'status': "Active" if expiry_date_from_db >= today else "Expired"
-            })
+        warranties = fetch_records(cur, WarrantyRecord)
+        if warranties and page * size < total:
+            next_cursor = _make_keyset_cursor(warranties[-1].expiry_date, warranties[-1].warranty_id)
     except Exception as e:
         flash(f"❌ Error fetching warranties: {e}", "danger")
     finally:
         if 'cur' in locals() and cur: cur.close()
-    return render_template('my_warranties.html', warranties=warranties, page=page, size=size)
+    pages = max(1, (total + size - 1) // size)
+    return render_template('my_warranties.html', warranties=warranties, page=page, size=size,
+                           total=total, pages=pages, next_cursor=next_cursor)
 
-@app.route('/add-warranty', methods=['GET', 'POST'])
+# Warranty helpers shared by add/edit and bulk import
+def _parse_date_flexible(s):
+    try:
+        return date.fromisoformat(s)
+    except Exception:
+        return datetime.strptime(s, "%d-%m-%Y").date()
+
+def _normalize_pair(brand, name):
+    return (str(brand or '').strip().lower(), str(name or '').strip().lower())
+
+SQL_WARRANTY_EXISTS = register_sql(
+    "warranties.exists",
+    "SELECT COUNT(*) FROM warranties WHERE user_id = :1 "
+    "AND LOWER(product_name) = :2 AND LOWER(NVL(brand,'')) = :3"
+)
+SQL_WARRANTY_EXISTS_OTHER = register_sql(
+    "warranties.exists_other",
+    "SELECT COUNT(*) FROM warranties WHERE user_id = :1 AND warranty_id <> :2 "
+    "AND LOWER(product_name) = :3 AND LOWER(NVL(brand,'')) = :4"
+)
+
+def _user_warranty_exists(user_id, product_name, brand, exclude_id=None):
+    cur = conn.cursor()
+    try:
+        if exclude_id is None:
+            execute_sql(cur, SQL_WARRANTY_EXISTS, (int(user_id), product_name.lower(), (brand or '').lower()))
+        else:
+            execute_sql(cur, SQL_WARRANTY_EXISTS_OTHER,
+                        (int(user_id), int(exclude_id), product_name.lower(), (brand or '').lower()))
+        row = cur.fetchone()
+    finally:
+        cur.close()
+    return (row[0] if row else 0) > 0
+
+@app.route('/api/products/suggest')
 @login_required
-def add_warranty():
-    def _db_select_one(sql, params=None):
-        cur = conn.cursor()
-        try:
-            if params is not None:
-                cur.execute(sql, params)
-            else:
-                cur.execute(sql)
-            return cur.fetchone()
-        finally:
-            cur.close()
+def suggest_products():
+    """Typeahead for the add-warranty form, served from the in-memory product index."""
+    q = (request.args.get('q') or '').strip()
+    try:
+        limit = max(1, min(int(request.args.get('limit', 10)), 50))
+    except ValueError:
+        limit = 10
+    if not q:
+        return jsonify({"items": []})
+    items = [{
+        "product_id": p.product_id,
+        "brand": p.brand,
+        "model_name": p.model_name,
+        "category": p.category,
+        "verified": p.verified == 'Y'
+    } for p in product_catalog.suggest(q, limit)]
+    return jsonify({"items": items})
 
-    def _db_execute(sql, params=None, commit=True):
+def _synthetic_catalog(n, seed=7):
+    rnd = random.Random(seed)
+    brands = [f"{a}{b}" for a in ("Sam", "Sony", "Phil", "Bosch", "Dell", "Len", "Acer", "Asus", "Pana", "Whirl",
+                                   "Haier", "Vol", "Bajaj", "Godrej", "Canon", "Nikon", "Apple", "Hav", "Orient", "Usha")
+              for b in ("", "tek", "ex", "ora", "line", "max", "co", "tron", "ion", "ix")]
+    series = ["Galaxy", "Bravia", "Inspiron", "ThinkPad", "Aspire", "ZenBook", "Viera", "Pixma", "Coolpix",
+              "Mixer", "Fridge", "Washer", "Dryer", "Fan", "Heater", "Kettle", "Iron", "Trimmer", "Router", "Monitor"]
+    categories = ["Electronics", "Appliances", "Computers", "Cameras", "Kitchen", "Personal Care", None]
+    seen, out = set(), []
+    while len(out) < n:
+        brand = rnd.choice(brands)
+        model = f"{rnd.choice(series)} {rnd.choice('ABCDEFGHKMQSTXZ')}{rnd.randint(10, 9999)}"
+        key = _normalize_pair(brand, model)
+        if key in seen:
+            continue
+        seen.add(key)
+        out.append(CatalogProduct(len(out) + 1, brand, model, rnd.choice(categories), None,
+                                  'Y' if rnd.random() < 0.7 else 'N', None))
+    return out
+
+def _percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))]
+
+@app.cli.command("bench-row-mapping")
+@click.option("--rows", default=10000, show_default=True, help="Synthetic warranty rows to map.")
+def bench_row_mapping_command(rows):
+    """Allocations/time for mapping rows: per-row dicts with strftime vs WarrantyRecord."""
+    import tracemalloc
+    today = datetime.now()
+    raw = [(i, "Asha Rao", f"Galaxy S{i % 90}", "Samsung", today - relativedelta(days=i % 900),
+            today + relativedelta(days=i % 700), None, 'Active') for i in range(rows)]
+
+    def as_dicts():
+        return [{
+            'warranty_id': r[0], 'user_name': r[1], 'product_name': r[2], 'brand': r[3],
+            'purchase_date': r[4].strftime('%Y-%m-%d'), 'expiry_date': r[5].strftime('%Y-%m-%d'),
+            'invoice_path': r[6], 'status': r[7]
+        } for r in raw]
+
+    def as_records():
+        return [WarrantyRecord(*r) for r in raw]
+
+    for label, build in (("dict + strftime", as_dicts), ("WarrantyRecord", as_records)):
+        tracemalloc.start()
+        t0 = time.perf_counter()
+        built = build()
+        elapsed = (time.perf_counter() - t0) * 1000
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        click.echo(f"{label:16s} {rows} rows: {current / 1024:8.0f} KiB retained, {peak / 1024:8.0f} KiB peak, "
+              f"{elapsed:7.1f} ms ({current / rows:.0f} B/row)")
+        del built
+
+@app.cli.command("bench-product-suggest")
+@click.option("--products", default=100000, show_default=True, help="Synthetic catalog size.")
+@click.option("--queries", default=2000, show_default=True, help="Typeahead queries to time.")
+@click.option("--scan-queries", default=100, show_default=True, help="Queries to time on the LIKE-scan paths.")
+@click.option("--db/--no-db", default=False, help="Also time the old LOWER(...) LIKE query against the live products table.")
+def bench_product_suggest_command(products, queries, scan_queries, db):
+    """Compare /api/products/suggest's index with the LIKE '%q%' scan used by admin product search."""
+    catalog = _synthetic_catalog(products)
+    rnd = random.Random(11)
+    workload = []
+    for _ in range(queries):
+        p = rnd.choice(catalog)
+        field = rnd.choice((p.brand, p.model_name, f"{p.brand} {p.model_name}"))
+        workload.append(field[:rnd.randint(1, min(len(field), 12))])
+
+    index = ProductSuggestIndex()
+    t0 = time.perf_counter()
+    index.sync(catalog)
+    build_ms = (time.perf_counter() - t0) * 1000
+
+    timings = []
+    for q in workload:
+        t0 = time.perf_counter()
+        index.search(q, 10)
+        timings.append((time.perf_counter() - t0) * 1000)
+    click.echo(f"index: {len(index)} products, built in {build_ms:.0f} ms")
+    click.echo(f"index search: p50={_percentile(timings, 50):.3f} ms  p99={_percentile(timings, 99):.3f} ms  "
+          f"max={max(timings):.3f} ms over {len(timings)} queries")
+
+    # In-process equivalent of LOWER(col) LIKE '%q%' over every row: a lower bound for what Oracle does
+    scan = []
+    for q in workload[:scan_queries]:
+        needle = q.lower()
+        t0 = time.perf_counter()
+        hits = [p for p in catalog
+                if needle in p.brand.lower() or needle in p.model_name.lower() or needle in (p.category or '').lower()]
+        hits.sort(key=lambda p: (p.brand, p.model_name))
+        scan.append((time.perf_counter() - t0) * 1000)
+    click.echo(f"substring scan: p50={_percentile(scan, 50):.3f} ms  p99={_percentile(scan, 99):.3f} ms  "
+          f"(~{_percentile(scan, 50) / max(_percentile(timings, 50), 1e-6):.0f}x the index p50)")
+
+    if db:
+        like_timings = []
         cur = conn.cursor()
         try:
-            if params is not None:
-                cur.execute(sql, params)
-            else:
-                cur.execute(sql)
-            if commit:
-                conn.commit()
-            return cur.rowcount
+            for q in workload[:scan_queries]:
+                t0 = time.perf_counter()
+                cur.execute(
+                    """
+                    SELECT product_id, brand, model_name, category, image_url, created_at
+                    FROM products
+                    WHERE LOWER(brand) LIKE :q OR LOWER(model_name) LIKE :q OR LOWER(NVL(category,'')) LIKE :q
+                    ORDER BY brand, model_name
+                    OFFSET 0 ROWS FETCH NEXT 10 ROWS ONLY
+                    """,
+                    {"q": f"%{q.lower()}%"}
+                )
+                cur.fetchall()
+                like_timings.append((time.perf_counter() - t0) * 1000)
+            cur.execute("SELECT COUNT(*) FROM products")
+            rows = cur.fetchone()[0]
         finally:
             cur.close()
+        click.echo(f"Oracle LIKE scan ({rows} products): p50={_percentile(like_timings, 50):.3f} ms  "
+              f"p99={_percentile(like_timings, 99):.3f} ms")
 
-    def _parse_date_flexible(s):
+def _resolve_product_id(brand, product_name):
+    """Catalog hit -> no DB work. Miss -> create the product, or look it up if another
+    process created it first (ux_products_brand_model_norm)."""
+    cached = product_catalog.lookup(brand, product_name)
+    if cached is not None:
+        return cached.product_id
+    cur = conn.cursor()
+    try:
+        ret_id = cur.var(dbapi.NUMBER)
         try:
-            return date.fromisoformat(s)
-        except Exception:
-            return datetime.strptime(s, "%d-%m-%Y").date()
-
-    def _normalize_pair(brand, name):
-        return (str(brand or '').strip().lower(), str(name or '').strip().lower())
-
-    def _user_warranty_exists(user_id, product_name, brand, exclude_id=None):
-        if exclude_id is None:
-            sql = (
-                "SELECT COUNT(*) FROM warranties WHERE user_id = :1 "
-                "AND LOWER(product_name) = :2 AND LOWER(NVL(brand,'')) = :3"
+            cur.execute(
+                """
+                INSERT INTO products (brand, model_name, category, image_url)
+                VALUES (:1, :2, NULL, NULL)
+                RETURNING product_id INTO :3
+                """,
+                (brand, product_name, ret_id)
             )
-            row = _db_select_one(sql, (int(user_id), product_name.lower(), (brand or '').lower()))
-        else:
-            sql = (
-                "SELECT COUNT(*) FROM warranties WHERE user_id = :1 AND warranty_id <> :2 "
-                "AND LOWER(product_name) = :3 AND LOWER(NVL(brand,'')) = :4"
+            generation = bump_catalog_generation(cur)
+            conn.commit()
+            product_id = int(ret_id.getvalue()[0])
+        except dbapi.IntegrityError:
+            # The process that created it bumped the generation; this one reloads on its next check
+            conn.rollback()
+            b_norm, m_norm = _normalize_pair(brand, product_name)
+            cur.execute(
+                "SELECT product_id FROM products WHERE LOWER(TRIM(brand)) = :1 AND LOWER(TRIM(model_name)) = :2",
+                (b_norm, m_norm)
             )
-            row = _db_select_one(sql, (int(user_id), int(exclude_id), product_name.lower(), (brand or '').lower()))
-        return (row[0] if row else 0) > 0
+            return int(cur.fetchone()[0])
+    finally:
+        cur.close()
+    product_catalog.remember([CatalogProduct(product_id, brand, product_name, None, None, 'N', datetime.now())], generation)
+    return product_id
+
+@app.route('/add-warranty', methods=['GET', 'POST'])
+@login_required
+def add_warranty():
     if request.method == 'POST':
         product_name = request.form['product_name']
         brand = request.form['brand']
@@ -1175,54 +4419,43 @@ def add_warranty():
 
         invoice_filename = None
         if invoice_file and allowed_file(invoice_file.filename):
-            invoice_filename = secure_filename(f"{session['user_id']}_{date.today()}_{invoice_file.filename}")
-            invoice_file.save(os.path.join(app.config['UPLOAD_FOLDER'], invoice_filename))
+            invoice_filename = invoice_store.put_upload(invoice_file)
 
         try:
             if _user_warranty_exists(session['user_id'], product_name, brand):
                 flash("❌ Already exists.", "danger")
                 return redirect(url_for('add_warranty'))
 
-            b_norm, m_norm = _normalize_pair(brand, product_name)
-            row = _db_select_one(
-                "SELECT product_id FROM products WHERE LOWER(TRIM(brand)) = :1 AND LOWER(TRIM(model_name)) = :2",
-                (b_norm, m_norm)
-            )
-            if row:
-                product_id = int(row[0])
-            else:
-                cur = conn.cursor()
-                try:
-                    ret_id = cur.var(cx_Oracle.NUMBER)
-                    cur.execute(
-                        """
-                        INSERT INTO products (brand, model_name, category, image_url)
-                        VALUES (:1, :2, NULL, NULL)
-                        RETURNING product_id INTO :3
-                        """,
-                        (brand, product_name, ret_id)
-                    )
-                    conn.commit()
-                    product_id = int(ret_id.getvalue()[0])
-                finally:
-                    cur.close()
+            product_id = _resolve_product_id(brand, product_name)
 
-            _db_execute(
-                """
-                INSERT INTO warranties (user_id, product_name, brand, product_id, purchase_date, warranty_period_months, expiry_date, invoice_path)
-                VALUES (:1, :2, :3, :4, :5, :6, :7, :8)
-                """,
-                (int(session['user_id']), product_name, brand, product_id, purchase_date, warranty_months, expiry_date, invoice_filename)
-            )
+            cur = conn.cursor()
+            try:
+                new_wid = cur.var(dbapi.NUMBER)
+                soon_out = cur.var(dbapi.NUMBER)
+                cur.execute(
+                    f"""
+                    INSERT INTO warranties (user_id, product_name, brand, product_id, purchase_date, warranty_period_months, expiry_date, invoice_path, status)
+                    VALUES (:1, :2, :3, :4, :5, :6, :7, :8, :9)
+                    RETURNING warranty_id, {_EXPIRING_SOON_FLAG} INTO :10, :11
+                    """,
+                    (int(session['user_id']), product_name, brand, product_id, purchase_date, warranty_months, expiry_date, invoice_filename,
+                     warranty_status(expiry_date), new_wid, soon_out)
+                )
+                warranty_id = int(new_wid.getvalue()[0])
+                bump_admin_stats(cur, warranties=1, expiring_soon=int(soon_out.getvalue()[0]))
+                index_search_entities(cur, 'W', [(warranty_id, _warranty_search_fields(product_name, brand))])
+                conn.commit()
+            finally:
+                cur.close()
+            if invoice_filename:
+                invalidate_user_invoices(session['user_id'])
+                schedule_derivatives(invoice_filename)
+            notify_warranty_changed(session['user_id'], warranty_id, product_name, expiry_date)
             flash("✅ Warranty added successfully!", "success")
             return redirect(url_for('my_warranties'))
         except Exception as e:
             msg = str(e)
-            try:
-                print("Add warranty failed")
-                print("Params:", {"uid": int(session['user_id']), "pn": product_name, "br": brand, "pd": purchase_date, "wm": warranty_months, "ed": expiry_date, "ip": invoice_filename})
-            except Exception:
-                pass
+            app.logger.exception("Add warranty failed")
             if 'ORA-00001' in msg or 'unique' in msg.lower():
                 flash("❌ Already exists.", "danger")
             else:
@@ -1232,6 +4465,274 @@ def add_warranty():
 
     return render_template('add_warranty.html')
 
+# --- Bulk warranty import ---
+# Rows are parsed from a CSV/JSON stream, deduped in memory against the user's existing
+# (product_name, brand) keys (same normalization as ux_warranties_user_prod_brand), products are
+# resolved or created in batches against ux_products_brand_model_norm, and warranties are
+# array-inserted with batcherrors so one bad row never aborts the batch.
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "1000"))
+IMPORT_COLUMNS = ("product_name", "brand", "purchase_date", "period_value", "period_unit")
+
+def iter_import_records(stream, filename):
+    """Yield (row_number, dict) from a CSV, JSON array or JSON-lines upload stream."""
+    name = (filename or '').lower()
+    if name.endswith('.jsonl') or name.endswith('.ndjson'):
+        text = io.TextIOWrapper(stream, encoding='utf-8-sig')
+        for n, line in enumerate(text, start=1):
+            if line.strip():
+                yield n, json.loads(line)
+    elif name.endswith('.json'):
+        data = json.load(io.TextIOWrapper(stream, encoding='utf-8-sig'))
+        for n, rec in enumerate(data if isinstance(data, list) else data.get('warranties', []), start=1):
+            yield n, rec
+    else:
+        reader = csv.DictReader(io.TextIOWrapper(stream, encoding='utf-8-sig', newline=''))
+        # Row 1 is the header, so data starts at line 2
+        for n, rec in enumerate(reader, start=2):
+            yield n, {(k or '').strip().lower(): v for k, v in rec.items()}
+
+def _prepare_import_record(rec):
+    product_name = str(rec.get('product_name') or '').strip()
+    brand = str(rec.get('brand') or '').strip() or None
+    if not product_name:
+        raise ValueError("product_name is required")
+    purchase_date = _parse_date_flexible(str(rec.get('purchase_date') or '').strip())
+    if rec.get('warranty_period_months') not in (None, ''):
+        months = int(rec['warranty_period_months'])
+    else:
+        value = int(rec.get('period_value') or 0)
+        months = value * 12 if str(rec.get('period_unit') or 'months').strip().lower() == 'years' else value
+    if months <= 0:
+        raise ValueError("warranty period must be positive")
+    return product_name, brand, purchase_date, months, purchase_date + relativedelta(months=months)
+
+def _resolve_products(cur, display):
+    """Map normalized (brand, model) -> product_id, creating missing products in one array insert.
+
+    `display` maps each normalized pair to the (brand, model_name) casing to store if it is new.
+    Pairs already in the product catalog never reach the database.
+    """
+    resolved = {}
+    for pair in display:
+        cached = product_catalog.lookup(*display[pair])
+        if cached is not None:
+            resolved[pair] = cached.product_id
+    pairs = [p for p in display if p not in resolved]
+    if not pairs:
+        return resolved
+
+    def lookup(chunk_pairs):
+        for i in range(0, len(chunk_pairs), 500):
+            chunk = chunk_pairs[i:i + 500]
+            binds, conds = {}, []
+            for j, (b, m) in enumerate(chunk):
+                binds[f"b{j}"], binds[f"m{j}"] = b, m
+                conds.append(f"(:b{j}, :m{j})")
+            cur.execute(
+                "SELECT product_id, LOWER(TRIM(brand)), LOWER(TRIM(model_name)) FROM products "
+                f"WHERE (LOWER(TRIM(brand)), LOWER(TRIM(model_name))) IN ({', '.join(conds)})",
+                binds
+            )
+            for pid, b, m in cur:
+                resolved[(b, m)] = int(pid)
+
+    lookup(pairs)
+    missing = [p for p in pairs if p not in resolved]
+    if missing:
+        cur.executemany(
+            "INSERT INTO products (brand, model_name, category, image_url) VALUES (:1, :2, NULL, NULL)",
+            [display[p] for p in missing],
+            batcherrors=True
+        )
+        # ORA-00001 here just means another writer created it first; the re-lookup picks it up
+        lookup(missing)
+    return resolved
+
+def import_warranties(user_id, records):
+    """Import (row_number, dict) records for one user; returns a report with per-row results."""
+    t0 = time.perf_counter()
+    uid = int(user_id)
+    results = []
+    prepared = []
+    cur = conn.cursor()
+    try:
+        cur.execute(
+            "SELECT LOWER(product_name), LOWER(NVL(brand,'')) FROM warranties WHERE user_id = :1",
+            (uid,)
+        )
+        existing = set(cur.fetchall())
+        display = {}
+        for row_no, rec in records:
+            try:
+                product_name, brand, purchase_date, months, expiry = _prepare_import_record(rec)
+            except Exception as e:
+                results.append({"row": row_no, "status": "error", "message": str(e)})
+                continue
+            key = (product_name.lower(), (brand or '').lower())
+            if key in existing:
+                results.append({"row": row_no, "status": "duplicate", "message": "Already exists."})
+                continue
+            existing.add(key)
+            # Products need a brand (NOT NULL); display casing comes from the first row with the pair
+            pair = _normalize_pair(brand, product_name) if brand else None
+            if pair and pair not in display:
+                display[pair] = (brand, product_name)
+            prepared.append((row_no, product_name, brand, pair, purchase_date, months, expiry))
+
+        product_ids = _resolve_products(cur, display) if display else {}
+        new_products = [pair for pair, pid in product_ids.items() if pid not in product_catalog.by_id]
+        # Other processes only see products created here once the generation moves
+        generation = bump_catalog_generation(cur) if new_products else None
+
+        inserted_keys = set()
+        today = date.today()
+        for i in range(0, len(prepared), IMPORT_BATCH_SIZE):
+            batch = prepared[i:i + IMPORT_BATCH_SIZE]
+            cur.executemany(
+                """
+                INSERT INTO warranties (user_id, product_name, brand, product_id, purchase_date, warranty_period_months, expiry_date, status)
+                VALUES (:1, :2, :3, :4, :5, :6, :7, :8)
+                """,
+                [(uid, pn, br, product_ids.get(pair) if pair else None, pd, m, ed, warranty_status(ed, today))
+                 for _n, pn, br, pair, pd, m, ed in batch],
+                batcherrors=True
+            )
+            errors = {err.offset: err for err in cur.getbatcherrors()}
+            for ix, (row_no, pn, br, _pair, _pd, _m, _ed) in enumerate(batch):
+                err = errors.get(ix)
+                if err is None:
+                    inserted_keys.add((pn.lower(), (br or '').lower()))
+                    results.append({"row": row_no, "status": "inserted"})
+                elif err.code == 1:
+                    results.append({"row": row_no, "status": "duplicate", "message": "Already exists."})
+                else:
+                    results.append({"row": row_no, "status": "error", "message": err.message})
+        new_rows = []
+        if inserted_keys:
+            # Re-find the new rows by the unique (user, product, brand) key each was inserted
+            # under; ids are not monotonic across sessions, cached sequences or RAC instances
+            cur.execute(
+                f"""
+                SELECT warranty_id, product_name, brand, TRUNC(expiry_date), {_EXPIRING_SOON_FLAG},
+                       CASE WHEN expiry_date < TRUNC(SYSDATE) + :1 THEN 1 ELSE 0 END
+                FROM warranties WHERE user_id = :2
+                """,
+                (REMINDER_WINDOW_DAYS + 1, uid)
+            )
+            new_rows = [r for r in cur.fetchall() if (r[1].lower(), (r[2] or '').lower()) in inserted_keys]
+        bump_admin_stats(cur, warranties=len(new_rows), expiring_soon=sum(int(r[4]) for r in new_rows))
+        if new_rows:
+            index_search_entities(cur, 'W', [(r[0], _warranty_search_fields(r[1], r[2])) for r in new_rows])
+        conn.commit()
+        # Only after commit, so a rolled-back import can't leave phantom ids in the catalog
+        if new_products:
+            now = datetime.now()
+            product_catalog.remember([CatalogProduct(product_ids[pair], display[pair][0], display[pair][1], None, None, 'N', now)
+                                      for pair in new_products], generation)
+
+        # Reminders for imported warranties already inside the window (the watermark is past them)
+        due = [(uid, int(wid), _reminder_message(pn, exp.date(), today))
+               for wid, pn, _br, exp, _soon, in_window in new_rows if in_window]
+        if due:
+            create_notifications_bulk(due)
+    finally:
+        cur.close()
+    elapsed = time.perf_counter() - t0
+    results.sort(key=lambda r: r["row"])
+    counts = {"inserted": 0, "duplicate": 0, "error": 0}
+    for r in results:
+        counts[r["status"]] += 1
+    return {
+        "rows": len(results),
+        **counts,
+        "elapsed_ms": round(elapsed * 1000, 1),
+        "rows_per_sec": round(len(results) / elapsed, 1) if elapsed > 0 else None,
+        "results": results,
+    }
+
+@app.route('/import-warranties', methods=['POST'])
+@login_required
+def import_warranties_route():
+    upload = request.files.get('import_file')
+    try:
+        if upload and upload.filename:
+            report = import_warranties(session['user_id'], iter_import_records(upload.stream, upload.filename))
+        elif request.is_json:
+            data = request.get_json(silent=True) or []
+            records = data if isinstance(data, list) else data.get('warranties', [])
+            report = import_warranties(session['user_id'], enumerate(records, start=1))
+        else:
+            raise ValueError("Upload a CSV/JSON file or post a JSON array.")
+    except Exception as e:
+        if request.is_json or request.accept_mimetypes.best == 'application/json':
+            return jsonify({"error": str(e)}), 400
+        flash(f"❌ Import failed: {e}", "danger")
+        return redirect(url_for('my_warranties'))
+    if request.is_json or request.accept_mimetypes.best == 'application/json':
+        return jsonify(report)
+    flash(
+        f"✅ Imported {report['inserted']} warranties ({report['duplicate']} duplicates, {report['error']} errors) "
+        f"in {report['elapsed_ms']} ms.",
+        "success" if not report['error'] else "warning"
+    )
+    for r in [r for r in report['results'] if r['status'] == 'error'][:5]:
+        flash(f"Row {r['row']}: {r['message']}", "danger")
+    return redirect(url_for('my_warranties'))
+
+@app.cli.command("import-warranties")
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+@click.option("--user-id", type=int, default=None, help="Owner of the imported warranties.")
+@click.option("--email", default=None, help="Owner's email (alternative to --user-id).")
+@click.option("--report", "report_path", default=None, help="Write per-row results as CSV to this file.")
+def import_warranties_command(path, user_id, email, report_path):
+    """Bulk-import warranties from a CSV/JSON/JSON-lines file."""
+    if user_id is None:
+        if not email:
+            raise click.UsageError("Pass --user-id or --email.")
+        cur = conn.cursor()
+        try:
+            cur.execute("SELECT user_id FROM users WHERE email = :1", (email,))
+            row = cur.fetchone()
+        finally:
+            cur.close()
+        if not row:
+            raise click.UsageError(f"No user with email {email}.")
+        user_id = int(row[0])
+    with open(path, 'rb') as fh:
+        report = import_warranties(user_id, iter_import_records(fh, path))
+    click.echo(
+        f"{report['rows']} rows: {report['inserted']} inserted, {report['duplicate']} duplicates, "
+        f"{report['error']} errors in {report['elapsed_ms']} ms ({report['rows_per_sec']} rows/s)"
+    )
+    if report_path:
+        with open(report_path, 'w', newline='', encoding='utf-8') as out:
+            w = csv.writer(out)
+            w.writerow(["row", "status", "message"])
+            for r in report['results']:
+                w.writerow([r['row'], r['status'], r.get('message', '')])
+
+_EDIT_WARRANTY_SET = (
+    "UPDATE warranties SET product_name = :pn, brand = :br, purchase_date = :pd, "
+    "warranty_period_months = :wm, expiry_date = :ed, status = :st"
+)
+_EDIT_WARRANTY_RETURNING = f" RETURNING {_EXPIRING_SOON_FLAG} INTO :soon"
+SQL_EDIT_WARRANTY_UPDATE = register_sql(
+    "warranties.edit_update",
+    _EDIT_WARRANTY_SET + " WHERE warranty_id = :wid AND user_id = :uid" + _EDIT_WARRANTY_RETURNING)
+SQL_EDIT_WARRANTY_UPDATE_INVOICE = register_sql(
+    "warranties.edit_update_invoice",
+    _EDIT_WARRANTY_SET + ", invoice_path = :ip WHERE warranty_id = :wid AND user_id = :uid" + _EDIT_WARRANTY_RETURNING)
+# Locks the row so the before/after expiring_soon flags bracket exactly this edit
+SQL_EDIT_WARRANTY_LOCK = register_sql(
+    "warranties.edit_lock",
+    f"SELECT {_EXPIRING_SOON_FLAG} FROM warranties WHERE warranty_id = :wid AND user_id = :uid FOR UPDATE")
+SQL_EDIT_WARRANTY_GET = register_sql(
+    "warranties.edit_get",
+    """
+    SELECT warranty_id, product_name, NVL(brand,''), purchase_date, warranty_period_months, expiry_date, NVL(invoice_path,'')
+    FROM warranties WHERE warranty_id = :wid AND user_id = :uid
+    """)
+
 @app.route('/warranty/<int:warranty_id>/edit', methods=['GET', 'POST'])
 @login_required
 def edit_warranty(warranty_id):
@@ -1254,8 +4755,7 @@ def edit_warranty(warranty_id):
 
             invoice_filename = None
             if invoice_file and allowed_file(invoice_file.filename):
-                invoice_filename = secure_filename(f"{session['user_id']}_{date.today()}_{invoice_file.filename}")
-                invoice_file.save(os.path.join(app.config['UPLOAD_FOLDER'], invoice_filename))
+                invoice_filename = invoice_store.put_upload(invoice_file)
 
             from_user_has_dup = False
             try:
@@ -1266,44 +4766,37 @@ def edit_warranty(warranty_id):
                 flash("❌ Already exists.", "danger")
                 return redirect(url_for('edit_warranty', warranty_id=warranty_id))
 
-            params_tuple = (product_name, brand, purchase_date, warranty_months, expiry_date)
+            execute_sql(cur, SQL_EDIT_WARRANTY_LOCK, {"wid": int(warranty_id), "uid": int(session['user_id'])})
+            before = cur.fetchone()
+            soon_out = cur.var(dbapi.NUMBER)
+            binds = {
+                "pn": product_name, "br": brand, "pd": purchase_date, "wm": warranty_months,
+                "ed": expiry_date, "st": warranty_status(expiry_date),
+                "wid": int(warranty_id), "uid": int(session['user_id']), "soon": soon_out,
+            }
+            stmt = SQL_EDIT_WARRANTY_UPDATE
             if invoice_filename:
-                sql_upd = f"""
-                    UPDATE warranties
-                    SET product_name = :1, brand = :2, purchase_date = :3,
-                        warranty_period_months = :4, expiry_date = :5, invoice_path = :6
-                    WHERE warranty_id = {int(warranty_id)} AND user_id = {int(session['user_id'])}
-                """
-                try:
-                    cur.execute(sql_upd, (product_name, brand, purchase_date, warranty_months, expiry_date, invoice_filename))
-                except Exception as e:
-                    print("Edit UPDATE failed (with invoice)")
-                    print("SQL:", sql_upd)
-                    print("Params:", (product_name, brand, purchase_date, warranty_months, expiry_date, invoice_filename))
-                    raise
-            else:
-                sql_upd = f"""
-                    UPDATE warranties
-                    SET product_name = :1, brand = :2, purchase_date = :3,
-                        warranty_period_months = :4, expiry_date = :5
-                    WHERE warranty_id = {int(warranty_id)} AND user_id = {int(session['user_id'])}
-                """
-                try:
-                    cur.execute(sql_upd, params_tuple)
-                except Exception as e:
-                    print("Edit UPDATE failed")
-                    print("SQL:", sql_upd)
-                    print("Params:", params_tuple)
-                    raise
+                stmt = SQL_EDIT_WARRANTY_UPDATE_INVOICE
+                binds["ip"] = invoice_filename
+            try:
+                execute_sql(cur, stmt, binds)
+            except Exception:
+                app.logger.exception("Edit UPDATE failed (%s)", stmt.name)
+                raise
+            updated = cur.rowcount or 0
+            if updated:
+                bump_admin_stats(cur, expiring_soon=int(soon_out.getvalue()[0]) - int(before[0] if before else 0))
+                index_search_entities(cur, 'W', [(warranty_id, _warranty_search_fields(product_name, brand))])
             conn.commit()
+            if updated and invoice_filename:
+                invalidate_user_invoices(session['user_id'])
+                schedule_derivatives(invoice_filename)
+            if updated:
+                notify_warranty_changed(session['user_id'], warranty_id, product_name, expiry_date)
             flash("✅ Warranty updated successfully!", "success")
             return redirect(url_for('my_warranties'))
 
-        sql_get = f"""
-            SELECT warranty_id, product_name, NVL(brand,''), purchase_date, warranty_period_months, expiry_date, NVL(invoice_path,'')
-            FROM warranties WHERE warranty_id = {int(warranty_id)} AND user_id = {int(session['user_id'])}
-            """
-        cur.execute(sql_get)
+        execute_sql(cur, SQL_EDIT_WARRANTY_GET, {"wid": int(warranty_id), "uid": int(session['user_id'])})
         row = cur.fetchone()
         if not row:
             flash("❌ Warranty not found.", "danger")
@@ -1333,12 +4826,26 @@ def edit_warranty(warranty_id):
 def delete_warranty(warranty_id):
     try:
         cur = conn.cursor()
+        # Claims cascade with the warranty, so count its pending ones for the dashboard first
+        cur.execute(
+            "SELECT COUNT(*) FROM service_claims WHERE warranty_id = :1 AND status = 'Pending'",
+            (int(warranty_id),)
+        )
+        pending = int(cur.fetchone()[0] or 0)
+        soon_out = cur.var(dbapi.NUMBER)
         cur.execute(
-            "DELETE FROM warranties WHERE warranty_id = :1 AND user_id = :2",
-            (int(warranty_id), int(session['user_id']))
+            f"DELETE FROM warranties WHERE warranty_id = :1 AND user_id = :2 RETURNING {_EXPIRING_SOON_FLAG} INTO :3",
+            (int(warranty_id), int(session['user_id']), soon_out)
         )
+        deleted = cur.rowcount or 0
+        if deleted:
+            bump_admin_stats(cur, warranties=-deleted, expiring_soon=-sum(int(v) for v in soon_out.getvalue()), pending_claims=-pending)
+            unindex_search_entity(cur, 'W', warranty_id)
         conn.commit()
-        if cur.rowcount and cur.rowcount > 0:
+        if deleted:
+            reports_cache.clear()
+            invalidate_user_invoices(session['user_id'])
+        if deleted > 0:
             flash("✅ Warranty deleted.", "success")
         else:
             flash("❌ Warranty not found or not owned by you.", "danger")
@@ -1348,29 +4855,51 @@ def delete_warranty(warranty_id):
         if 'cur' in locals() and cur: cur.close()
     return redirect(url_for('my_warranties'))
 
+_DEDUPE_VICTIMS = """
+    SELECT warranty_id FROM (
+        SELECT warranty_id,
+               ROW_NUMBER() OVER (
+                   PARTITION BY LOWER(product_name), LOWER(NVL(brand,''))
+                   ORDER BY warranty_id
+               ) rn
+        FROM warranties
+        WHERE user_id = :uid
+    )
+    WHERE rn > 1
+"""
+SQL_DEDUPE_WARRANTIES = register_sql(
+    "warranties.dedupe",
+    f"""
+    DELETE FROM warranties
+    WHERE warranty_id IN ({_DEDUPE_VICTIMS})
+    RETURNING {_EXPIRING_SOON_FLAG} INTO :soon
+    """)
+# Claims cascade with the deleted duplicates, so count their pending ones first (as delete does)
+SQL_DEDUPE_PENDING_CLAIMS = register_sql(
+    "warranties.dedupe_pending_claims",
+    f"""
+    SELECT COUNT(*) FROM service_claims
+    WHERE status = 'Pending' AND warranty_id IN ({_DEDUPE_VICTIMS})
+    """)
+
 @app.route('/dedupe-my-warranties', methods=['POST'])
 @login_required
 def dedupe_my_warranties():
     try:
         cur = conn.cursor()
-        sql = f"""
-            DELETE FROM warranties
-            WHERE ROWID IN (
-                SELECT rid FROM (
-                    SELECT ROWID rid,
-                           ROW_NUMBER() OVER (
-                               PARTITION BY LOWER(product_name), LOWER(NVL(brand,''))
-                               ORDER BY warranty_id
-                           ) rn
-                    FROM warranties
-                    WHERE user_id = {int(session['user_id'])}
-                )
-                WHERE rn > 1
-            )
-        """
-        cur.execute(sql)
+        uid = int(session['user_id'])
+        execute_sql(cur, SQL_DEDUPE_PENDING_CLAIMS, {"uid": uid})
+        pending = int(cur.fetchone()[0] or 0)
+        soon_out = cur.var(dbapi.NUMBER)
+        execute_sql(cur, SQL_DEDUPE_WARRANTIES, {"uid": uid, "soon": soon_out})
         deleted = cur.rowcount or 0
+        if deleted:
+            bump_admin_stats(cur, warranties=-deleted, expiring_soon=-sum(int(v) for v in soon_out.getvalue()),
+                             pending_claims=-pending)
         conn.commit()
+        if deleted:
+            reports_cache.clear()
+            invalidate_user_invoices(session['user_id'])
         # Try to (re)create the unique index after cleanup
         try:
             cur.execute(
@@ -1381,7 +4910,7 @@ def dedupe_my_warranties():
             )
             conn.commit()
         except Exception as ie:
-            print(f"Index ensure after dedupe note: {ie}")
+            app.logger.info("Ensure ux_warranties_user_prod_brand after dedupe note: %s", ie)
         flash(f"✅ Removed {deleted} duplicate warranty record(s).", "success")
     except Exception as e:
         flash(f"❌ Error deduping warranties: {e}", "danger")
@@ -1415,7 +4944,13 @@ def update_profile_name():
         if not full_name:
             return jsonify({"success": False, "error": "Name cannot be empty."}), 400
         cur = conn.cursor()
-        cur.execute("UPDATE users SET full_name = :1 WHERE user_id = :2", (full_name, session['user_id']))
+        email_out = cur.var(str)
+        cur.execute(
+            "UPDATE users SET full_name = :1 WHERE user_id = :2 RETURNING email INTO :3",
+            (full_name, session['user_id'], email_out)
+        )
+        if cur.rowcount:
+            index_search_entities(cur, 'U', [(session['user_id'], _user_search_fields(full_name, email_out.getvalue()[0]))])
         conn.commit()
         return jsonify({"success": True, "full_name": full_name})
     except Exception as e:
@@ -1426,7 +4961,19 @@ def update_profile_name():
 @app.route('/uploads/<filename>')
 @login_required
 def uploaded_file(filename):
-    return send_from_directory(app.config['UPLOAD_FOLDER'], filename)
+    # 404 rather than 403 so invoice names of other users cannot be probed
+    if 'admin_id' not in session and not user_owns_invoice(session['user_id'], filename):
+        abort(404)
+    return serve_invoice(filename)
+
+@app.route('/uploads/<filename>/<kind>')
+@login_required
+def invoice_thumbnail(filename, kind):
+    if kind not in THUMB_SIZES:
+        abort(404)
+    if 'admin_id' not in session and not user_owns_invoice(session['user_id'], filename):
+        abort(404)
+    return serve_invoice_derivative(filename, kind)
 
 # --- Authentication Routes ---
 @app.route('/login', methods=['GET', 'POST'])
@@ -1462,9 +5009,9 @@ def login():
                     send_email(to_email, subject, body)
                 except Exception as _:
                     pass
-                # Also generate 7-day warranty reminders and send via email post-login
+                # Email reminders for warranties that crossed a threshold since the last evaluation
                 try:
-                    generate_warranty_notifications(session['user_id'], days=7, send_email_now=True)
+                    generate_warranty_notifications(session['user_id'], send_email_now=True)
                 except Exception:
                     pass
                 return redirect(url_for('home'))
@@ -1491,7 +5038,13 @@ def register():
             if cur.fetchone():
                 flash("📧 An account with this email already exists.", "warning")
                 return redirect(url_for('register'))
-            cur.execute("INSERT INTO users (full_name, email, password) VALUES (:1, :2, :3)", (full_name, email, hashed_password))
+            new_uid = cur.var(dbapi.NUMBER)
+            cur.execute(
+                "INSERT INTO users (full_name, email, password) VALUES (:1, :2, :3) RETURNING user_id INTO :4",
+                (full_name, email, hashed_password, new_uid)
+            )
+            bump_admin_stats(cur, users=1)
+            index_search_entities(cur, 'U', [(int(new_uid.getvalue()[0]), _user_search_fields(full_name, email))])
             conn.commit()
             # Send a professional welcome email
             try:
@@ -1525,28 +5078,80 @@ def logout():
     return redirect(url_for('login'))
 
 # NEW: These are the API routes the JavaScript uses to fetch and update notifications.
+SQL_NOTIFICATIONS_LATEST = register_sql(
+    "notifications.latest_id", "SELECT NVL(MAX(notification_id), 0) FROM notifications WHERE user_id = :1")
+# Keyed by (has since, has before_id)
+SQL_NOTIFICATIONS_PAGE = {}
+for _since in (False, True):
+    for _before in (False, True):
+        SQL_NOTIFICATIONS_PAGE[(_since, _before)] = register_sql(
+            "notifications.page" + ("_since" if _since else "") + ("_before" if _before else ""),
+            "SELECT notification_id, message, created_at, status FROM notifications WHERE user_id = :uid"
+            + (" AND notification_id > :since" if _since else "")
+            + (" AND notification_id < :before_id" if _before else "")
+            # since pages walk forward from the client's newest id so a burst larger than
+            # :lim is fetched in full over several pages instead of losing the oldest items
+            + (" ORDER BY notification_id ASC" if _since else " ORDER BY notification_id DESC")
+            + " FETCH NEXT :lim ROWS ONLY")
+
 @app.route('/get_notifications')
 @login_required
 def get_notifications():
+    """Newest-first notifications for the bell panel.
+
+    ?limit=N (default 20, max 100), ?before_id=<id> for older pages, ?since=<id> for only
+    items newer than what the client already has. A since page holds the oldest `limit` of
+    those; when it is full, next_since is the cursor for the following page. A weak ETag over
+    the user's latest id and unread count lets an unchanged panel revalidate with 304.
+    """
+    uid = int(session['user_id'])
+    try:
+        limit = min(max(1, int(request.args.get('limit', '20'))), 100)
+        before_id = int(request.args['before_id']) if request.args.get('before_id') else None
+        since = int(request.args['since']) if request.args.get('since') else None
+    except ValueError:
+        return jsonify({"error": "limit, before_id and since must be integers"}), 400
+    cur = None
     try:
         cur = conn.cursor()
-        cur.execute(
-            "SELECT notification_id, message, created_at, status FROM notifications WHERE user_id = :1 ORDER BY created_at DESC",
-            (session['user_id'],)
-        )
-        notifications = []
-        for row in cur.fetchall():
-            notifications.append({
-                "NOTIFICATION_ID": row[0],
-                "MESSAGE": row[1],
-                "CREATED_AT": row[2].strftime("%Y-%m-%d"), # Convert date to string
-                "STATUS": row[3]
-            })
-        return jsonify(notifications)
+        execute_sql(cur, SQL_NOTIFICATIONS_LATEST, (uid,))
+        latest_id = int(cur.fetchone()[0])
+        unread = get_unread_count(uid)
+        etag = f"{latest_id}.{unread}.{limit}.{before_id or ''}.{since or ''}"
+        if request.if_none_match.contains_weak(etag):
+            resp = Response(status=304)
+            resp.set_etag(etag, weak=True)
+            resp.headers['Cache-Control'] = 'private, no-cache'
+            return resp
+
+        binds = {"uid": uid, "lim": limit}
+        if since is not None:
+            binds["since"] = since
+        if before_id is not None:
+            binds["before_id"] = before_id
+        execute_sql(cur, SQL_NOTIFICATIONS_PAGE[(since is not None, before_id is not None)], binds)
+        notifications = fetch_records(cur, NotificationRecord)
+        full = len(notifications) == limit
+        next_since = None
+        if since is not None:
+            next_since = notifications[-1].notification_id if full else None
+            notifications.reverse()  # items are always newest-first
+        resp = jsonify({
+            "items": [n.to_json() for n in notifications],
+            "latest_id": latest_id,
+            "unread_count": unread,
+            # Older page exists only if we filled this one
+            "next_before_id": notifications[-1].notification_id if full and since is None else None,
+            "next_since": next_since,
+            "has_more": full,
+        })
+        resp.set_etag(etag, weak=True)
+        resp.headers['Cache-Control'] = 'private, no-cache'
+        return resp
     except Exception as e:
         return jsonify({"error": str(e)}), 500
     finally:
-        if 'cur' in locals() and cur: cur.close()
+        if cur: cur.close()
 
 @app.route('/mark_notifications_read', methods=['POST'])
 @login_required
@@ -1558,16 +5163,41 @@ def mark_notifications_read():
             (session['user_id'],)
         )
         conn.commit()
+        unread_count_cache.set(int(session['user_id']), 0)
         return jsonify({"success": True})
     except Exception as e:
         return jsonify({"error": str(e)}), 500
     finally:
         if 'cur' in locals() and cur: cur.close()
 
+# Warm the product catalog so the first add_warranty doesn't pay for the load, and build
+# the admin search index on first start after upgrading
+if db_pool is not None:
+    try:
+        with app.app_context():
+            product_catalog.reload()
+        app.logger.info("Product catalog warmed: %d products", len(product_catalog.by_id))
+    except Exception as e:
+        app.logger.warning("Product catalog warm-up note: %s", e)
+    try:
+        # Catches up after downtime across midnight, and backfills a newly added status column
+        with app.app_context():
+            expired, reactivated = rollover_warranty_status()
+        if expired or reactivated:
+            app.logger.info("Status rollover at startup: %d expired, %d reactivated", expired, reactivated)
+    except Exception as e:
+        app.logger.warning("Status rollover note: %s", e)
+    try:
+        with app.app_context():
+            _backfill_search_index_if_empty()
+    except Exception as e:
+        app.logger.warning("Search index check note: %s", e)
+
 if __name__ == '__main__':
     if not os.path.exists(app.config['UPLOAD_FOLDER']):
         os.makedirs(app.config['UPLOAD_FOLDER'])
-    # Start background scheduler for email reminders (runs even without user activity)
-    start_email_scheduler_if_enabled()
+    # Background jobs (reminders, status rollover); runs even without user activity
+    start_scheduler_if_enabled()
+    start_email_workers_if_enabled()
     app.run(debug=True)
 
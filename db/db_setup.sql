@@ -10,6 +10,62 @@ EXCEPTION
 END;
 /
 
+BEGIN
+    EXECUTE IMMEDIATE 'DROP TABLE job_runs';
+EXCEPTION
+    WHEN OTHERS THEN
+        IF SQLCODE != -942 THEN RAISE; END IF;
+END;
+/
+
+BEGIN
+    EXECUTE IMMEDIATE 'DROP TABLE scheduled_jobs';
+EXCEPTION
+    WHEN OTHERS THEN
+        IF SQLCODE != -942 THEN RAISE; END IF;
+END;
+/
+
+BEGIN
+    EXECUTE IMMEDIATE 'DROP TABLE search_tokens';
+EXCEPTION
+    WHEN OTHERS THEN
+        IF SQLCODE != -942 THEN RAISE; END IF;
+END;
+/
+
+BEGIN
+    EXECUTE IMMEDIATE 'DROP TABLE cache_generations';
+EXCEPTION
+    WHEN OTHERS THEN
+        IF SQLCODE != -942 THEN RAISE; END IF;
+END;
+/
+
+BEGIN
+    EXECUTE IMMEDIATE 'DROP TABLE admin_stats';
+EXCEPTION
+    WHEN OTHERS THEN
+        IF SQLCODE != -942 THEN RAISE; END IF;
+END;
+/
+
+BEGIN
+    EXECUTE IMMEDIATE 'DROP TABLE email_outbox';
+EXCEPTION
+    WHEN OTHERS THEN
+        IF SQLCODE != -942 THEN RAISE; END IF;
+END;
+/
+
+BEGIN
+    EXECUTE IMMEDIATE 'DROP TABLE notification_watermarks';
+EXCEPTION
+    WHEN OTHERS THEN
+        IF SQLCODE != -942 THEN RAISE; END IF;
+END;
+/
+
 BEGIN
     EXECUTE IMMEDIATE 'DROP TABLE service_claims';
 EXCEPTION
@@ -82,6 +138,9 @@ CREATE TABLE warranties (
     warranty_period_months NUMBER NOT NULL,
     expiry_date DATE NOT NULL,
     invoice_path VARCHAR2(255),
+    -- 'Active' through the expiry day; flipped nightly by the app's status rollover
+    status VARCHAR2(10) DEFAULT 'Active' NOT NULL
+        CONSTRAINT ck_warranties_status CHECK (status IN ('Active', 'Expired')),
     CONSTRAINT fk_user_warranties
         FOREIGN KEY (user_id)
         REFERENCES users(user_id)
@@ -103,6 +162,42 @@ CREATE TABLE notifications (
 );
 
 
+-- Bell panel: newest-first keyset pages and the latest id used for ETags
+CREATE INDEX ix_notifications_user_id
+  ON notifications (user_id, notification_id);
+
+-- Per-user watermark: the last day reminders were evaluated for this user.
+-- The notification generator only revisits warranties whose reminder/expiry threshold
+-- fell after this date.
+CREATE TABLE notification_watermarks (
+    user_id NUMBER PRIMARY KEY,
+    last_evaluated DATE NOT NULL,
+    CONSTRAINT fk_notif_watermark_user
+        FOREIGN KEY (user_id)
+        REFERENCES users(user_id)
+        ON DELETE CASCADE
+);
+
+-- Durable email outbox: request handlers enqueue here, background workers deliver.
+-- Pending -> Sending (leased until locked_until) -> Sent; failures back off and end in Dead.
+CREATE TABLE email_outbox (
+    outbox_id NUMBER GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+    to_email VARCHAR2(100) NOT NULL,
+    subject VARCHAR2(300) NOT NULL,
+    body_text CLOB,
+    body_html CLOB,
+    status VARCHAR2(20) DEFAULT 'Pending' NOT NULL CHECK (status IN ('Pending', 'Sending', 'Sent', 'Dead')),
+    attempts NUMBER DEFAULT 0 NOT NULL,
+    next_attempt_at DATE DEFAULT SYSDATE NOT NULL,
+    locked_until DATE,
+    last_error VARCHAR2(1000),
+    created_at DATE DEFAULT SYSDATE,
+    sent_at DATE
+);
+
+CREATE INDEX ix_email_outbox_due
+  ON email_outbox (status, next_attempt_at);
+
 -- =================================================================
 -- NEW TABLES (Added as requested)
 -- =================================================================
@@ -139,6 +234,18 @@ ALTER TABLE warranties
 CREATE UNIQUE INDEX ux_products_brand_model_norm
   ON products (LOWER(TRIM(brand)), LOWER(TRIM(model_name)));
 
+-- Per-user warranty listing: count, OFFSET pages and keyset seeks on (expiry_date, warranty_id)
+CREATE INDEX ix_warranties_user_expiry
+  ON warranties (user_id, expiry_date, warranty_id);
+
+-- Date-window scans across all users (cadence reminders, reports)
+CREATE INDEX ix_warranties_expiry
+  ON warranties (expiry_date);
+
+-- Status filters (admin list, expired report) as range scans, already in expiry order
+CREATE INDEX ix_warranties_status_expiry
+  ON warranties (status, expiry_date);
+
 -- 6. SERVICE_CLAIMS TABLE: Tracks service/claim requests for a specific warranty
 CREATE TABLE service_claims (
     claim_id NUMBER GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
@@ -155,16 +262,75 @@ CREATE TABLE service_claims (
         ON DELETE CASCADE -- If a warranty is deleted, its claims are also deleted
 );
 
+-- 7. ADMIN_STATS TABLE: Precomputed dashboard counters, adjusted by the app's write paths
+-- and periodically reconciled. The 'reconciled' row's updated_at marks the last full recount.
+CREATE TABLE admin_stats (
+    stat_key VARCHAR2(30) PRIMARY KEY,
+    stat_value NUMBER DEFAULT 0 NOT NULL,
+    updated_at DATE DEFAULT SYSDATE NOT NULL
+);
+
+-- Claims per warranty by status (reports summary, pending counts on warranty delete)
+CREATE INDEX ix_service_claims_warranty_status
+  ON service_claims (warranty_id, status);
+
+-- 8. CACHE_GENERATIONS TABLE: Bumped by writes that invalidate in-process caches
+-- (e.g. the product catalog); each app process reloads when it sees a new generation.
+CREATE TABLE cache_generations (
+    cache_name VARCHAR2(30) PRIMARY KEY,
+    generation NUMBER DEFAULT 0 NOT NULL,
+    updated_at DATE DEFAULT SYSDATE NOT NULL
+);
+
+-- 9. SEARCH_TOKENS TABLE: Inverted index for admin search. One row per (entity, token);
+-- entity_type 'W' = warranty (product name, brand), 'U' = user (full name, email local part).
+-- Maintained by the app on every write; rebuild with `flask search-reindex`.
+CREATE TABLE search_tokens (
+    entity_type CHAR(1) NOT NULL,
+    token VARCHAR2(40) NOT NULL,
+    entity_id NUMBER NOT NULL,
+    weight NUMBER(3) NOT NULL,
+    CONSTRAINT pk_search_tokens PRIMARY KEY (entity_type, token, entity_id)
+) ORGANIZATION INDEX;
+
+-- Replacing one entity's tokens on edit/delete
+CREATE INDEX ix_search_tokens_entity
+  ON search_tokens (entity_type, entity_id);
+
+-- 10. SCHEDULED_JOBS TABLE: One row per background job with its next due time. A process
+-- runs a job only while holding this row (FOR UPDATE SKIP LOCKED), so each slot runs once.
+CREATE TABLE scheduled_jobs (
+    job_name VARCHAR2(50) PRIMARY KEY,
+    schedule VARCHAR2(100) NOT NULL,
+    next_run_at DATE NOT NULL,
+    last_run_at DATE,
+    last_status VARCHAR2(10),
+    last_duration_ms NUMBER
+);
+
+-- 11. JOB_RUNS TABLE: Run history; missed_runs counts slots coalesced into a catch-up run
+CREATE TABLE job_runs (
+    run_id NUMBER GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+    job_name VARCHAR2(50) NOT NULL,
+    scheduled_for DATE NOT NULL,
+    started_at DATE NOT NULL,
+    duration_ms NUMBER NOT NULL,
+    status VARCHAR2(10) NOT NULL CHECK (status IN ('Succeeded', 'Failed', 'Skipped')),
+    missed_runs NUMBER DEFAULT 0 NOT NULL,
+    runner VARCHAR2(100),
+    detail VARCHAR2(1000)
+);
+
+CREATE INDEX ix_job_runs_job_started
+  ON job_runs (job_name, started_at);
+
 CREATE OR REPLACE VIEW v_warranty_status AS
 SELECT w.warranty_id AS warranty_id,
        w.product_name AS product_name,
        u.full_name AS user_name,
        w.purchase_date,
        w.warranty_period_months,
-       CASE 
-           WHEN ADD_MONTHS(w.purchase_date, w.warranty_period_months) >= SYSDATE THEN 'Active'
-           ELSE 'Expired'
-       END AS warranty_status
+       w.status AS warranty_status
 FROM warranties w
 JOIN users u ON w.user_id = u.user_id;
 
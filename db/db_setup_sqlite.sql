@@ -0,0 +1,184 @@
+-- SQLite mirror of db_setup.sql for DB_BACKEND=sqlite (local load tests and benchmarks).
+-- Applied automatically by the app when the database file has no tables yet.
+-- Types follow the Oracle script: DATE columns hold 'YYYY-MM-DD HH:MM:SS' local time,
+-- identities are INTEGER PRIMARY KEY AUTOINCREMENT. Keep in step with db_setup.sql and
+-- the app's _STARTUP_DDL.
+
+PRAGMA foreign_keys = ON;
+
+-- Oracle's one-row DUAL, so `SELECT ... FROM dual` runs unchanged
+CREATE TABLE dual (dummy CHAR(1));
+INSERT INTO dual VALUES ('X');
+
+-- 1. USERS TABLE: Stores regular customer login information
+CREATE TABLE users (
+    user_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    full_name VARCHAR2(100) NOT NULL,
+    email VARCHAR2(100) UNIQUE NOT NULL,
+    password VARCHAR2(200) NOT NULL
+);
+
+-- 5. PRODUCTS TABLE (created before warranties for the foreign key)
+CREATE TABLE products (
+    product_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    brand VARCHAR2(100) NOT NULL,
+    model_name VARCHAR2(150) NOT NULL,
+    category VARCHAR2(100),
+    image_url VARCHAR2(255),
+    verified CHAR(1) DEFAULT 'N' CHECK (verified IN ('Y','N')),
+    added_by INTEGER NULL REFERENCES users(user_id),
+    created_at DATE DEFAULT (datetime('now', 'localtime'))
+);
+
+CREATE UNIQUE INDEX ux_products_brand_model_norm
+  ON products (LOWER(TRIM(brand)), LOWER(TRIM(model_name)));
+
+-- 2. WARRANTIES TABLE: Stores product warranty details for each user
+CREATE TABLE warranties (
+    warranty_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL REFERENCES users(user_id) ON DELETE CASCADE,
+    product_name VARCHAR2(100) NOT NULL,
+    brand VARCHAR2(100),
+    product_id INTEGER REFERENCES products(product_id),
+    purchase_date DATE NOT NULL,
+    warranty_period_months INTEGER NOT NULL,
+    expiry_date DATE NOT NULL,
+    invoice_path VARCHAR2(255),
+    status VARCHAR2(10) DEFAULT 'Active' NOT NULL CHECK (status IN ('Active', 'Expired'))
+);
+
+CREATE UNIQUE INDEX ux_warranties_user_prod_brand
+  ON warranties (user_id, LOWER(product_name), LOWER(IFNULL(brand, '')));
+
+CREATE INDEX ix_warranties_user_expiry
+  ON warranties (user_id, expiry_date, warranty_id);
+
+CREATE INDEX ix_warranties_expiry
+  ON warranties (expiry_date);
+
+CREATE INDEX ix_warranties_status_expiry
+  ON warranties (status, expiry_date);
+
+-- 3. NOTIFICATIONS TABLE: Stores alerts for users
+CREATE TABLE notifications (
+    notification_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL REFERENCES users(user_id) ON DELETE CASCADE,
+    warranty_id INTEGER,
+    message VARCHAR2(300) NOT NULL,
+    status VARCHAR2(20) DEFAULT 'Unread' CHECK (status IN ('Unread', 'Read')),
+    created_at DATE DEFAULT (datetime('now', 'localtime'))
+);
+
+CREATE UNIQUE INDEX ux_notifications_user_warranty_message
+  ON notifications (user_id, warranty_id, message);
+
+CREATE INDEX ix_notifications_user_id
+  ON notifications (user_id, notification_id);
+
+CREATE TABLE notification_watermarks (
+    user_id INTEGER PRIMARY KEY REFERENCES users(user_id) ON DELETE CASCADE,
+    last_evaluated DATE NOT NULL
+);
+
+CREATE TABLE email_outbox (
+    outbox_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    to_email VARCHAR2(100) NOT NULL,
+    subject VARCHAR2(300) NOT NULL,
+    body_text CLOB,
+    body_html CLOB,
+    status VARCHAR2(20) DEFAULT 'Pending' NOT NULL CHECK (status IN ('Pending', 'Sending', 'Sent', 'Dead')),
+    attempts INTEGER DEFAULT 0 NOT NULL,
+    next_attempt_at DATE DEFAULT (datetime('now', 'localtime')) NOT NULL,
+    locked_until DATE,
+    last_error VARCHAR2(1000),
+    created_at DATE DEFAULT (datetime('now', 'localtime')),
+    sent_at DATE
+);
+
+CREATE INDEX ix_email_outbox_due
+  ON email_outbox (status, next_attempt_at);
+
+-- 4. ADMIN TABLE: Stores administrator login information
+CREATE TABLE admin (
+    admin_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    full_name VARCHAR2(100) NOT NULL,
+    email VARCHAR2(100) UNIQUE NOT NULL,
+    password VARCHAR2(255) NOT NULL,
+    created_at DATE DEFAULT (datetime('now', 'localtime'))
+);
+
+-- 6. SERVICE_CLAIMS TABLE: Tracks service/claim requests for a specific warranty
+CREATE TABLE service_claims (
+    claim_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    warranty_id INTEGER NOT NULL REFERENCES warranties(warranty_id) ON DELETE CASCADE,
+    claim_date DATE DEFAULT (datetime('now', 'localtime')) NOT NULL,
+    description VARCHAR2(1000) NOT NULL,
+    status VARCHAR2(50) DEFAULT 'Pending' NOT NULL CHECK (status IN ('Pending', 'In Progress', 'Completed', 'Denied')),
+    service_center VARCHAR2(200),
+    service_notes CLOB
+);
+
+CREATE INDEX ix_service_claims_warranty_status
+  ON service_claims (warranty_id, status);
+
+-- 7. ADMIN_STATS TABLE: Precomputed dashboard counters
+CREATE TABLE admin_stats (
+    stat_key VARCHAR2(30) PRIMARY KEY,
+    stat_value INTEGER DEFAULT 0 NOT NULL,
+    updated_at DATE DEFAULT (datetime('now', 'localtime')) NOT NULL
+);
+
+-- 8. CACHE_GENERATIONS TABLE: Cross-process invalidation counters for in-process caches
+CREATE TABLE cache_generations (
+    cache_name VARCHAR2(30) PRIMARY KEY,
+    generation INTEGER DEFAULT 0 NOT NULL,
+    updated_at DATE DEFAULT (datetime('now', 'localtime')) NOT NULL
+);
+
+-- 9. SEARCH_TOKENS TABLE: Inverted index for admin search (clustered on the key, like the IOT)
+CREATE TABLE search_tokens (
+    entity_type CHAR(1) NOT NULL,
+    token VARCHAR2(40) NOT NULL,
+    entity_id INTEGER NOT NULL,
+    weight INTEGER NOT NULL,
+    PRIMARY KEY (entity_type, token, entity_id)
+) WITHOUT ROWID;
+
+CREATE INDEX ix_search_tokens_entity
+  ON search_tokens (entity_type, entity_id);
+
+-- 10. SCHEDULED_JOBS TABLE
+CREATE TABLE scheduled_jobs (
+    job_name VARCHAR2(50) PRIMARY KEY,
+    schedule VARCHAR2(100) NOT NULL,
+    next_run_at DATE NOT NULL,
+    last_run_at DATE,
+    last_status VARCHAR2(10),
+    last_duration_ms INTEGER
+);
+
+-- 11. JOB_RUNS TABLE
+CREATE TABLE job_runs (
+    run_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    job_name VARCHAR2(50) NOT NULL,
+    scheduled_for DATE NOT NULL,
+    started_at DATE NOT NULL,
+    duration_ms INTEGER NOT NULL,
+    status VARCHAR2(10) NOT NULL CHECK (status IN ('Succeeded', 'Failed', 'Skipped')),
+    missed_runs INTEGER DEFAULT 0 NOT NULL,
+    runner VARCHAR2(100),
+    detail VARCHAR2(1000)
+);
+
+CREATE INDEX ix_job_runs_job_started
+  ON job_runs (job_name, started_at);
+
+CREATE VIEW v_warranty_status AS
+SELECT w.warranty_id AS warranty_id,
+       w.product_name AS product_name,
+       u.full_name AS user_name,
+       w.purchase_date,
+       w.warranty_period_months,
+       w.status AS warranty_status
+FROM warranties w
+JOIN users u ON w.user_id = u.user_id;
@@ -0,0 +1 @@
+"""Database backends other than cx_Oracle, selected with DB_BACKEND (see app.py)."""
@@ -0,0 +1,480 @@
+"""SQLite backend for DB_BACKEND=sqlite (local load tests and benchmarks).
+
+SqlitePool / SqliteConnection / SqliteCursor implement the slice of the cx_Oracle API the
+app uses (pool acquire/release, positional and named binds, rowfactory, arraysize, var()
+for RETURNING ... INTO, batcherrors and arraydmlrowcounts) and translate the Oracle dialect
+on the way in: SYSDATE/TRUNC date arithmetic, NVL, OFFSET/FETCH, DBMS_RANDOM. FOR UPDATE
+and LOCK TABLE become a BEGIN IMMEDIATE write transaction. Oracle constructs with no
+translation (MERGE, ROWNUM, CONNECT BY, DECODE, ...) raise UnsupportedSql instead of
+running with different semantics; such statements carry a hand-written SQLite variant
+(see backend_sql() in app.py).
+
+DATE columns hold 'YYYY-MM-DD HH:MM:SS' text (local time) and come back as datetime, and
+'' binds become NULL as they do in Oracle.
+"""
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from collections import namedtuple
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+from types import SimpleNamespace
+
+_DT_FMT = "%Y-%m-%d %H:%M:%S"
+
+def _bind(value):
+    cls = value.__class__
+    if cls is str:
+        return value or None
+    if cls is datetime:
+        return value.strftime(_DT_FMT)
+    if cls is date:
+        return value.strftime("%Y-%m-%d 00:00:00")
+    return value
+
+def _value(value):
+    if value.__class__ is str:
+        if not value:
+            return None
+        if len(value) == 19 and value[4] == "-" and value[10] == " " and value[13] == ":":
+            try:
+                return datetime.fromisoformat(value)
+            except ValueError:
+                pass
+    return value
+
+def _ora_sysdate():
+    return datetime.now().strftime(_DT_FMT)
+
+def _ora_trunc(value):
+    if value is None:
+        return None
+    if isinstance(value, str):
+        return value[:10] + " 00:00:00"
+    return int(value)
+
+def _ora_date_add(value, days):
+    if value is None or days is None:
+        return None
+    return (datetime.fromisoformat(value) + timedelta(days=days)).strftime(_DT_FMT)
+
+def _ora_date_diff(a, b):
+    if a is None or b is None:
+        return None
+    days = (datetime.fromisoformat(a) - datetime.fromisoformat(b)).total_seconds() / 86400
+    return int(days) if days.is_integer() else days
+
+def _ora_hash(value, max_bucket=4294967295):
+    if value is None:
+        return None
+    return zlib.crc32(str(value).encode("utf-8")) % (int(max_bucket) + 1)
+
+_TO_CHAR_TOKEN_RE = re.compile(r"fm|YYYY|HH24|Month|Mon|MM|DD|MI|SS|.", re.S)
+
+def _ora_to_char(value, fmt=None, nls=None):
+    """TO_CHAR for dates with the format elements the app uses; 'fm' toggles padding."""
+    if value is None:
+        return None
+    if fmt is None or not isinstance(value, str):
+        return str(value)
+    dt = datetime.fromisoformat(value)
+    out, pad = [], True
+    for tok in _TO_CHAR_TOKEN_RE.findall(fmt):
+        if tok == "fm":
+            pad = not pad
+        elif tok == "YYYY":
+            out.append(f"{dt.year:04d}")
+        elif tok == "Month":
+            out.append(dt.strftime("%B").ljust(9) if pad else dt.strftime("%B"))
+        elif tok == "Mon":
+            out.append(dt.strftime("%b"))
+        elif tok in ("MM", "DD", "HH24", "MI", "SS"):
+            n = {"MM": dt.month, "DD": dt.day, "HH24": dt.hour, "MI": dt.minute, "SS": dt.second}[tok]
+            out.append(f"{n:02d}" if pad else str(n))
+        else:
+            out.append(tok)
+    return "".join(out)
+
+class UnsupportedSql(sqlite3.NotSupportedError):
+    """An Oracle construct with no SQLite translation; give the statement a SQLite variant."""
+
+    def __init__(self, construct, statement):
+        super().__init__(f"no SQLite translation for {construct!r} in: {' '.join(str(statement).split())[:200]}")
+        self.construct = construct
+
+_Statement = namedtuple("_Statement", "sql positional_sql binds names returning write_lock")
+_MASK_RE = re.compile(r"'(?:[^']|'')*'|/\*.*?\*/|--[^\n]*", re.S)
+_UNMASK_RE = re.compile("\x00(\\d+)\x00")
+_BIND_RE = re.compile(r"(?<![:\w]):(\w+)")
+_DATE_TERM_RE = re.compile(r"\bSYSDATE\b|\bTRUNC\s*\(", re.I)
+_DATE_OP_RE = re.compile(r"\s*([+-])\s*")
+_DAYS_RE = re.compile(r"(:\w+|\d+(?:\.\d+)?)(?:\s*/\s*(:\w+|\d+(?:\.\d+)?))?")
+_LOCK_TABLE_RE = re.compile(r"^\s*LOCK\s+TABLE\b", re.I)
+_FOR_UPDATE_RE = re.compile(r"\s+FOR\s+UPDATE(?:\s+SKIP\s+LOCKED|\s+NOWAIT)?\s*$", re.I)
+_RETURNING_RE = re.compile(r"\s+RETURNING\s+(.+?)\s+INTO\s+(:\w+(?:\s*,\s*:\w+)*)\s*$", re.I | re.S)
+_DAYS_TAIL_RE = re.compile(r"\s*[*/]")
+# Oracle-only syntax the rewrites below don't cover; passing it through would either fail
+# deep inside SQLite or, worse, run with different semantics
+_UNSUPPORTED_RE = re.compile(
+    r"\bMERGE\s+INTO\b|\bROWNUM\b|\bCONNECT\s+BY\b|\bSTART\s+WITH\b|\bMINUS\b|\b(?:UN)?PIVOT\b"
+    r"|\(\s*\+\s*\)|\bAS\s+OF\s+(?:SCN|TIMESTAMP)\b|\bKEEP\s*\(|\bINTERVAL\b|\bSYSTIMESTAMP\b"
+    r"|\b(?:DECODE|NVL2|ADD_MONTHS|MONTHS_BETWEEN|LAST_DAY|NEXT_DAY|EXTRACT|TO_DATE|TO_TIMESTAMP|TO_NUMBER"
+    r"|NUMTODSINTERVAL|NUMTOYMINTERVAL|SYS_CONTEXT|SYS_GUID|LISTAGG|REGEXP_\w+)\s*\("
+    r"|\bV\$\w+|\b(?:DBMS|UTL)_\w+|\.\s*(?:NEXTVAL|CURRVAL)\b|^\s*(?:BEGIN|DECLARE)\b|\bEXECUTE\s+IMMEDIATE\b",
+    re.I)
+_REWRITES = (
+    (re.compile(r"\bOFFSET\s+(\S+)\s+ROWS\s+FETCH\s+(?:NEXT|FIRST)\s+(\S+)\s+ROWS\s+ONLY\b", re.I), r"LIMIT \2 OFFSET \1"),
+    (re.compile(r"\bFETCH\s+(?:NEXT|FIRST)\s+(\S+)\s+ROWS\s+ONLY\b", re.I), r"LIMIT \1"),
+    (re.compile(r"\bNVL\s*\(", re.I), "IFNULL("),
+    (re.compile(r"\bDBMS_RANDOM\.VALUE\b", re.I), "RANDOM()"),
+)
+
+def _date_term(sql, m):
+    """Translate the SYSDATE or TRUNC(...) term matched at m; returns (text, end)."""
+    if m.group(0).upper() == "SYSDATE":
+        return "ORA_SYSDATE()", m.end()
+    depth, i = 1, m.end()
+    while depth:
+        if i >= len(sql):
+            raise sqlite3.ProgrammingError("unbalanced parentheses in TRUNC(")
+        depth += {"(": 1, ")": -1}.get(sql[i], 0)
+        i += 1
+    return f"ORA_TRUNC({_date_math(sql[m.end():i - 1])})", i
+
+def _date_math(sql):
+    """Oracle date arithmetic on SYSDATE/TRUNC terms: `d + n`, `d - n` (n days, a bind or a
+    literal, optionally `/ 86400`) and `d1 - d2` (days between). Any other arithmetic on
+    these terms raises UnsupportedSql."""
+    out, i = [], 0
+    while True:
+        m = _DATE_TERM_RE.search(sql, i)
+        if m is None:
+            out.append(sql[i:])
+            return "".join(out)
+        before = sql[i:m.start()]
+        if before.rstrip().endswith(("+", "-")):
+            # `x - SYSDATE`, `n + TRUNC(...)`: the other operand's type is unknown here
+            raise UnsupportedSql(f"{before.rstrip()[-1]} {m.group(0)}", sql)
+        out.append(before)
+        term, i = _date_term(sql, m)
+        while True:
+            op = _DATE_OP_RE.match(sql, i)
+            if op is None:
+                break
+            rhs = _DATE_TERM_RE.match(sql, op.end())
+            if rhs is not None:
+                if op.group(1) != "-":
+                    raise UnsupportedSql(f"{m.group(0)} + {rhs.group(0)}", sql)
+                rhs_term, i = _date_term(sql, rhs)
+                term = f"ORA_DATE_DIFF({term}, {rhs_term})"
+                break
+            days = _DAYS_RE.match(sql, op.end())
+            if days is None or _DAYS_TAIL_RE.match(sql, days.end()):
+                # Only a bind or a literal (optionally `/ n`) is known to be a day count
+                raise UnsupportedSql(f"{m.group(0)} {op.group(1)} {sql[op.end():op.end() + 20].strip()}", sql)
+            n = f"CAST({days.group(1)} AS REAL) / {days.group(2)}" if days.group(2) else days.group(1)
+            term = f"ORA_DATE_ADD({term}, {'-' if op.group(1) == '-' else ''}({n}))"
+            i = days.end()
+        out.append(term)
+
+@lru_cache(maxsize=1024)
+def translate(statement):
+    """Oracle SQL -> _Statement for SQLite; raises UnsupportedSql for untranslatable syntax."""
+    literals = []
+
+    def _mask(m):
+        literals.append(m.group(0))
+        return f"\x00{len(literals) - 1}\x00"
+
+    def _unmask(text):
+        return _UNMASK_RE.sub(lambda m: literals[int(m.group(1))], text)
+
+    sql = _MASK_RE.sub(_mask, str(statement))
+    if _LOCK_TABLE_RE.match(sql):
+        # Table locks map onto SQLite's single writer: just open the write transaction
+        return _Statement(None, None, (), (), (), True)
+    returning = ()
+    m = _RETURNING_RE.search(sql)
+    if m:
+        returning = tuple(name.strip()[1:] for name in m.group(2).split(","))
+        sql = f"{sql[:m.start()]} RETURNING {m.group(1)}"
+    sql, locks = _FOR_UPDATE_RE.subn("", sql)
+    try:
+        sql = _date_math(sql)
+    except UnsupportedSql as e:
+        raise UnsupportedSql(_unmask(e.construct), statement) from None
+    for pattern, repl in _REWRITES:
+        sql = pattern.sub(repl, sql)
+    unsupported = _UNSUPPORTED_RE.search(sql)
+    if unsupported:
+        raise UnsupportedSql(unsupported.group(0).strip(), statement)
+    binds = tuple(_BIND_RE.findall(sql))
+    names = tuple(dict.fromkeys(binds))
+    return _Statement(_unmask(sql), _unmask(_BIND_RE.sub("?", sql)), binds, names, returning, bool(locks))
+
+class SqliteVar:
+    """Out variable for RETURNING ... INTO; getvalue() is the list of returned values."""
+
+    def __init__(self, type_=None):
+        self.type = type_
+        self.values = []
+
+    def getvalue(self, pos=0):
+        return self.values
+
+SqliteBatchError = namedtuple("SqliteBatchError", "offset code message")
+
+class SqliteCursor:
+    """cx_Oracle-style cursor over a sqlite3 cursor (see the module docstring)."""
+
+    def __init__(self, connection):
+        self.connection = connection
+        self._cur = connection._db.cursor()
+        self.arraysize = 100
+        self.prefetchrows = 2  # accepted for compatibility; SQLite steps rows on demand
+        self._reset()
+
+    def _reset(self):
+        self.rowfactory = None  # cx_Oracle clears it on every execute as well
+        self._is_query = False
+        self._rowcount = -1
+        self._fetched = 0
+        self._batch_errors = []
+        self._dml_counts = []
+
+    @property
+    def rowcount(self):
+        """Rows fetched so far for a query, rows affected for DML (as in cx_Oracle)."""
+        return self._fetched if self._is_query else self._rowcount
+
+    @property
+    def description(self):
+        return self._cur.description
+
+    def var(self, type_=None, *args, **kwargs):
+        return SqliteVar(type_)
+
+    def setinputsizes(self, *args, **kwargs):
+        pass  # LOB and size hints have no SQLite counterpart
+
+    def _binds(self, stmt, params):
+        """(sql, binds, out vars) for one row of parameters."""
+        if params is None:
+            return stmt.sql, (), ()
+        if isinstance(params, dict):
+            try:
+                binds = {name: _bind(params[name]) for name in stmt.names}
+                outs = [params[name] for name in stmt.returning]
+            except KeyError as e:
+                raise sqlite3.ProgrammingError(f"missing bind variable :{e.args[0]}") from None
+            return stmt.sql, binds, outs
+        n = len(params) - len(stmt.returning)
+        if n == len(stmt.names) < len(stmt.binds):
+            # One value per distinct name for a repeated placeholder (`... :1 ... :1`)
+            return stmt.sql, {name: _bind(v) for name, v in zip(stmt.names, params)}, params[n:]
+        # Otherwise values bind in order of appearance, like Oracle (the names don't matter)
+        n = len(stmt.binds)
+        return stmt.positional_sql, [_bind(v) for v in params[:n]], params[n:]
+
+    def execute(self, statement, parameters=None, **kwargs):
+        stmt = translate(statement)
+        self._reset()
+        if stmt.write_lock:
+            self.connection._begin_write()
+        if stmt.sql is None:
+            return None
+        sql, binds, outs = self._binds(stmt, parameters if parameters is not None or not kwargs else kwargs)
+        self._cur.execute(sql, binds)
+        if stmt.returning:
+            rows = self._cur.fetchall()
+            for i, var in enumerate(outs):
+                var.values = [_value(r[i]) for r in rows]
+            self._rowcount = len(rows)
+            return None
+        if self._cur.description is not None:
+            self._is_query = True
+            return self
+        self._rowcount = self._cur.rowcount
+        return None
+
+    def executemany(self, statement, parameters, batcherrors=False, arraydmlrowcounts=False):
+        stmt = translate(statement)
+        self._reset()
+        if stmt.write_lock:
+            self.connection._begin_write()
+        if not (batcherrors or arraydmlrowcounts):
+            rows = [self._binds(stmt, p) for p in parameters]
+            if rows:
+                self._cur.executemany(rows[0][0], [binds for _, binds, _ in rows])
+            self._rowcount = max(self._cur.rowcount, 0) if rows else 0
+            return
+        # Row by row so one failing row is skipped (statement-level rollback) and each row's
+        # count is known; this is what Oracle's batch errors / array DML row counts report
+        total = 0
+        for offset, params in enumerate(parameters):
+            sql, binds, _ = self._binds(stmt, params)
+            try:
+                self._cur.execute(sql, binds)
+                count = max(self._cur.rowcount, 0)
+            except sqlite3.DatabaseError as e:
+                if not batcherrors:
+                    raise
+                code = 1 if isinstance(e, sqlite3.IntegrityError) and "UNIQUE" in str(e) else getattr(e, "sqlite_errorcode", 0)
+                self._batch_errors.append(SqliteBatchError(offset, code, str(e)))
+                count = 0
+            self._dml_counts.append(count)
+            total += count
+        self._rowcount = total
+
+    def getbatcherrors(self):
+        return list(self._batch_errors)
+
+    def getarraydmlrowcounts(self):
+        return list(self._dml_counts)
+
+    def _row(self, row):
+        row = tuple([_value(v) for v in row])
+        return row if self.rowfactory is None else self.rowfactory(*row)
+
+    def fetchone(self):
+        row = self._cur.fetchone()
+        if row is None:
+            return None
+        self._fetched += 1
+        return self._row(row)
+
+    def fetchmany(self, size=None):
+        rows = self._cur.fetchmany(self.arraysize if size is None else size)
+        self._fetched += len(rows)
+        return [self._row(r) for r in rows]
+
+    def fetchall(self):
+        rows = self._cur.fetchall()
+        self._fetched += len(rows)
+        return [self._row(r) for r in rows]
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        row = self.fetchone()
+        if row is None:
+            raise StopIteration
+        return row
+
+    def close(self):
+        self._cur.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class SqliteConnection:
+    def __init__(self, path, busy_timeout_ms=5000, stmtcachesize=64):
+        # isolation_level IMMEDIATE: the implicit BEGIN before the first write takes the write
+        # lock up front, so a read-then-write transaction never fails to upgrade under load
+        self._db = sqlite3.connect(path, timeout=busy_timeout_ms / 1000.0, isolation_level="IMMEDIATE",
+                                   check_same_thread=False, cached_statements=stmtcachesize)
+        for pragma in ("journal_mode = WAL", "synchronous = NORMAL", "foreign_keys = ON", "case_sensitive_like = ON"):
+            self._db.execute(f"PRAGMA {pragma}")
+        for name, nargs, fn, deterministic in (
+            ("ORA_SYSDATE", 0, _ora_sysdate, False),
+            ("ORA_TRUNC", 1, _ora_trunc, True),
+            ("ORA_DATE_ADD", 2, _ora_date_add, True),
+            ("ORA_DATE_DIFF", 2, _ora_date_diff, True),
+            ("ORA_HASH", 1, _ora_hash, True),
+            ("ORA_HASH", 2, _ora_hash, True),
+            ("TO_CHAR", -1, _ora_to_char, True),
+        ):
+            self._db.create_function(name, nargs, fn, deterministic=deterministic)
+        self.version = sqlite3.sqlite_version
+
+    def cursor(self):
+        return SqliteCursor(self)
+
+    def commit(self):
+        self._db.commit()
+
+    def rollback(self):
+        self._db.rollback()
+
+    def close(self):
+        self._db.close()
+
+    def ping(self):
+        self._db.execute("SELECT 1").close()
+
+    def executescript(self, script):
+        self._db.executescript(script)
+
+    def _begin_write(self):
+        if not self._db.in_transaction:
+            self._db.execute("BEGIN IMMEDIATE")
+
+class SqlitePool:
+    """Bounded connection pool exposing the SessionPool attributes the app reads."""
+
+    def __init__(self, path, min=1, max=16, increment=1, busy_timeout=5000, stmtcachesize=64):
+        self.path = path
+        self.min = min
+        self.max = max
+        self.increment = increment
+        self.busy_timeout = busy_timeout
+        self.stmtcachesize = stmtcachesize
+        self.wait_timeout = 5000  # ms, as SessionPool.wait_timeout
+        self.busy = 0
+        self.opened = 0
+        self._idle = []
+        self._cond = threading.Condition()
+        for _ in range(min):
+            self._idle.append(self._connect())
+            self.opened += 1
+
+    def _connect(self):
+        return SqliteConnection(self.path, self.busy_timeout, self.stmtcachesize)
+
+    def acquire(self):
+        deadline = time.monotonic() + self.wait_timeout / 1000.0
+        with self._cond:
+            while not self._idle and self.opened >= self.max:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise sqlite3.OperationalError(f"no free connection in the pool after {self.wait_timeout} ms")
+                self._cond.wait(remaining)
+            self.busy += 1
+            if self._idle:
+                return self._idle.pop()
+            self.opened += 1
+        try:
+            return self._connect()
+        except Exception:
+            self._forget()
+            raise
+
+    def _forget(self):
+        with self._cond:
+            self.busy -= 1
+            self.opened -= 1
+            self._cond.notify()
+
+    def release(self, c):
+        c.rollback()  # like SessionPool.release: uncommitted work is discarded
+        with self._cond:
+            self.busy -= 1
+            self._idle.append(c)
+            self._cond.notify()
+
+    def drop(self, c):
+        try:
+            c.close()
+        finally:
+            self._forget()
+
+dbapi = SimpleNamespace(
+    Error=sqlite3.Error, DatabaseError=sqlite3.DatabaseError, IntegrityError=sqlite3.IntegrityError,
+    Cursor=SqliteCursor, NUMBER=int, STRING=str, DATETIME=datetime, CLOB=str,
+)
@@ -115,47 +115,93 @@ document.addEventListener('DOMContentLoaded', () => {
         }
     });
 
+    // Local copy of the panel: only deltas (since=latestId) are fetched after the first load,
+    // and an unchanged panel revalidates with If-None-Match -> 304.
+    const notifState = { items: [], latestId: 0, etag: null, nextBeforeId: null, loaded: false };
+
+    function mergeNotifications(newItems, append) {
+        const seen = new Set(notifState.items.map(n => n.NOTIFICATION_ID));
+        const fresh = newItems.filter(n => !seen.has(n.NOTIFICATION_ID));
+        notifState.items = append ? notifState.items.concat(fresh) : fresh.concat(notifState.items);
+    }
+
+    function renderNotifications() {
+        const notifications = notifState.items;
+        let panelContent = '<div class="notification-panel-header">Notifications</div>';
+        if (notifications.length === 0) {
+            panelContent += '<div class="notification-empty">You have no new notifications.</div>';
+        } else {
+            panelContent += '<ul class="notification-list">';
+            notifications.forEach(notif => {
+                const itemClass = notif.STATUS.toLowerCase() === 'unread' ? 'notification-item unread' : 'notification-item';
+                const date = new Date(notif.CREATED_AT).toLocaleDateString("en-US", { month: 'long', day: 'numeric' });
+                const msg = notif.MESSAGE || '';
+                let tagClass = 'notif-generic';
+                let tagLabel = 'Notice';
+                const lower = msg.toLowerCase();
+                if (lower.includes('has expired')) {
+                    tagClass = 'notif-expired';
+                    tagLabel = 'Expired';
+                } else if (lower.includes('expires on') || lower.includes('expiring')) {
+                    tagClass = 'notif-expiring';
+                    tagLabel = 'Expiring';
+                }
+                panelContent += `<li class="${itemClass}">
+                    <div class="notif-title">${msg}</div>
+                    <div>
+                        <span class="notif-tag ${tagClass}">${tagLabel}</span>
+                        <small class="notif-date">${date}</small>
+                    </div>
+                </li>`;
+            });
+            if (notifState.nextBeforeId) {
+                panelContent += '<li class="notification-item"><a href="#" class="link" id="notification-load-older">Load older</a></li>';
+            }
+            panelContent += '</ul>';
+        }
+
+        notificationPanel.innerHTML = panelContent;
+
+        const loadOlder = document.getElementById('notification-load-older');
+        if (loadOlder) {
+            loadOlder.addEventListener('click', (e) => {
+                e.preventDefault();
+                e.stopPropagation();
+                fetchOlderNotifications();
+            });
+        }
+    }
+
     async function fetchNotifications() {
         try {
-            const response = await fetch('/get_notifications');
-            if (!response.ok) throw new Error('Failed to fetch notifications');
-
-            const notifications = await response.json();
-
-            let panelContent = '<div class="notification-panel-header">Notifications</div>';
-            if (notifications.length === 0) {
-                panelContent += '<div class="notification-empty">You have no new notifications.</div>';
-            } else {
-                panelContent += '<ul class="notification-list">';
-                notifications.forEach(notif => {
-                    const itemClass = notif.STATUS.toLowerCase() === 'unread' ? 'notification-item unread' : 'notification-item';
-                    const date = new Date(notif.CREATED_AT).toLocaleDateString("en-US", { month: 'long', day: 'numeric' });
-                    const msg = notif.MESSAGE || '';
-                    let tagClass = 'notif-generic';
-                    let tagLabel = 'Notice';
-                    const lower = msg.toLowerCase();
-                    if (lower.includes('has expired')) {
-                        tagClass = 'notif-expired';
-                        tagLabel = 'Expired';
-                    } else if (lower.includes('expires on') || lower.includes('expiring')) {
-                        tagClass = 'notif-expiring';
-                        tagLabel = 'Expiring';
-                    }
-                    panelContent += `<li class="${itemClass}">
-                        <div class="notif-title">${msg}</div>
-                        <div>
-                            <span class="notif-tag ${tagClass}">${tagLabel}</span>
-                            <small class="notif-date">${date}</small>
-                        </div>
-                    </li>`;
-                });
-                panelContent += '</ul>';
+            // A since= page holds the oldest new items; follow next_since until caught up
+            let since = notifState.loaded ? notifState.latestId : null;
+            let headers = notifState.etag ? { 'If-None-Match': notifState.etag } : {};
+            while (true) {
+                const url = since === null ? '/get_notifications' : `/get_notifications?since=${since}&limit=100`;
+                const response = await fetch(url, { headers });
+                if (response.status === 304) break;
+                if (!response.ok) throw new Error('Failed to fetch notifications');
+                const data = await response.json();
+                mergeNotifications(data.items, false);
+                if (!notifState.loaded) {
+                    notifState.nextBeforeId = data.next_before_id;
+                    notifState.loaded = true;
+                }
+                if (since !== null && data.next_since) {
+                    since = data.next_since;
+                    headers = {};
+                    continue;
+                }
+                notifState.latestId = data.latest_id;
+                notifState.etag = response.headers.get('ETag');
+                break;
             }
 
-            notificationPanel.innerHTML = panelContent;
+            renderNotifications();
 
             // If there was a badge, mark notifications as read on the backend
-            if (notificationBadge) {
+            if (notificationBadge && notificationBadge.style.display !== 'none') {
                 markAsRead();
             }
         } catch (error) {
@@ -164,9 +210,26 @@ document.addEventListener('DOMContentLoaded', () => {
         }
     }
 
+    async function fetchOlderNotifications() {
+        if (!notifState.nextBeforeId) return;
+        try {
+            const response = await fetch(`/get_notifications?before_id=${notifState.nextBeforeId}`);
+            if (!response.ok) throw new Error('Failed to fetch notifications');
+            const data = await response.json();
+            mergeNotifications(data.items, true);
+            notifState.nextBeforeId = data.next_before_id;
+            renderNotifications();
+        } catch (error) {
+            console.error(error);
+        }
+    }
+
     async function markAsRead() {
         try {
             await fetch('/mark_notifications_read', { method: 'POST' });
+            // Reflect the new status locally; the unread count changed, so the old ETag is stale anyway
+            notifState.items.forEach(n => { n.STATUS = 'Read'; });
+            notifState.etag = null;
             // Hide the badge visually after marking as read
             if(notificationBadge) {
                 notificationBadge.style.display = 'none';
@@ -188,6 +251,47 @@ document.addEventListener('DOMContentLoaded', () => {
         }, 1000); // 1 second visible
     }
 
+    // --- Add warranty: product typeahead from /api/products/suggest ---
+    const productInput = document.getElementById('product_name');
+    const brandInput = document.getElementById('brand');
+    const suggestionList = document.getElementById('product-suggestions');
+    if (productInput && suggestionList) {
+        let suggestTimer = null;
+        let suggestSeq = 0;
+        let suggestedBrands = {};
+
+        productInput.addEventListener('input', () => {
+            // Picking a suggestion fills in its brand when none was typed
+            const picked = suggestedBrands[productInput.value];
+            if (picked && brandInput && !brandInput.value) {
+                brandInput.value = picked;
+            }
+            clearTimeout(suggestTimer);
+            suggestTimer = setTimeout(async () => {
+                const q = [brandInput ? brandInput.value : '', productInput.value].join(' ').trim();
+                if (!q) return;
+                const seq = ++suggestSeq;
+                try {
+                    const response = await fetch(`/api/products/suggest?q=${encodeURIComponent(q)}&limit=8`);
+                    if (!response.ok) return;
+                    const data = await response.json();
+                    if (seq !== suggestSeq) return; // a newer keystroke already asked
+                    suggestedBrands = {};
+                    suggestionList.innerHTML = '';
+                    data.items.forEach(item => {
+                        const option = document.createElement('option');
+                        option.value = item.model_name;
+                        option.label = item.brand;
+                        suggestedBrands[item.model_name] = item.brand;
+                        suggestionList.appendChild(option);
+                    });
+                } catch (error) {
+                    console.error('Failed to fetch product suggestions:', error);
+                }
+            }, 120);
+        });
+    }
+
     // --- Profile: toggle change password form ---
     const cpToggle = document.getElementById('change-password-toggle');
     const cpForm = document.getElementById('change-password-form');
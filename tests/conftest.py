@@ -0,0 +1,34 @@
+import itertools
+import os
+import sys
+import tempfile
+
+import pytest
+
+# Tests import app.py and db_backends from the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# app.py connects at import time: give it a throwaway SQLite file and no background threads
+_tmp = tempfile.mkdtemp(prefix="warracker-tests-")
+os.environ["DB_BACKEND"] = "sqlite"
+os.environ["SQLITE_PATH"] = os.path.join(_tmp, "test.sqlite3")
+os.environ["SCHEDULER_ENABLED"] = "false"
+os.environ["EMAIL_OUTBOX"] = "true"
+os.environ["METRICS_ENABLED"] = "false"
+
+_emails = itertools.count(1)
+
+
+@pytest.fixture
+def user_client():
+    """(test client logged in as a fresh user, user_id)."""
+    import app as warracker
+
+    warracker.app.config["TESTING"] = True
+    client = warracker.app.test_client()
+    email = f"user{next(_emails)}@tests.invalid"
+    client.post("/register", data={"full_name": "Test User", "email": email, "password": "pw12345"})
+    client.post("/login", data={"email": email, "password": "pw12345"})
+    with client.session_transaction() as s:
+        user_id = s["user_id"]
+    return client, user_id
@@ -0,0 +1,99 @@
+from datetime import date, timedelta
+
+from dateutil.relativedelta import relativedelta
+
+import app as warracker
+
+
+def _import(client, rows):
+    resp = client.post("/import-warranties", json=rows)
+    assert resp.status_code == 200
+    return resp.get_json()
+
+
+def _statuses(report):
+    return [(r["row"], r["status"]) for r in report["results"]]
+
+
+def _admin_stats_drift():
+    with warracker.app.app_context():
+        cur = warracker.conn.cursor()
+        cur.execute(warracker._ADMIN_STATS_DRIFT_SQL)
+        return {k: d for k, d, _missing in cur.fetchall() if k != "reconciled"}
+
+
+def test_report_has_one_result_per_row(user_client):
+    client, _uid = user_client
+    _import(client, [{"product_name": "Kettle", "brand": "Acme", "purchase_date": "2025-01-01", "warranty_period_months": 12}])
+    report = _import(client, [
+        {"product_name": "Toaster", "brand": "Acme", "purchase_date": "2025-01-01", "warranty_period_months": 12},
+        {"product_name": "TOASTER", "brand": "acme", "purchase_date": "2025-02-01", "warranty_period_months": 6},
+        {"product_name": "kettle", "brand": "ACME", "purchase_date": "2025-01-01", "warranty_period_months": 12},
+        {"product_name": "Lamp", "purchase_date": "not a date", "warranty_period_months": 12},
+        {"product_name": "", "purchase_date": "2025-01-01", "warranty_period_months": 12},
+        {"product_name": "Radio", "purchase_date": "2025-01-01", "period_value": 2, "period_unit": "years"},
+    ])
+    assert _statuses(report) == [(1, "inserted"), (2, "duplicate"), (3, "duplicate"), (4, "error"), (5, "error"), (6, "inserted")]
+    assert (report["rows"], report["inserted"], report["duplicate"], report["error"]) == (6, 2, 2, 2)
+    assert report["results"][4]["message"] == "product_name is required"
+
+
+def test_rows_rejected_by_the_database_are_reported_per_row(user_client, monkeypatch):
+    client, uid = user_client
+    real_resolve = warracker._resolve_products
+
+    def racing_resolve(cur, display):
+        # Another session inserts the same warranty after the duplicate pre-check ran
+        cur.execute(
+            "INSERT INTO warranties (user_id, product_name, brand, purchase_date, warranty_period_months, expiry_date) "
+            "VALUES (:1, 'Blender', 'Acme', :2, 12, :3)",
+            (uid, date(2025, 1, 1), date(2026, 1, 1)))
+        return real_resolve(cur, display)
+
+    monkeypatch.setattr(warracker, "_resolve_products", racing_resolve)
+    report = _import(client, [
+        {"product_name": "Mixer", "brand": "Acme", "purchase_date": "2025-01-01", "warranty_period_months": 12},
+        {"product_name": "blender", "brand": "acme", "purchase_date": "2025-01-01", "warranty_period_months": 12},
+        {"product_name": "Grill", "brand": "Acme", "purchase_date": "2025-01-01", "warranty_period_months": 12},
+    ])
+    assert _statuses(report) == [(1, "inserted"), (2, "duplicate"), (3, "inserted")]
+    assert report["results"][1]["message"] == "Already exists."
+
+
+def test_non_duplicate_batch_errors_keep_the_rest_of_the_batch(user_client, monkeypatch):
+    client, _uid = user_client
+    # A product id that doesn't exist makes the insert fail its foreign key
+    monkeypatch.setattr(warracker, "_resolve_products", lambda cur, display: {pair: 987654321 for pair in display})
+    report = _import(client, [
+        {"product_name": "Drill", "brand": "Acme", "purchase_date": "2025-01-01", "warranty_period_months": 12},
+        {"product_name": "Saw", "purchase_date": "2025-01-01", "warranty_period_months": 12},
+    ])
+    assert _statuses(report) == [(1, "error"), (2, "inserted")]
+    assert "FOREIGN KEY" in report["results"][0]["message"]
+
+
+def test_import_keeps_admin_stats_and_search_index_in_step(user_client):
+    client, uid = user_client
+    with warracker.app.app_context():
+        warracker.reconcile_admin_stats()
+    today = date.today()
+    report = _import(client, [
+        # Expires in 5 days: counts as expiring soon and is inside the reminder window
+        {"product_name": "Heater", "brand": "Warmco", "purchase_date": (today + timedelta(days=5) - relativedelta(months=12)).isoformat(),
+         "warranty_period_months": 12},
+        {"product_name": "Fan", "brand": "Coolco", "purchase_date": today.isoformat(), "warranty_period_months": 24},
+    ])
+    assert report["inserted"] == 2
+    with warracker.app.app_context():
+        cur = warracker.conn.cursor()
+        cur.execute("SELECT stat_value FROM admin_stats WHERE stat_key = 'expiring_soon'")
+        assert cur.fetchone()[0] >= 1
+    assert _admin_stats_drift() == {"users": 0, "warranties": 0, "expiring_soon": 0, "pending_claims": 0}
+    with warracker.app.app_context():
+        cur = warracker.conn.cursor()
+        cur.execute(
+            "SELECT COUNT(DISTINCT t.entity_id) FROM search_tokens t JOIN warranties w ON w.warranty_id = t.entity_id "
+            "WHERE t.entity_type = 'W' AND w.user_id = :1", (uid,))
+        assert cur.fetchone()[0] == 2
+        cur.execute("SELECT COUNT(*) FROM notifications WHERE user_id = :1", (uid,))
+        assert cur.fetchone()[0] == 1
@@ -0,0 +1,125 @@
+import hashlib
+import io
+import os
+from datetime import date
+
+import pytest
+from werkzeug.datastructures import FileStorage
+
+import app as warracker
+
+PDF = b"%PDF-1.4\n" + bytes(range(256)) * 4
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    store = warracker.InvoiceStore(str(tmp_path))
+    monkeypatch.setattr(warracker, "invoice_store", store)
+    monkeypatch.setattr(warracker, "schedule_derivatives", lambda ref: False)
+    return store
+
+
+@pytest.fixture
+def invoice(user_client, store):
+    """(client, ref) for a warranty with an uploaded PDF invoice."""
+    client, uid = user_client
+    client.post("/add-warranty", content_type="multipart/form-data", data={
+        "product_name": "Laptop", "brand": "Dell", "purchase_date": "2025-01-01",
+        "period_value": "1", "period_unit": "years", "invoice_file": (io.BytesIO(PDF), "invoice.pdf"),
+    })
+    with warracker.app.app_context():
+        cur = warracker.conn.cursor()
+        cur.execute("SELECT invoice_path FROM warranties WHERE user_id = :1", (uid,))
+        (ref,) = cur.fetchone()
+    return client, ref
+
+
+def test_blob_is_served_with_a_strong_etag_and_immutable_caching(invoice):
+    client, ref = invoice
+    resp = client.get(f"/uploads/{ref}")
+    assert resp.status_code == 200
+    assert resp.data == PDF
+    assert resp.headers["ETag"] == f'"{hashlib.sha256(PDF).hexdigest()}"'
+    assert resp.headers["Accept-Ranges"] == "bytes"
+    assert resp.cache_control.private and resp.cache_control.immutable
+    assert resp.cache_control.max_age == warracker.INVOICE_IMMUTABLE_MAX_AGE
+
+
+def test_if_none_match_revalidates_with_304(invoice):
+    client, ref = invoice
+    etag = client.get(f"/uploads/{ref}").headers["ETag"]
+    resp = client.get(f"/uploads/{ref}", headers={"If-None-Match": etag})
+    assert resp.status_code == 304
+    assert resp.data == b""
+    assert client.get(f"/uploads/{ref}", headers={"If-None-Match": '"stale"'}).status_code == 200
+
+
+def test_range_returns_partial_content(invoice):
+    client, ref = invoice
+    resp = client.get(f"/uploads/{ref}", headers={"Range": "bytes=10-19"})
+    assert resp.status_code == 206
+    assert resp.headers["Content-Range"] == f"bytes 10-19/{len(PDF)}"
+    assert resp.data == PDF[10:20]
+
+
+def test_if_range_only_resumes_an_unchanged_file(invoice):
+    client, ref = invoice
+    etag = client.get(f"/uploads/{ref}").headers["ETag"]
+    resp = client.get(f"/uploads/{ref}", headers={"Range": "bytes=100-", "If-Range": etag})
+    assert resp.status_code == 206
+    assert resp.data == PDF[100:]
+    resp = client.get(f"/uploads/{ref}", headers={"Range": "bytes=100-", "If-Range": '"stale"'})
+    assert resp.status_code == 200
+    assert resp.data == PDF
+
+
+def test_other_users_get_404(invoice, store):
+    _client, ref = invoice
+    other = warracker.app.test_client()
+    other.post("/register", data={"full_name": "Other", "email": "other-invoice@tests.invalid", "password": "pw12345"})
+    other.post("/login", data={"email": "other-invoice@tests.invalid", "password": "pw12345"})
+    assert other.get(f"/uploads/{ref}").status_code == 404
+
+
+def test_legacy_file_gets_a_content_etag_and_short_max_age(user_client, store):
+    client, uid = user_client
+    with open(os.path.join(store.root, "legacy.pdf"), "wb") as f:
+        f.write(PDF)
+    with warracker.app.app_context():
+        cur = warracker.conn.cursor()
+        cur.execute(
+            "INSERT INTO warranties (user_id, product_name, brand, purchase_date, warranty_period_months, expiry_date, invoice_path) "
+            "VALUES (:1, 'Old', 'Acme', :2, 12, :3, 'legacy.pdf')", (uid, date(2020, 1, 1), date(2021, 1, 1)))
+        warracker.conn.commit()
+    warracker.invalidate_user_invoices(uid)
+    resp = client.get("/uploads/legacy.pdf")
+    assert resp.status_code == 200
+    assert resp.headers["ETag"] == f'"{hashlib.sha256(PDF).hexdigest()}"'
+    assert resp.cache_control.max_age == warracker.INVOICE_LEGACY_MAX_AGE
+    assert not resp.cache_control.immutable
+    assert client.get("/uploads/legacy.pdf", headers={"If-None-Match": resp.headers["ETag"]}).status_code == 304
+
+
+def test_x_accel_leaves_the_body_to_the_proxy(invoice, monkeypatch):
+    client, ref = invoice
+    monkeypatch.setattr(warracker, "INVOICE_SENDFILE", "x-accel")
+    resp = client.get(f"/uploads/{ref}")
+    assert resp.status_code == 200
+    assert resp.data == b""
+    assert resp.headers["X-Accel-Redirect"] == f"/_protected_uploads/blobs/{ref[:2]}/{ref[2:4]}/{ref}"
+    assert client.get(f"/uploads/{ref}", headers={"If-None-Match": resp.headers["ETag"]}).status_code == 304
+
+
+def test_invoice_uploaded_through_another_worker_is_served(user_client, store):
+    client, uid = user_client
+    # This process cached the user's (empty) invoice set before another worker took the upload
+    assert client.get("/uploads/nothing.pdf").status_code == 404
+    ref = store.put_upload(FileStorage(io.BytesIO(PDF), "invoice.pdf"))
+    with warracker.app.app_context():
+        cur = warracker.conn.cursor()
+        cur.execute(
+            "INSERT INTO warranties (user_id, product_name, brand, purchase_date, warranty_period_months, expiry_date, invoice_path) "
+            "VALUES (:1, 'Scanner', 'Acme', :2, 12, :3, :4)", (uid, date(2025, 1, 1), date(2026, 1, 1), ref))
+        warracker.conn.commit()
+    assert warracker.invoice_owner_cache.get(uid) == frozenset()
+    assert client.get(f"/uploads/{ref}").status_code == 200
@@ -0,0 +1,43 @@
+import pytest
+
+import app as warracker
+
+
+@pytest.fixture
+def catalogs(monkeypatch):
+    """(this worker's catalog, another worker's catalog), both loaded and checking on every read."""
+    with warracker.app.app_context():
+        mine, other = warracker.ProductCatalog(check_seconds=0), warracker.ProductCatalog(check_seconds=0)
+        mine.reload()
+        other.reload()
+    monkeypatch.setattr(warracker, "product_catalog", mine)
+    return mine, other
+
+
+def _search(catalog, q):
+    with warracker.app.app_context():
+        return [(p.brand, p.model_name) for p in catalog.search(q)]
+
+
+def test_product_added_with_a_warranty_reaches_other_catalogs(user_client, catalogs):
+    client, _uid = user_client
+    mine, other = catalogs
+    generation = mine.generation
+    client.post("/add-warranty", data={
+        "product_name": "Zephyr 9", "brand": "Quillon", "purchase_date": "2025-01-01",
+        "period_value": "1", "period_unit": "years",
+    })
+    assert _search(other, "quillon") == [("Quillon", "Zephyr 9")]
+    # The creating worker adopted its own bump instead of reloading
+    assert mine.generation == generation + 1
+    assert _search(mine, "quillon") == [("Quillon", "Zephyr 9")]
+
+
+def test_product_created_by_import_reaches_other_catalogs(user_client, catalogs):
+    client, _uid = user_client
+    _mine, other = catalogs
+    resp = client.post("/import-warranties", json=[
+        {"product_name": "Marlin", "brand": "Oxbeck", "purchase_date": "2025-01-01", "warranty_period_months": 12},
+    ])
+    assert resp.get_json()["inserted"] == 1
+    assert _search(other, "oxbeck") == [("Oxbeck", "Marlin")]
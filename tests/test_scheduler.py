@@ -0,0 +1,97 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+import app as warracker
+from app import FakeClock, Job, MemoryJobStore, Scheduler
+
+START = datetime(2025, 1, 6, 6, 0)  # a Monday
+
+
+def _scheduler(func, catch_up=True, store=None, clock=None, runner="test"):
+    clock = clock or FakeClock(START)
+    store = store or MemoryJobStore()
+    return Scheduler([Job("daily", "0 7 * * *", func, catch_up)], store, clock, runner=runner), store, clock
+
+
+def test_first_start_runs_a_new_job_once_then_waits_for_the_next_slot():
+    calls = []
+    sch, store, clock = _scheduler(calls.append)
+    assert [r["status"] for r in sch.run_pending()] == ["Succeeded"]
+    assert sch.run_pending() == []
+    assert store.jobs()[0]["next_run_at"] == datetime(2025, 1, 6, 7, 0)
+    assert calls == [START]
+
+
+def test_missed_slots_are_coalesced_into_one_catch_up_run():
+    calls = []
+    sch, store, clock = _scheduler(calls.append)
+    sch.run_pending()
+    clock.advance(days=3, hours=2)  # down over the 06, 07, 08 and 09 Jan 07:00 slots
+    (run,) = sch.run_pending()
+    assert run["status"] == "Succeeded"
+    assert run["scheduled_for"] == datetime(2025, 1, 6, 7, 0)
+    assert run["missed_runs"] == 3
+    assert calls == [START, datetime(2025, 1, 6, 7, 0)]
+    assert store.jobs()[0]["next_run_at"] == datetime(2025, 1, 10, 7, 0)
+    assert sch.run_pending() == []
+
+
+def test_missed_slots_without_catch_up_are_recorded_as_skipped():
+    calls = []
+    sch, store, clock = _scheduler(calls.append, catch_up=False)
+    sch.run_pending()
+    clock.advance(days=3, hours=2)
+    (run,) = sch.run_pending()
+    assert run["status"] == "Skipped"
+    assert run["missed_runs"] == 3
+    assert calls == [START]
+    assert store.jobs()[0]["next_run_at"] == datetime(2025, 1, 10, 7, 0)
+    # A slot that is simply due (nothing missed) still runs
+    clock.current = datetime(2025, 1, 10, 7, 0)
+    assert [r["status"] for r in sch.run_pending()] == ["Succeeded"]
+
+
+def test_failed_run_is_retried_before_the_next_slot(monkeypatch):
+    monkeypatch.setattr(warracker, "JOB_RETRY_SECONDS", 900)
+    attempts = []
+
+    def flaky(due):
+        attempts.append(due)
+        if len(attempts) == 1:
+            raise RuntimeError("db down")
+        return "ok"
+
+    sch, store, clock = _scheduler(flaky)
+    (run,) = sch.run_pending()
+    assert (run["status"], run["detail"]) == ("Failed", "db down")
+    assert store.jobs()[0]["next_run_at"] == START + timedelta(seconds=900)
+    clock.advance(minutes=14)
+    assert sch.run_pending() == []
+    clock.advance(minutes=1)
+    (run,) = sch.run_pending()
+    assert (run["status"], run["detail"]) == ("Succeeded", "ok")
+    assert store.jobs()[0]["next_run_at"] == datetime(2025, 1, 6, 7, 0)
+
+
+def test_each_slot_runs_once_across_schedulers_sharing_a_store():
+    calls = []
+    store, clock = MemoryJobStore(), FakeClock(START)
+    a, _, _ = _scheduler(calls.append, store=store, clock=clock, runner="a")
+    b, _, _ = _scheduler(calls.append, store=store, clock=clock, runner="b")
+    for _ in range(6 * 24 * 2):  # two days at 10-minute polls
+        a.run_pending()
+        b.run_pending()
+        clock.advance(minutes=10)
+    assert [r["scheduled_for"] for r in store.runs] == [START, datetime(2025, 1, 6, 7, 0), datetime(2025, 1, 7, 7, 0)]
+
+
+@pytest.mark.parametrize("expr, after, expected", [
+    ("0 7 * * *", datetime(2025, 1, 6, 7, 0), datetime(2025, 1, 7, 7, 0)),
+    ("*/15 * * * *", datetime(2025, 1, 6, 7, 1), datetime(2025, 1, 6, 7, 15)),
+    ("0 9 * * 1", datetime(2025, 1, 6, 9, 0), datetime(2025, 1, 13, 9, 0)),
+    # Both day fields restricted: either one qualifies
+    ("0 0 1 * 5", datetime(2025, 1, 1, 0, 0), datetime(2025, 1, 3, 0, 0)),
+])
+def test_cron_next_after(expr, after, expected):
+    assert warracker.CronSchedule(expr).next_after(after) == expected
@@ -0,0 +1,143 @@
+import sqlite3
+from collections import namedtuple
+from datetime import date, datetime
+
+import pytest
+
+from db_backends.sqlite import SqliteConnection, SqlitePool, UnsupportedSql, translate
+
+
+@pytest.fixture
+def db(tmp_path):
+    c = SqliteConnection(str(tmp_path / "t.sqlite3"))
+    c.executescript(
+        """
+        CREATE TABLE dual (dummy CHAR(1));
+        INSERT INTO dual VALUES ('X');
+        CREATE TABLE t (id INTEGER PRIMARY KEY AUTOINCREMENT, name VARCHAR2(20) UNIQUE, d DATE);
+        """
+    )
+    yield c
+    c.close()
+
+
+# --- translate ---
+
+@pytest.mark.parametrize("oracle, sqlite", [
+    ("SELECT SYSDATE + :1 / 86400 FROM dual", "SELECT ORA_DATE_ADD(ORA_SYSDATE(), (CAST(:1 AS REAL) / 86400)) FROM dual"),
+    ("SELECT TRUNC(SYSDATE) - 1 FROM dual", "SELECT ORA_DATE_ADD(ORA_TRUNC(ORA_SYSDATE()), -(1)) FROM dual"),
+    ("SELECT TRUNC(d) - TRUNC(SYSDATE) FROM t", "SELECT ORA_DATE_DIFF(ORA_TRUNC(d), ORA_TRUNC(ORA_SYSDATE())) FROM t"),
+    ("SELECT NVL(name, '') FROM t", "SELECT IFNULL(name, '') FROM t"),
+    ("SELECT id FROM t ORDER BY id OFFSET :o ROWS FETCH NEXT :n ROWS ONLY", "SELECT id FROM t ORDER BY id LIMIT :n OFFSET :o"),
+    ("SELECT id FROM t ORDER BY DBMS_RANDOM.VALUE FETCH FIRST 1 ROWS ONLY", "SELECT id FROM t ORDER BY RANDOM() LIMIT 1"),
+    # Literals and comments are left alone
+    ("SELECT 'NVL(SYSDATE + x)' FROM dual /* ROWNUM */", "SELECT 'NVL(SYSDATE + x)' FROM dual /* ROWNUM */"),
+])
+def test_translate_rewrites(oracle, sqlite):
+    assert translate(oracle).sql == sqlite
+
+
+def test_translate_for_update_and_lock_table_take_the_write_lock():
+    assert translate("SELECT id FROM t WHERE id = :1 FOR UPDATE SKIP LOCKED").write_lock
+    assert translate("SELECT id FROM t WHERE id = :1 FOR UPDATE SKIP LOCKED").sql == "SELECT id FROM t WHERE id = :1"
+    lock = translate("LOCK TABLE t IN EXCLUSIVE MODE")
+    assert lock.sql is None and lock.write_lock
+
+
+def test_translate_returning_into():
+    stmt = translate("DELETE FROM t WHERE id = :1 RETURNING name, d INTO :2, :3")
+    assert stmt.sql == "DELETE FROM t WHERE id = :1 RETURNING name, d"
+    assert stmt.returning == ("2", "3")
+
+
+@pytest.mark.parametrize("sql", [
+    "MERGE INTO t USING dual ON (1 = 1) WHEN MATCHED THEN UPDATE SET name = 'x'",
+    "SELECT id FROM t WHERE ROWNUM = 1",
+    "SELECT id FROM t CONNECT BY PRIOR id = id",
+    "SELECT DECODE(name, 'a', 1, 0) FROM t",
+    "SELECT ADD_MONTHS(d, 1) FROM t",
+    "SELECT TO_DATE(:1, 'YYYY-MM-DD') FROM dual",
+    "SELECT REGEXP_SUBSTR(name, 'a+') FROM t",
+    "SELECT SYS_CONTEXT('USERENV', 'SID') FROM dual",
+    "SELECT COUNT(*) FROM v$sql",
+    "SELECT t.id FROM t, t u WHERE t.id = u.id(+)",
+    "SELECT SYSDATE - INTERVAL '1' DAY FROM dual",
+    # Date arithmetic the translator can't type-check
+    "SELECT d - SYSDATE FROM t",
+    "SELECT SYSDATE + id FROM t",
+    "SELECT SYSDATE + 1 * 2 FROM dual",
+    "SELECT SYSDATE + SYSDATE FROM dual",
+])
+def test_translate_rejects_untranslated_oracle(sql):
+    with pytest.raises(UnsupportedSql):
+        translate(sql)
+
+
+# --- cursor ---
+
+def test_dates_round_trip_and_empty_string_is_null(db):
+    cur = db.cursor()
+    cur.execute("INSERT INTO t (name, d) VALUES (:1, :2)", ("a", date(2024, 5, 1)))
+    cur.execute("INSERT INTO t (name, d) VALUES (:1, :2)", ("", datetime(2024, 5, 1, 13, 30)))
+    cur.execute("SELECT name, d FROM t ORDER BY id")
+    assert cur.fetchall() == [("a", datetime(2024, 5, 1)), (None, datetime(2024, 5, 1, 13, 30))]
+
+
+def test_positional_binds_follow_occurrence_order(db):
+    cur = db.cursor()
+    cur.execute("SELECT :2 || :1 FROM dual", ("a", "b"))
+    assert cur.fetchone() == ("ab",)
+    # One value per distinct name for a repeated placeholder
+    cur.execute("SELECT :1 || :1 FROM dual", ("x",))
+    assert cur.fetchone() == ("xx",)
+
+
+def test_returning_into_var(db):
+    cur = db.cursor()
+    new_id = cur.var(int)
+    cur.execute("INSERT INTO t (name) VALUES (:1) RETURNING id INTO :2", ("a", new_id))
+    assert new_id.getvalue() == [1]
+    assert cur.rowcount == 1
+
+
+def test_batcherrors_report_each_failed_row(db):
+    cur = db.cursor()
+    cur.execute("INSERT INTO t (name) VALUES ('dup')")
+    cur.executemany("INSERT INTO t (name) VALUES (:1)", [("a",), ("dup",), ("b",)],
+                    batcherrors=True, arraydmlrowcounts=True)
+    errors = cur.getbatcherrors()
+    assert [(e.offset, e.code) for e in errors] == [(1, 1)]
+    assert cur.getarraydmlrowcounts() == [1, 0, 1]
+    assert cur.rowcount == 2
+
+
+def test_rowfactory_is_cleared_on_execute(db):
+    cur = db.cursor()
+    Row = namedtuple("Row", "name")
+    cur.execute("SELECT 'a' FROM dual")
+    cur.rowfactory = Row
+    assert cur.fetchone() == Row("a")
+    cur.execute("SELECT 'a', 'b' FROM dual")
+    assert cur.fetchone() == ("a", "b")
+
+
+def test_unsupported_sql_is_a_database_error(db):
+    # So the app's `except dbapi.DatabaseError` handlers see it like any other DB failure
+    with pytest.raises(sqlite3.DatabaseError) as info:
+        db.cursor().execute("SELECT id FROM t WHERE ROWNUM = 1")
+    assert isinstance(info.value, UnsupportedSql)
+
+
+# --- pool ---
+
+def test_pool_blocks_at_max_then_times_out(tmp_path):
+    pool = SqlitePool(str(tmp_path / "p.sqlite3"), min=1, max=2)
+    pool.wait_timeout = 50
+    a, b = pool.acquire(), pool.acquire()
+    assert pool.busy == 2 and pool.opened == 2
+    with pytest.raises(Exception, match="no free connection"):
+        pool.acquire()
+    pool.release(a)
+    assert pool.acquire() is a
+    pool.drop(b)
+    assert pool.opened == 1